@@ -0,0 +1,179 @@
+import os
+from collections import OrderedDict
+import pygame
+
+
+class LRUCache:
+    """
+    Dictionary holding at most maxsize items, the least recently used item is dropped first
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, key):
+        value = self.items.get(key)
+        if value is not None:
+            self.items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+        return value
+
+    def clear(self):
+        self.items.clear()
+
+
+class AssetManager:
+    """
+    Central place to start pygame and to load images, fonts and text.
+    Every image is loaded and converted once, fonts and rendered text are kept in bounded LRU caches.
+    Nothing is loaded or initialized before it is asked for, so importing the game has no side effects.
+    """
+
+    def __init__(self, image_path, max_fonts=16, max_texts=256):
+        """
+        Constructor
+        :param image_path: directory of the images
+        :param max_fonts: number of fonts kept
+        :param max_texts: number of rendered text surfaces kept
+        """
+        self.image_path = image_path
+        self.images = {}  # file name -> surface as loaded
+        self.converted = {}  # file name -> surface converted for fast blitting
+        self.sprites = {}  # (colours, atlas) -> (enemy images, player images)
+        self.fonts = LRUCache(max_fonts)
+        self.texts = LRUCache(max_texts)
+        self.atlas = None  # surface holding all sprite images when packed
+        self._initialized = False
+
+    def init(self):
+        """
+        Start the parts of pygame the game uses (display and font). Caches are dropped if pygame was shut down
+        since they were filled, because fonts and converted surfaces do not survive pygame.quit().
+        :return: None
+        """
+        if self._initialized and not pygame.display.get_init():
+            self.clear()
+        if not pygame.display.get_init():
+            pygame.display.init()
+        if not pygame.font.get_init():
+            pygame.font.init()
+        self._initialized = True
+
+    def clear(self):
+        """
+        Forget every cached asset
+        :return: None
+        """
+        self.images.clear()
+        self.converted.clear()
+        self.sprites.clear()
+        self.fonts.clear()
+        self.texts.clear()
+        self.atlas = None
+
+    def image(self, name, convert=True):
+        """
+        Image from the image directory
+        :param name: file name
+        :param convert: convert_alpha the image, requires a display mode to be set
+        :return: surface, shared between callers so do not draw on it
+        :raise FileNotFoundError: the image is missing or can not be read
+        """
+        if convert and name in self.converted:
+            return self.converted[name]
+        surface = self.images.get(name)
+        if surface is None:
+            path = os.path.join(self.image_path, name)
+            try:
+                surface = self.images[name] = pygame.image.load(path)
+            except (pygame.error, FileNotFoundError) as error:
+                raise FileNotFoundError("Unable to find image %s" % path) from error
+        if not convert:
+            return surface
+        surface = self.converted[name] = surface.convert_alpha()
+        return surface
+
+    def font(self, style=None, size=32):
+        """
+        System font, the expensive font lookup happens once per style and size
+        :param style: font name, None for the default font
+        :param size: font size
+        :return: pygame.font.Font
+        """
+        key = (style, size)
+        font = self.fonts.get(key)
+        if font is None:
+            self.init()
+            font = self.fonts.put(key, pygame.font.SysFont(style, size))
+        return font
+
+    def text(self, msg, style=None, size=32, colour=(0, 0, 0)):
+        """
+        Rendered text
+        :return: surface, shared between callers so do not draw on it
+        """
+        key = (msg, style, size, tuple(colour))
+        surface = self.texts.get(key)
+        if surface is None:
+            surface = self.font(style, size).render(msg, True, colour)  # Surface object
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert_alpha()
+            self.texts.put(key, surface)
+        return surface
+
+    def sprite_images(self, enemy_border=(0, 0, 255), player_border=(255, 0, 0), atlas=False):
+        """
+        Images of Enemy (normal, crashed into wall, detected) and Player (normal, dead, crashed into wall)
+        :param enemy_border: colour of the border of a detected enemy
+        :param player_border: colour of the border of a player touching the wall
+        :param atlas: pack all images into one surface and return subsurfaces of it
+        :return: (list of enemy images, list of player images)
+        """
+        key = (tuple(enemy_border), tuple(player_border), atlas)
+        if key in self.sprites:
+            return self.sprites[key]
+        enemy = [self.image("babytux.png"), self.image("babytux_neg.png")]
+        player = [self.image("player.png"), self.image("player_dead.png")]
+        enemy.append(enemy[0].copy())  # copy of first image
+        player.append(player[0].copy())
+        # rect(Surface, color, Rect, width=0) -> Rect
+        # Draws a rectangular shape on the Surface. The given Rect is the area of the rectangle.
+        # The width argument is the thickness to draw the outer edge.
+        pygame.draw.rect(enemy[2], enemy_border, (0, 0, 32, 36), 1)  # Draw blue border around image[2]
+        pygame.draw.rect(player[2], player_border, (0, 0, 32, 32), 1)  # Draw red border around image[2]
+        if atlas:
+            packed = self.pack(enemy + player)
+            enemy, player = packed[:len(enemy)], packed[len(enemy):]
+        self.sprites[key] = (enemy, player)
+        return self.sprites[key]
+
+    def pack(self, surfaces):
+        """
+        Copy surfaces side by side into one atlas surface
+        :param surfaces: list of surfaces
+        :return: list of subsurfaces of the atlas in the same order
+        """
+        width = sum(surface.get_width() for surface in surfaces)
+        height = max(surface.get_height() for surface in surfaces)
+        self.atlas = pygame.Surface((width, height), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            self.atlas = self.atlas.convert_alpha()
+        areas, x = [], 0
+        for surface in surfaces:
+            areas.append(self.atlas.blit(surface, (x, 0), special_flags=pygame.BLEND_RGBA_MAX))  # exact copy
+            x += surface.get_width()
+        return [self.atlas.subsurface(area) for area in areas]
+
+
+# Assets shipped with the game
+assets = AssetManager(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Images"))
@@ -0,0 +1,282 @@
+"""
+Bots that steer the players instead of the keyboard, for headless benchmarks and soak tests.
+
+    game = SuperAvoider(headless=True, autopilot=ThreatField())
+    game.new_game(enemies=200, players=10)
+    game.step(3600)
+
+    python super_avoider.py --autopilot
+
+A policy is asked once per tick for the input bits (Player.UP, DOWN, LEFT, RIGHT) of every player. ThreatField builds
+one coarse potential around the players from the positions and speeds of the enemies in a few vectorized passes and
+moves every player down its gradient. All players share the field, so 100 players cost hardly more than one.
+
+A recorded game stores the name and settings of its policy, see describe() and create(), and the replay asks a new
+policy of the same kind for the input again.
+"""
+import abc
+import json
+import math
+try:
+    import numpy as np
+except ImportError:  # numpy is optional for the game, but required here
+    np = None
+from enemy import Enemy
+from player import Player
+
+
+class Policy(abc.ABC):
+    """
+    Interface of an autopilot, subclasses implement decide().
+    A policy has to decide the same way for the same game state, so a recorded game replays exactly.
+    """
+
+    def settings(self):
+        """
+        Constructor arguments that create an equal policy, stored in recordings
+        :return: dictionary of JSON values
+        """
+        return {}
+
+    @abc.abstractmethod
+    def decide(self, game, players):
+        """
+        Input of the players for the next tick
+        :param game: SuperAvoider
+        :param players: list of Player sprites
+        :return: sequence of input bits, one per player
+        """
+
+
+class ThreatField(Policy):
+    """
+    Potential field policy.
+    Every enemy adds threat to the cells it is in now and will be in over the next `lookahead` seconds. Enemies further
+    than the EnemyDetection radius from every player are not seen. The threat is spread over a short and a long range
+    and the walls repel. Each player then takes the steepest way down: the field is looked up along the 8 directions
+    it can move in, a discrete gradient that does not push a player into a wall it already touches.
+    """
+
+    def __init__(self, cell=16, lookahead=0.25, samples=4, far=0.25, wall=4.0, step=0.1, path=3, dead_zone=0.01):
+        """
+        Constructor
+        :param cell: size of a field cell in pixels
+        :param lookahead: seconds of enemy movement added to the field
+        :param samples: positions per enemy between now and lookahead
+        :param far: weight of the threat spread over the detector radius against the threat close by
+        :param wall: threat of a wall, in enemies
+        :param step: seconds of player movement the field is looked up along each direction
+        :param path: points looked up along each direction
+        :param dead_zone: a direction has to lower the threat by this much to be taken instead of standing still
+        """
+        if np is None:
+            raise ImportError("ThreatField requires numpy")
+        self.cell = cell
+        self.lookahead = lookahead
+        self.samples = samples
+        self.far = far
+        self.wall = wall
+        self.step = step
+        self.path = path
+        self.dead_zone = dead_zone
+        self.potential = None  # field of the last decide(), for inspection
+        self.origin = (0, 0)  # (row, column) of the world grid at potential[0, 0]
+        self._walls = {}  # (world grid shape, horizon) -> wall potential along the rows and along the columns
+        # ---- Standing still and the 8 directions of Player.move with their input bits ----
+        directions, bits = [(0, 0)], [0]
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                if dx or dy:
+                    directions.append((dx, dy))
+                    bits.append((Player.UP if dy < 0 else Player.DOWN if dy > 0 else 0) |
+                                (Player.LEFT if dx < 0 else Player.RIGHT if dx > 0 else 0))
+        self.directions = np.array(directions, dtype=np.float64)
+        self.direction_bits = np.array(bits, dtype=np.int64)
+
+    @staticmethod
+    def enemies(game):
+        """
+        Positions and speeds of all enemies
+        :return: (x, y, vx, vy) arrays
+        """
+        engine = Enemy.engine
+        if engine is not None:
+            n = engine.count
+            return engine.centerx[:n], engine.centery[:n], engine.vx[:n], engine.vy[:n]
+        state = np.array([(enemy.rect.centerx, enemy.rect.centery, enemy.vx, enemy.vy) for enemy in game.enemy_group],
+                         dtype=np.float64).reshape(-1, 4)
+        return state[:, 0], state[:, 1], state[:, 2], state[:, 3]
+
+    @staticmethod
+    def _blur(field, radius, passes=3):
+        """
+        Smooth field with repeated box filters, close to a gaussian of about `radius` cells. Each box filter is two
+        passes of cumulative sums whatever its size. The result is scaled so that a single enemy peaks at 1.
+        :return: array of the shape of field
+        """
+        width = max(1, round(radius / math.sqrt(passes)))
+        for _ in range(passes):
+            for axis in (0, 1):
+                size = field.shape[axis]
+                summed = np.cumsum(field, axis=axis)
+                summed = np.concatenate((np.zeros_like(summed.take([0], axis=axis)), summed), axis=axis)
+                high = np.minimum(np.arange(size) + width + 1, size)
+                low = np.maximum(np.arange(size) - width, 0)
+                field = summed.take(high, axis=axis) - summed.take(low, axis=axis)
+        # Peak of the kernel: the centre of (2 width + 1) ** passes box filters along each axis
+        kernel = np.ones(1)
+        for _ in range(passes):
+            kernel = np.convolve(kernel, np.ones(2 * width + 1))
+        return field / kernel.max() ** 2
+
+    def wall_potential(self, shape, horizon, box=None):
+        """
+        Threat of the walls, rising from 0 at the detector radius to `wall` at the wall
+        :param shape: (rows, columns) of the grid over the whole world
+        :param horizon: detector radius in cells
+        :param box: (top, bottom, left, right) cells of the part of the grid the field covers, None for all
+        :return: array of the shape of box
+        """
+        key = (shape, horizon)
+        if key not in self._walls:
+            rows, columns = shape
+            y = np.minimum(np.arange(rows) + 0.5, rows - np.arange(rows) - 0.5)
+            x = np.minimum(np.arange(columns) + 0.5, columns - np.arange(columns) - 0.5)
+            self._walls[key] = (self.wall * np.clip(1.0 - y / horizon, 0.0, 1.0) ** 2,
+                                self.wall * np.clip(1.0 - x / horizon, 0.0, 1.0) ** 2)
+        y, x = self._walls[key]
+        top, bottom, left, right = box or (0, shape[0], 0, shape[1])
+        # Both walls of a corner add up, a corner is no place to hide
+        return y[top:bottom, None] + x[None, left:right]
+
+    def field(self, game, players):
+        """
+        Potential around the players from the enemies seen by any player. The field only covers the box around the
+        detectors of all players widened by the detector radius, so its cost does not grow with the world.
+        :return: (rows, columns) array, its first cell is self.origin of the grid over the world
+        """
+        cell = self.cell
+        world = game.world_rect
+        world_rows, world_columns = math.ceil(world.height / cell), math.ceil(world.width / cell)
+        detectors = [player.detector.radius if player.detector is not None else 5 * player.rect.width
+                     for player in players]
+        horizon = max(1, math.ceil(max(detectors) / cell))
+        # ---- Cells of the players and their reach, in the grid over the world ----
+        reaches = np.array([math.ceil(radius / cell) for radius in detectors])
+        centers = np.array([player.rect.center for player in players]) - (world.x, world.y)
+        player_columns = np.clip(centers[:, 0] // cell, 0, world_columns - 1).astype(np.intp)
+        player_rows = np.clip(centers[:, 1] // cell, 0, world_rows - 1).astype(np.intp)
+        top = max(int((player_rows - reaches).min()) - horizon, 0)
+        bottom = min(int((player_rows + reaches).max()) + horizon + 1, world_rows)
+        left = max(int((player_columns - reaches).min()) - horizon, 0)
+        right = min(int((player_columns + reaches).max()) + horizon + 1, world_columns)
+        rows, columns = bottom - top, right - left
+        # ---- Cells within the detector radius of any player ----
+        seen = np.zeros((rows, columns), dtype=bool)
+        for row, column, reach in zip((player_rows - top).tolist(), (player_columns - left).tolist(),
+                                      reaches.tolist()):
+            seen[max(row - reach, 0):row + reach + 1, max(column - reach, 0):column + reach + 1] = True
+        # ---- Threat: enemies seen now, at their positions over the lookahead ----
+        x, y, vx, vy = ThreatField.enemies(game)
+        threat = np.zeros(rows * columns)
+        if len(x):
+            x, y = x - (world.x + left * cell), y - (world.y + top * cell)
+            cells_x, cells_y = x // cell, y // cell
+            inside = (cells_x >= 0) & (cells_x < columns) & (cells_y >= 0) & (cells_y < rows)
+            visible = np.flatnonzero(inside)
+            visible = visible[seen[cells_y[visible].astype(np.intp), cells_x[visible].astype(np.intp)]]
+            x, y, vx, vy = x[visible], y[visible], vx[visible], vy[visible]
+            for t in np.linspace(0.0, self.lookahead, self.samples):
+                cells = (np.clip((y + vy * t) // cell, 0, rows - 1).astype(np.intp) * columns +
+                         np.clip((x + vx * t) // cell, 0, columns - 1).astype(np.intp))
+                # Positions further ahead are less certain, the enemy may bounce or turn
+                threat += np.bincount(cells, minlength=rows * columns) * (1.0 - 0.5 * t / max(self.lookahead, 1e-9))
+        threat = threat.reshape(rows, columns)
+        # ---- Spread: close by over the size of the sprites, far over half the detector radius ----
+        near = max(1, round(2 * Enemy.image[0].get_width() / cell)) if Enemy.image else 2
+        potential = ThreatField._blur(threat, near) + self.far * ThreatField._blur(threat, max(near, horizon // 2))
+        # The walls are those of the world, not of the box
+        potential += self.wall_potential((world_rows, world_columns), horizon, (top, bottom, left, right))
+        self.potential, self.origin = potential, (top, left)
+        return potential
+
+    def settings(self):
+        return {"cell": self.cell, "lookahead": self.lookahead, "samples": self.samples, "far": self.far,
+                "wall": self.wall, "step": self.step, "path": self.path, "dead_zone": self.dead_zone}
+
+    def decide(self, game, players):
+        """
+        Move every player the way the shared field falls most
+        :return: integer array of input bits
+        """
+        if not players:
+            return np.zeros(0, dtype=np.int64)
+        potential = self.field(game, players)
+        world, cell = game.world_rect, self.cell
+        rows, columns = potential.shape
+        top, left = self.origin
+        centers = np.array([player.rect.center for player in players], dtype=np.float64)
+        sizes = np.array([player.rect.size for player in players], dtype=np.float64)
+        distance = np.array([player.speed for player in players]) * self.step
+        # ---- Batched lookup: (players, directions, points) positions along every direction ----
+        fractions = np.arange(1, self.path + 1) / self.path
+        offsets = self.directions[None, :, None, :] * (distance[:, None, None, None] * fractions[None, None, :, None])
+        positions = centers[:, None, None, :] + offsets
+        # A player stops at the walls like Player.update
+        low = np.array((world.left, world.top)) + sizes / 2
+        high = np.array((world.right, world.bottom)) - sizes / 2
+        positions = np.clip(positions, low[:, None, None, :], high[:, None, None, :])
+        column = np.clip((positions[..., 0] - world.x) // cell - left, 0, columns - 1).astype(np.intp)
+        row = np.clip((positions[..., 1] - world.y) // cell - top, 0, rows - 1).astype(np.intp)
+        threat = potential[row, column].mean(axis=2)
+        # Standing still wins unless a direction is clearly better
+        threat[:, 1:] += self.dead_zone
+        return self.direction_bits[np.argmin(threat, axis=1)]
+
+
+# Policies a recording can name
+POLICIES = {"ThreatField": ThreatField}
+
+
+def describe(policy):
+    """
+    Name and settings of a policy
+    :param policy: instance of a class in POLICIES
+    :return: JSON text
+    """
+    name = type(policy).__name__
+    if POLICIES.get(name) is not type(policy):
+        raise ValueError("%s is not in autopilot.POLICIES and can not be recorded" % name)
+    return json.dumps({"policy": name, "settings": policy.settings()}, sort_keys=True)
+
+
+def create(description):
+    """
+    New policy from the text of describe()
+    :param description: JSON text
+    :return: Policy
+    """
+    description = json.loads(description)
+    return POLICIES[description["policy"]](**description["settings"])
+
+
+if __name__ == '__main__':
+    import time
+    from super_avoider import SuperAvoider
+    game = SuperAvoider(headless=True, seed=0)
+    for pilot in (None, ThreatField()):
+        for players in (1, 100):
+            game.autopilot = pilot
+            survived, ticks = [], 0
+            start = time.perf_counter()
+            for seed in range(5):
+                game.new_game(enemies=50, players=players, seed=seed)
+                while game.player_group and game.ticks < 1800:
+                    game.step()
+                survived += [score for _, score in game.scores] + [p.score for p in game.player_group]
+                ticks += game.ticks
+            elapsed = time.perf_counter() - start
+            print("%-11s %3i players: mean survival %5.1f s, %.3f ms per tick" % (
+                type(pilot).__name__ if pilot else "standing", players, sum(survived) / len(survived),
+                1000 * elapsed / ticks))
+    game.close()
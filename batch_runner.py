@@ -0,0 +1,195 @@
+"""
+Play many independent headless games on all cores and summarize the scores.
+
+    python batch_runner.py --games 1000 --enemies 50 100 --max-speed 100 150 --output results.jsonl
+    python batch_runner.py --games 100000 --scores scores.log   # also append every game to a score log
+
+Game n of every setting gets its own seed. Results are appended to the output file as one JSON record per line while the
+games finish, running the same command again skips the games already in the file.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+# Game of the worker process, created once and reused for every job
+_game = None
+
+
+def _init_worker():
+    global _game
+    from super_avoider import SuperAvoider
+    _game = SuperAvoider(headless=True)
+
+
+def play(job):
+    """
+    Play one game until all players are dead or the tick limit is reached
+    :param job: (game id, seed, enemies, enemy max speed, max ticks)
+    :return: dictionary with the result of the game
+    """
+    from enemy import Enemy
+    game_id, seed, enemies, max_speed, max_ticks = job
+    Enemy.ENEMYMAXSPEED = max_speed
+    _game.new_game(enemies=enemies, players=1, seed=seed)
+    player = next(iter(_game.player_group)).number
+    detections = 0
+    while _game.ticks < max_ticks and _game.player_group:
+        _game.tick(_game.fixed_dt)
+        detections += _game.detected
+    return {"id": game_id,
+            "player": player,
+            "seed": _game.game_seed,
+            "enemies": enemies,
+            "max_speed": max_speed,
+            "ticks": _game.ticks,
+            "survival": _game.scores[0][1] if _game.scores else _game.time,
+            "time": _game.time,
+            "alive": bool(_game.player_group),
+            "enemies_alive": len(_game.enemy_group),
+            "detections_per_tick": detections / max(_game.ticks, 1)}
+
+
+def make_jobs(games, enemies, max_speeds, max_ticks, seed=0):
+    """
+    One job per game and setting. Game n of every setting uses the same seed, so settings are compared on the
+    same random start positions, and the id of a game does not change when more games are asked for.
+    :return: list of (game id, seed, enemies, enemy max speed, max ticks)
+    """
+    jobs = []
+    for count, speed, game in itertools.product(enemies, max_speeds, range(games)):
+        jobs.append(("%i:%g:%i" % (count, speed, game), seed * 1000003 + game, count, speed, max_ticks))
+    return jobs
+
+
+def read_results(path):
+    """
+    Records written by an earlier (possibly interrupted) run and where they end
+    :param path: JSON lines file
+    :return: (list of records, size in bytes of the complete lines holding them)
+    """
+    if not os.path.exists(path):
+        return [], 0
+    records = []
+    end = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # last line of an interrupted run
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+            end += len(line)
+    return records, end
+
+
+def load_results(path):
+    """
+    Records written by an earlier (possibly interrupted) run
+    :param path: JSON lines file
+    :return: list of records
+    """
+    return read_results(path)[0]
+
+
+def run(jobs, output, workers=None, scores=None):
+    """
+    Play jobs on a process pool, appending every finished game to output
+    :param jobs: list of jobs from make_jobs
+    :param output: JSON lines file, games already in it are skipped
+    :param workers: number of processes, defaults to the number of cores
+    :param scores: ScoreLog the survival of every game played is appended to
+    :return: list of all records in output
+    """
+    records, end = read_results(output)
+    done = {record["id"] for record in records}
+    todo = [job for job in jobs if job[0] not in done]
+    workers = workers or os.cpu_count() or 1
+    if not todo:
+        return records
+    print("%i games to play, %i already done, %i workers" % (len(todo), len(done), workers))
+    chunksize = max(1, len(todo) // (workers * 8))
+    start = time.perf_counter()
+    # Only the partial last line of an interrupted run is cut off, the finished games stay in the file
+    if end:
+        with open(output, "r+b") as f:
+            f.truncate(end)
+    with open(output, "a" if end else "w") as f:
+        with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+            for i, record in enumerate(pool.imap_unordered(play, todo, chunksize), 1):
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                records.append(record)
+                if scores is not None:
+                    scores.append(record["player"], record["survival"], record["enemies_alive"], record["seed"], record["time"])
+                if i % 100 == 0 or i == len(todo):
+                    f.flush()
+                    elapsed = time.perf_counter() - start
+                    print("%i/%i games, %.1f games/s" % (i, len(todo), i / elapsed), flush=True)
+            # Let the workers exit on their own, terminating them would wait for SDL's signal handlers
+            pool.close()
+            pool.join()
+    return records
+
+
+def summarize(records):
+    """
+    Survival statistics per setting
+    :param records: results of play()
+    :return: dictionary (enemies, max speed) -> statistics
+    """
+    groups = {}
+    for record in records:
+        groups.setdefault((record["enemies"], record["max_speed"]), []).append(record)
+    summary = {}
+    for key, group in sorted(groups.items()):
+        survival = sorted(record["survival"] for record in group)
+        n = len(survival)
+        summary[key] = {"games": n,
+                        "mean": statistics.fmean(survival),
+                        "stdev": statistics.stdev(survival) if n > 1 else 0.0,
+                        "min": survival[0],
+                        "p50": survival[n // 2],
+                        "p90": survival[min(n - 1, int(0.9 * n))],
+                        "max": survival[-1],
+                        "alive": sum(record["alive"] for record in group) / n,
+                        "detections_per_tick": statistics.fmean(record["detections_per_tick"] for record in group)}
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=100, help="games per setting")
+    parser.add_argument("--enemies", type=int, nargs="+", default=[50])
+    parser.add_argument("--max-speed", type=float, nargs="+", default=[100.0], help="values of ENEMYMAXSPEED")
+    parser.add_argument("--ticks", type=int, default=3600, help="tick limit of a game")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="results.jsonl")
+    parser.add_argument("--scores", default=None, metavar="FILE", help="append every game played to a score log")
+    args = parser.parse_args(argv)
+    jobs = make_jobs(args.games, args.enemies, args.max_speed, args.ticks, args.seed)
+    scores = None
+    if args.scores:
+        from score_log import ScoreLog
+        scores = ScoreLog(args.scores)
+    try:
+        records = run(jobs, args.output, args.workers, scores)
+    finally:
+        if scores is not None:
+            scores.close()
+    print("%8s %9s %6s %8s %8s %8s %8s %6s" % ("enemies", "max speed", "games", "mean s", "stdev", "p50", "p90",
+                                              "alive"))
+    for (enemies, max_speed), stats in summarize(records).items():
+        print("%8i %9.1f %6i %8.2f %8.2f %8.2f %8.2f %5.0f%%" % (enemies, max_speed, stats["games"], stats["mean"],
+                                                                stats["stdev"], stats["p50"], stats["p90"],
+                                                                100 * stats["alive"]))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
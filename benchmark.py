@@ -0,0 +1,196 @@
+"""
+Scenario benchmarks for SuperAvoider.
+
+    python benchmark.py run --output baseline.json
+    python benchmark.py compare baseline.json new.json
+
+Every scenario runs headless in its own process for a fixed number of ticks and records the time spent
+in each phase of the frame (events, collision, update, draw) together with the peak memory of the process.
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# name: (enemies, players, mouse button held (one enemy spawned per tick), world size (None for the window),
+#        ticks between two moves of far away enemies)
+SCENARIOS = {
+    "enemies_50": (50, 1, False, None, 1),
+    "enemies_500": (500, 1, False, None, 1),
+    "enemies_5k": (5000, 1, False, None, 1),
+    "enemies_50k": (50000, 1, False, None, 1),
+    "players_1": (50, 1, False, None, 1),
+    "players_10": (50, 10, False, None, 1),
+    "players_100": (50, 100, False, None, 1),
+    "mouse_hold": (50, 1, True, None, 1),
+    "arena_100k": (100000, 1, False, (16000, 12000), 1),
+    "arena_100k_far": (100000, 1, False, (16000, 12000), 4),
+}
+PHASES = ("events", "collision", "update", "draw")
+
+
+def peak_memory_kb():
+    """
+    Peak resident memory of this process
+    :return: kilobytes or None if unknown
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # bytes on macOS
+
+
+def summary(samples_ns):
+    """
+    Statistics of a list of durations
+    :param samples_ns: durations in nanoseconds
+    :return: dictionary of milliseconds
+    """
+    samples = sorted(samples_ns)
+    n = len(samples)
+    return {"mean_ms": sum(samples) / n / 1e6,
+            "p50_ms": samples[n // 2] / 1e6,
+            "p95_ms": samples[min(n - 1, int(0.95 * n))] / 1e6,
+            "max_ms": samples[-1] / 1e6}
+
+
+def run_scenario(name, ticks, seed):
+    """
+    Run one scenario in the current process. Every frame is one tick of the game loop, the phase times are the
+    marks the game sets in its FrameProfiler (flip is counted as draw)
+    :param name: key of SCENARIOS
+    :param ticks: number of frames to simulate
+    :param seed: seed of the game
+    :return: dictionary with the results
+    """
+    from super_avoider import SuperAvoider
+    from frame_profiler import FrameProfiler
+    from replay import SPAWN
+    enemies, players, hold_mouse, world_size, far_update_interval = SCENARIOS[name]
+    game = SuperAvoider(headless=True, world_size=world_size)
+    game.FAR_UPDATE_INTERVAL = far_update_interval
+    game.profiler.close()
+    game.profiler = profiler = FrameProfiler(size=ticks)  # keeps every frame of the run
+    memory_before = peak_memory_kb()
+    start = time.perf_counter_ns()
+    game.new_game(enemies=enemies, players=players, seed=seed)
+    setup_ns = time.perf_counter_ns() - start
+    bits = SPAWN if hold_mouse else 0
+    for tick in range(ticks):
+        profiler.begin_frame()
+        game.event_handle()
+        profiler.mark("events")
+        # Scripted mouse position sweeping over the window
+        mouse = ((tick * 7) % game.W_WIDTH, (tick * 5) % game.W_HEIGHT)
+        game.simulate(game.fixed_dt, bits, mouse)
+        game.draw()
+        profiler.end_frame(len(game.enemy_group), len(game.player_group))
+    samples = profiler.samples
+    timings = {phase: list(samples[phase]) for phase in PHASES}
+    timings["draw"] = [draw + flip for draw, flip in zip(samples["draw"], samples["flip"])]
+    frames = list(samples["frame"])
+    result = {"enemies": len(game.enemy_group),
+              "players": len(game.player_group),
+              "setup_ms": setup_ns / 1e6,
+              "ticks_per_second": ticks / (sum(frames) / 1e9),
+              "frame": summary(frames),
+              "phases": {phase: summary(values) for phase, values in timings.items()},
+              "peak_rss_kb": peak_memory_kb(),
+              "rss_before_setup_kb": memory_before}
+    game.close()
+    return result
+
+
+def run(names, ticks, seed):
+    """
+    Run every scenario in a fresh process so class level state and peak memory do not leak between them
+    :param names: scenario names
+    :param ticks: number of frames per scenario
+    :param seed: seed of the games
+    :return: dictionary with metadata and the results per scenario
+    """
+    import pygame
+    results = {"meta": {"python": platform.python_version(),
+                        "pygame": pygame.version.ver,
+                        "platform": platform.platform(),
+                        "ticks": ticks,
+                        "seed": seed,
+                        "date": time.strftime("%Y-%m-%d %H:%M:%S")},
+               "scenarios": {}}
+    for name in names:
+        with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+            result = pool.apply(run_scenario, (name, ticks, seed))
+        results["scenarios"][name] = result
+        print("%-12s %9.1f ticks/s  frame p50 %7.3f ms  p95 %7.3f ms  peak %s kB" %
+              (name, result["ticks_per_second"], result["frame"]["p50_ms"], result["frame"]["p95_ms"],
+               result["peak_rss_kb"]))
+    return results
+
+
+def compare(old, new, threshold=0.1):
+    """
+    Print the change of the mean time per phase between two result files
+    :param old: baseline results
+    :param new: new results
+    :param threshold: relative slowdown reported as regression
+    :return: list of (scenario, phase, ratio) that got slower than threshold
+    """
+    regressions = []
+    print("%-12s %-10s %10s %10s %8s" % ("scenario", "phase", "old ms", "new ms", "change"))
+    for name, result in new["scenarios"].items():
+        if name not in old["scenarios"]:
+            continue
+        base = old["scenarios"][name]
+        rows = [("frame", base["frame"], result["frame"])]
+        rows += [(phase, base["phases"][phase], result["phases"][phase]) for phase in PHASES]
+        for phase, before, after in rows:
+            ratio = after["mean_ms"] / before["mean_ms"] if before["mean_ms"] else float("inf")
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  SLOWER"
+                regressions.append((name, phase, ratio))
+            elif ratio < 1 - threshold:
+                flag = "  faster"
+            print("%-12s %-10s %10.3f %10.3f %+7.1f%%%s" % (name, phase, before["mean_ms"], after["mean_ms"],
+                                                             100 * (ratio - 1), flag))
+        if base.get("peak_rss_kb") and result.get("peak_rss_kb"):
+            print("%-12s %-10s %10i %10i %+7.1f%%" % (name, "peak kB", base["peak_rss_kb"], result["peak_rss_kb"],
+                                                      100 * (result["peak_rss_kb"] / base["peak_rss_kb"] - 1)))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run scenarios and write a JSON baseline")
+    run_parser.add_argument("--output", default="benchmark.json")
+    run_parser.add_argument("--ticks", type=int, default=600)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    compare_parser = commands.add_parser("compare", help="compare two JSON results")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="relative slowdown that counts as regression (default 0.1)")
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        results = run(args.scenarios, args.ticks, args.seed)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        return 0
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    return 1 if compare(old, new, args.threshold) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import pygame
+
+
+class Camera:
+    """
+    Part of the world shown in the window.
+    The view follows a target sprite and stays inside the world, positions are converted between window and world.
+    """
+
+    def __init__(self, size, world):
+        """
+        Constructor
+        :param size: (width, height) of the window
+        :param world: pygame.Rect of the world
+        """
+        self.view = pygame.Rect((0, 0), size)
+        self.world = pygame.Rect(world)
+        self.target = None  # sprite followed by the view
+
+    def follow(self, sprites):
+        """
+        Center the view on the target, a new target is picked from sprites when it died
+        :param sprites: candidates for a new target, e.g. the player group
+        :return: view
+        """
+        if self.target is None or not self.target.alive():
+            self.target = next(iter(sprites), None)
+        if self.target is not None:
+            self.view.center = self.target.rect.center
+            self.view.clamp_ip(self.world)
+        return self.view
+
+    def to_world(self, pos):
+        """
+        :param pos: position in the window
+        :return: position in the world
+        """
+        return pos[0] + self.view.x, pos[1] + self.view.y
+
+    def to_screen(self, rect):
+        """
+        :param rect: rect in the world
+        :return: rect in the window
+        """
+        return rect.move(-self.view.x, -self.view.y)
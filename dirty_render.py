@@ -0,0 +1,140 @@
+import pygame
+from spatial_hash import SpatialHash
+
+
+class DirtyLayeredUpdates(pygame.sprite.LayeredUpdates):
+    """
+    LayeredUpdates group for DirtySprites which returns only the screen areas that changed.
+    Sprites set dirty = 1 when their image or position changed (dirty = 2 means always redraw).
+    Clearing and drawing are batched with Surface.blits and the returned rects are meant for pygame.display.update.
+    """
+
+    def __init__(self, *sprites, **kwargs):
+        pygame.sprite.LayeredUpdates.__init__(self, *sprites, **kwargs)
+        self._bgd = None
+        self._repaint = True  # first frame pushes the whole screen
+        # When at least this fraction of sprites is dirty every sprite is redrawn instead of searching overlaps
+        self.full_redraw_ratio = 0.25
+        # Broad phase for the sprites overlapping a damaged area
+        self._grid = SpatialHash(cell_size=64)
+
+    def clear(self, surface, bgd):
+        """
+        Remember the background used to erase the sprites, erasing happens in draw()
+        :param surface: unused, kept for the Group.clear signature
+        :param bgd: background surface
+        :return: None
+        """
+        self._bgd = bgd
+
+    def repaint(self):
+        """
+        Redraw background and all sprites on the next draw(), e.g. after something else drew on the screen
+        :return: None
+        """
+        self._repaint = True
+
+    def damage(self, rect):
+        """
+        Restore rect from the background on the next draw(), e.g. to erase an overlay drawn over the sprites
+        :param rect: area of the screen
+        :return: None
+        """
+        self.lostsprites.append(pygame.Rect(rect))
+
+    def _damage(self, dirty, lost):
+        """
+        Areas that change: old and new rect of every dirty sprite, as one rect if they overlap, and rects of removed
+        sprites
+        :param dirty: dirty sprites
+        :param lost: rects of removed sprites
+        :return: list of rects
+        """
+        spritedict, init_rect = self.spritedict, self._init_rect
+        damage = list(lost)
+        for sprite in dirty:
+            old_rect, new_rect = spritedict[sprite], sprite.rect
+            if old_rect is init_rect:
+                damage.append(pygame.Rect(new_rect))
+            elif new_rect.colliderect(old_rect):
+                damage.append(new_rect.union(old_rect))
+            else:
+                damage.append(pygame.Rect(new_rect))
+                damage.append(old_rect)
+        return damage
+
+    def _redraw(self, surface, bgd, sprites, damage):
+        """
+        Erase every damaged area and draw the sprites overlapping it clipped to the area, like LayeredDirty.
+        Sprites outside the damage are left alone, so the work follows the sprites near a change instead of spreading
+        through chains of overlapping sprites. Areas are drawn one after the other, a pixel in two areas is erased
+        again before it is drawn a second time, so translucent images are never blended twice.
+        :param surface: surface to draw on
+        :param bgd: background surface or None
+        :param sprites: all sprites in layer order
+        :param damage: rects to draw again
+        :return: None
+        """
+        grid = self._grid
+        grid.update(self)
+        order = {sprite: i for i, sprite in enumerate(sprites)}
+        blits = []
+        for area in damage:
+            if bgd is not None:
+                blits.append((bgd, area, area))
+            touching = sorted((sprite for sprite in grid.query(area) if area.colliderect(sprite.rect)), key=order.get)
+            for sprite in touching:
+                rect = sprite.rect
+                clip = area.clip(rect)
+                blits.append((sprite.image, clip, clip.move(-rect.x, -rect.y)))
+        surface.blits(blits, doreturn=False)
+
+    def draw(self, surface, bgsurf=None, special_flags=0):
+        """
+        Erase and redraw the sprites that need it
+        :param surface: surface to draw on
+        :param bgsurf: background surface, overrides the one given to clear()
+        :param special_flags: unused, kept for the Group.draw signature
+        :return: list of rects that changed on surface
+        """
+        if bgsurf is not None:
+            self._bgd = bgsurf
+        bgd, spritedict, init_rect = self._bgd, self.spritedict, self._init_rect
+        sprites = self.sprites()
+        lost = self.lostsprites
+        self.lostsprites = []
+        if self._repaint:
+            if bgd is not None:
+                surface.blit(bgd, (0, 0))
+            self._draw_all(surface, sprites)
+            self._repaint = False
+            return [surface.get_rect()]
+        dirty = [sprite for sprite in sprites if sprite.dirty]
+        if not dirty and not lost:
+            return []
+        damage = self._damage(dirty, lost)
+        if len(dirty) >= self.full_redraw_ratio * len(sprites):
+            # ---- Many sprites changed: erase the old positions of all sprites and draw all of them
+            if bgd is not None:
+                cleared = lost + [spritedict[sprite] for sprite in sprites if spritedict[sprite] is not init_rect]
+                surface.blits([(bgd, rect, rect) for rect in cleared], doreturn=False)
+            self._draw_all(surface, sprites)
+            return damage
+        self._redraw(surface, bgd, sprites, damage)
+        screen = surface.get_rect()
+        for sprite in dirty:
+            spritedict[sprite] = screen.clip(sprite.rect)
+            if sprite.dirty == 1:
+                sprite.dirty = 0
+        return damage
+
+    def _draw_all(self, surface, sprites):
+        """
+        Draw every sprite over what is on surface
+        :return: None
+        """
+        spritedict = self.spritedict
+        for sprite, rect in zip(sprites, surface.blits([(sprite.image, sprite.rect) for sprite in sprites])):
+            spritedict[sprite] = rect
+            if sprite.dirty == 1:
+                sprite.dirty = 0
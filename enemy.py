@@ -1,62 +1,135 @@
+import math
 import random
 import pygame
+from enemy_world import WorldField
+from registry import Registry
 
 
-class Enemy(pygame.sprite.Sprite):
+class Enemy(pygame.sprite.DirtySprite):
     # ---- Static variables ----
+    # Drawing layer
+    _layer = 1
     # Max speed
     ENEMYMAXSPEED = 100.0
     # Variable for loading enemy picture in. Require module which import Enemy to initialize this variable
     image = []
-    # Dictionary over all enemies
-    enemies = {}
-    # Number of bird
-    number = 0
+    # Registry over all living enemies, numbers of killed enemies are reused
+    enemies = Registry()
+    # One mask per image shared by all enemies
+    masks = {}
+    # EnemyPool recycling killed enemies, see Enemy.spawn
+    pool = None
+    # Random number generator of the game (random.Random), the random module if no game set one
+    rng = random
+    # EnemyWorld new enemies are attached to. None means every Enemy updates itself
+    engine = None
+    # Show walls and detection with the border images, switched off when the frame rate drops
+    tint = True
+    # ---- Attributes stored in the EnemyWorld while attached ----
+    x_pos = WorldField("x")
+    y_pos = WorldField("y")
+    vx = WorldField("vx")
+    vy = WorldField("vy")
+    detected = WorldField("detected")
 
     def __init__(self, start_pos=(50, 50), game_display=pygame.Surface):
-        pygame.sprite.Sprite.__init__(self, self.groups)
+        pygame.sprite.DirtySprite.__init__(self)
+        # World this enemy is attached to and its index in the world arrays
+        self.world = None
+        self.world_index = None
+        self.number = None
+        self.reset(start_pos, game_display)
+
+    @classmethod
+    def spawn(cls, start_pos=(50, 50), game_display=pygame.Surface):
+        """
+        Enemy recycled from the pool, or a new one if there is no pool or it is empty
+        :return: Enemy
+        """
+        if cls.pool is not None:
+            return cls.pool.acquire(start_pos, game_display)
+        return cls(start_pos, game_display)
+
+    @classmethod
+    def mask_for(cls, image):
+        """
+        Mask of image, built once per image
+        :param image: surface
+        :return: pygame.mask.Mask
+        """
+        mask = cls.masks.get(image)
+        if mask is None:
+            mask = cls.masks[image] = pygame.mask.from_surface(image)
+        return mask
+
+    def reset(self, start_pos=(50, 50), game_display=pygame.Surface):
+        """
+        Put a new or recycled enemy into play
+        :param start_pos: where the enemy starts
+        :param game_display: surface or rect of the world the enemy is allowed to move in
+        :return: None
+        """
+        self.add(*self.groups)
+        self.dirty = 1
         # Save game display as a rectangular area object
-        self.area = game_display.get_rect()  # where the sprite is allowed to move
+        # where the sprite is allowed to move
+        self.area = pygame.Rect(game_display) if isinstance(game_display, pygame.Rect) else game_display.get_rect()
         # ---- Create variables for keeping track of sprite position ----
         self.x_pos = start_pos[0] * 1.0  # float
         self.y_pos = start_pos[1] * 1.0  # float
         self.speed_max = self.step_size()
         # Load normal image
         self.image = Enemy.image[0]
-        self.mask = pygame.mask.from_surface(self.image)
+        self.mask = Enemy.mask_for(self.image)
         # Save image size as a rectangular area object
         self.rect = self.image.get_rect(center=(round(self.x_pos), round(self.y_pos)))
+        # Radius for pygame.sprite.collide_circle, same value pygame would compute from the rect on every test
+        self.radius = 0.5 * math.hypot(self.rect.width, self.rect.height)
         # ---- Flag for Game Over
         self.new_speed("gauss")
         self.detected = False
         # ---- Update static variables -----
-        self.number = Enemy.number  # get my personal Enemy number
-        Enemy.number += 1  # increase the number for next Enemy
-        Enemy.enemies[self.number] = self  # store myself into the Enemy dictionary
-        #  print("my number %i Enemy number %i " % (self.number, Enemy.number))
+        self.number = Enemy.enemies.register(self)  # get my personal Enemy number
+        if Enemy.engine is not None:
+            Enemy.engine.add(self)  # position and speed are moved by the world from now on
+
+    def kill(self):
+        if self.number is None:
+            return  # already killed
+        # Detach from the world arrays
+        if self.world is not None:
+            self.world.remove(self)
+        # Free my number and hand myself back for reuse
+        Enemy.enemies.release(self.number)
+        self.number = None
+        # Call super method to remove enemy
+        pygame.sprite.Sprite.kill(self)
+        if Enemy.pool is not None:
+            Enemy.pool.release(self)
 
     def step_size(self):
         """
-        Return automatic step size
+        Return automatic step size, ENEMYMAXSPEED scaled by the aspect ratio of the area
         :return:
         """
-        return 100 * max(round(self.area.width / self.area.height), round(self.area.height / self.area.width))
+        return Enemy.ENEMYMAXSPEED * max(round(self.area.width / self.area.height), round(self.area.height / self.area.width))
 
     def new_speed(self, method="uniform"):
         """
         Calculate the new speed of Enemy sprite. Will not be 0.
         :return:
         """
-        random_direction = random.choice([-1, 1])  # +1 or -1
-        if method is "uniform":
-            self.vx = random_direction * random.random() * self.speed_max + random_direction
-            self.vy = random_direction * random.random() * self.speed_max + random_direction
-        elif method is "constant":
+        rng = Enemy.rng
+        random_direction = rng.choice([-1, 1])  # +1 or -1
+        if method == "uniform":
+            self.vx = random_direction * rng.random() * self.speed_max + random_direction
+            self.vy = random_direction * rng.random() * self.speed_max + random_direction
+        elif method == "constant":
             self.vx = random_direction * self.speed_max
             self.vy = random_direction * self.speed_max
-        elif method is "gauss":
-            self.vx = random_direction * random.gauss(0, 1) * self.speed_max + random_direction
-            self.vy = random_direction * random.gauss(0, 1) * self.speed_max + random_direction
+        elif method == "gauss":
+            self.vx = random_direction * rng.gauss(0, 1) * self.speed_max + random_direction
+            self.vy = random_direction * rng.gauss(0, 1) * self.speed_max + random_direction
 
     def update(self, seconds_passed):
         """
@@ -65,6 +138,9 @@ class Enemy(pygame.sprite.Sprite):
         This parameter represents the time passed since the last call to update()
         :return: None
         """
+        if self.world is not None:
+            return  # moved by EnemyWorld.update
+        old_center, old_image = self.rect.center, self.image
         # Move enemy to new position since last call: distance = speed * time
         self.x_pos += self.vx * seconds_passed
         self.y_pos += self.vy * seconds_passed
@@ -95,6 +171,11 @@ class Enemy(pygame.sprite.Sprite):
                 self.image = Enemy.image[2]  # blue rectangle
             else:
                 self.image = Enemy.image[0]  # normal bird image
+        if not Enemy.tint:
+            self.image = Enemy.image[0]
+        # -- Redraw only if something changed
+        if self.rect.center != old_center or self.image is not old_image:
+            self.dirty = 1
 
 if __name__ == '__main__':
     pygame.init()
@@ -1,10 +1,13 @@
 import math
 import pygame
+from registry import Registry
 
 
-class EnemyDetection(pygame.sprite.Sprite):
-    devices = {}
-    number = 0
+class EnemyDetection(pygame.sprite.DirtySprite):
+    # Drawing layer
+    _layer = 3
+    # Registry over all living detectors, numbers of killed detectors are reused
+    devices = Registry()
 
     def __init__(self, colour, starting_pos, size):
         """
@@ -13,7 +16,7 @@ class EnemyDetection(pygame.sprite.Sprite):
         :param starting_pos: Where to draw image and create hitbox
         :param size: [width, height] of area to draw circle on
         """
-        pygame.sprite.Sprite.__init__(self, self.groups)
+        pygame.sprite.DirtySprite.__init__(self, self.groups)
         self.colour_circle = colour  # Colour of detector
         init_x_pos, init_y_pos = round(starting_pos[0]), round(starting_pos[1])
         self.radius = round(size)  # for collide check
@@ -25,15 +28,13 @@ class EnemyDetection(pygame.sprite.Sprite):
         self.image = self.image.convert_alpha()
         self.rect = self.image.get_rect(center=(init_x_pos, init_y_pos))
         self.remove = False
-        self.number = EnemyDetection.number  # get my personal Enemy number
-        EnemyDetection.number += 1  # increase the number for next Enemy
-        EnemyDetection.devices[self.number] = self  # store myself into the Enemy dictionary
+        self.number = EnemyDetection.devices.register(self)  # get my personal detector number
 
     def kill(self):
-        # Remove object from dictionary
-        EnemyDetection.devices[self.number] = None  # kill object in sprite dictionary
-        # Reduce total number of active devices by 1
-        EnemyDetection.number -= 1
+        # Remove object from registry, its number is free for the next detector
+        if self.number is not None:
+            EnemyDetection.devices.release(self.number)
+            self.number = None
         # Call super method to remove object
         pygame.sprite.Sprite.kill(self)
 
@@ -41,4 +42,6 @@ class EnemyDetection(pygame.sprite.Sprite):
         # -- Check if Game Over --
         if self.remove:
             self.kill()  # Game over
-        self.rect.center = player_pos
+        if self.rect.center != tuple(player_pos):
+            self.rect.center = player_pos
+            self.dirty = 1
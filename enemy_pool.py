@@ -0,0 +1,41 @@
+class EnemyPool:
+    """
+    Recycles killed enemies so spawn storms and new games do not allocate new sprites.
+    Enemy.kill() hands the sprite back with release(), acquire() resets a free one to a new position.
+    """
+
+    def __init__(self, factory, maxsize=100000):
+        """
+        Constructor
+        :param factory: class creating new enemies when the pool is empty, called with (start_pos, game_display)
+        :param maxsize: largest number of free enemies kept
+        """
+        self.factory = factory
+        self.maxsize = maxsize
+        self.free = []
+
+    def __len__(self):
+        return len(self.free)
+
+    def acquire(self, start_pos, game_display):
+        """
+        Free enemy reset to start_pos, or a new one if the pool is empty
+        :return: Enemy
+        """
+        if self.free:
+            enemy = self.free.pop()
+            enemy.reset(start_pos, game_display)
+            return enemy
+        return self.factory(start_pos, game_display)
+
+    def release(self, enemy):
+        """
+        Keep a killed enemy for reuse
+        :param enemy: Enemy removed from all groups
+        :return: None
+        """
+        if len(self.free) < self.maxsize:
+            self.free.append(enemy)
+
+    def clear(self):
+        self.free.clear()
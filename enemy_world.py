@@ -0,0 +1,399 @@
+from spatial_hash import shape_reach
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, Enemy falls back to per sprite updates
+    np = None
+HAVE_NUMPY = np is not None
+
+
+class WorldField:
+    """
+    Descriptor exposing one column of an EnemyWorld as a sprite attribute.
+    While a sprite is attached to a world the value lives in the world arrays,
+    otherwise it is stored on the sprite itself in the attribute named with a leading underscore.
+    """
+
+    def __init__(self, column):
+        self.column = column
+
+    def __set_name__(self, owner, name):
+        self.name = "_" + name
+
+    def __get__(self, sprite, owner=None):
+        if sprite is None:
+            return self
+        if sprite.world is None:
+            return getattr(sprite, self.name)
+        return getattr(sprite.world, self.column)[sprite.world_index].item()
+
+    def __set__(self, sprite, value):
+        if sprite.world is None:
+            setattr(sprite, self.name, value)
+        else:
+            getattr(sprite.world, self.column)[sprite.world_index] = value
+
+
+class EnemyWorld:
+    """
+    Struct-of-arrays engine for Enemy movement.
+    Position, speed, detected flag and image state of every attached enemy are kept in contiguous numpy arrays
+    so that a whole frame is integrated, clamped and re-sampled in a few vectorized calls.
+    The Enemy sprites stay in their groups and only get their rect and image written back for drawing and collision.
+    """
+    # ---- Array name and type of every column ----
+    # px, py: position before the last update, renderx, rendery: rect center of the last interpolate(),
+    # lag: time passed since the enemy was last moved by update(active)
+    COLUMNS = {"x": "float64", "y": "float64", "vx": "float64", "vy": "float64", "speed_max": "float64",
+               "width": "int32", "height": "int32", "centerx": "int64", "centery": "int64", "radius": "float64",
+               "detected": "bool", "image_index": "int8",
+               "px": "float64", "py": "float64", "renderx": "int64", "rendery": "int64", "lag": "float64"}
+
+    def __init__(self, area, images, capacity=1024, seed=None):
+        """
+        Constructor
+        :param area: pygame.Rect in which the enemies are allowed to move
+        :param images: list of enemy images (normal, crashed into wall, detected), usually Enemy.image
+        :param capacity: initial size of the arrays, grows automatically
+        :param seed: seed for the random speed generator
+        """
+        if np is None:
+            raise ImportError("EnemyWorld requires numpy")
+        self.area = area
+        self.images = images
+        self.rng = np.random.default_rng(seed)
+        self.sprites = []  # sprite at each array index
+        self.count = 0
+        self.interpolated = False  # rects hold interpolated positions, see interpolate()
+        # Do not write rect and image back to the sprites on every update, see refresh()
+        self.lazy = False
+        # Show walls and detection with the border images, see Enemy.tint
+        self.tint = True
+        # ---- Grid broad phase, see index_cells() ----
+        self.cell_size = 64
+        self.grid_columns = self.grid_rows = 1
+        self.order = np.zeros(0, dtype=np.intp)  # enemies sorted by grid cell
+        self.sorted_cells = np.zeros(0, dtype=np.int64)  # grid cell of each enemy in order
+        self.reach = 0  # largest distance from an enemy center to the edge of its hitbox or circle
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        """
+        (Re)allocate the arrays keeping the state of the attached enemies
+        :param capacity: new number of slots
+        :return: None
+        """
+        for column, dtype in EnemyWorld.COLUMNS.items():
+            array = np.zeros(capacity, dtype=dtype)
+            if hasattr(self, column):
+                array[:self.count] = getattr(self, column)[:self.count]
+            setattr(self, column, array)
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.count
+
+    def add(self, enemy):
+        """
+        Attach enemy to the world. Its position, speed and detected flag are moved into the arrays.
+        :param enemy: Enemy sprite
+        :return: index of the enemy in the arrays
+        """
+        if self.count == self.capacity:
+            self._allocate(2 * self.capacity)
+        i = self.count
+        self.x[i], self.y[i] = self.px[i], self.py[i] = enemy.x_pos, enemy.y_pos
+        self.vx[i], self.vy[i] = enemy.vx, enemy.vy
+        self.detected[i] = enemy.detected
+        self.speed_max[i] = enemy.speed_max
+        self.width[i], self.height[i] = enemy.rect.size
+        self.radius[i] = enemy.radius
+        self.lag[i] = 0.0
+        self.centerx[i], self.centery[i] = self.renderx[i], self.rendery[i] = enemy.rect.center
+        self.image_index[i] = self.images.index(enemy.image) if enemy.image in self.images else 0
+        self.sprites.append(enemy)
+        self.count += 1
+        enemy.world, enemy.world_index = self, i
+        return i
+
+    def remove(self, enemy):
+        """
+        Detach enemy from the world. The last enemy is moved into the freed slot.
+        :param enemy: Enemy sprite attached to this world
+        :return: None
+        """
+        i, last = enemy.world_index, self.count - 1
+        # Hand the current state back to the sprite
+        state = (self.x[i].item(), self.y[i].item(), self.vx[i].item(), self.vy[i].item(), bool(self.detected[i]))
+        enemy.world, enemy.world_index = None, None
+        enemy.x_pos, enemy.y_pos, enemy.vx, enemy.vy, enemy.detected = state
+        if i != last:
+            for column in EnemyWorld.COLUMNS:
+                array = getattr(self, column)
+                array[i] = array[last]
+            moved = self.sprites[last]
+            self.sprites[i] = moved
+            moved.world_index = i
+        self.sprites.pop()
+        self.count -= 1
+
+    def clear_detected(self):
+        """
+        Set all enemies to not detected
+        :return: None
+        """
+        self.detected[:self.count] = False
+
+    def new_speed(self, index):
+        """
+        Vectorized version of Enemy.new_speed("gauss")
+        :param index: integer array of enemies that get a new speed
+        :return: None
+        """
+        k = len(index)
+        random_direction = self.rng.choice((-1.0, 1.0), size=k)
+        speed_max = self.speed_max[index]
+        self.vx[index] = random_direction * self.rng.standard_normal(k) * speed_max + random_direction
+        self.vy[index] = random_direction * self.rng.standard_normal(k) * speed_max + random_direction
+
+    def update(self, seconds_passed, active=None):
+        """
+        Move all enemies, the vectorized counterpart of Enemy.update
+        :param seconds_passed: time passed since last call
+        :param active: boolean array of the enemies to move, None moves all. The others save up the time passed
+        and move that far when they are active again
+        :return: None
+        """
+        n = self.count
+        if n == 0:
+            return
+        self.px[:n], self.py[:n] = self.x[:n], self.y[:n]
+        if active is None:
+            rows = slice(0, n)
+        else:
+            lag = self.lag[:n]
+            lag += seconds_passed
+            rows = np.flatnonzero(active)
+            seconds_passed = lag[rows]
+            lag[rows] = 0.0
+        # views of the arrays when all enemies move, copies written back at the end otherwise
+        x, y, vx, vy = self.x[rows], self.y[rows], self.vx[rows], self.vy[rows]
+        # Move enemy to new position since last call: distance = speed * time
+        x += vx * seconds_passed
+        y += vy * seconds_passed
+        # ---- Updated coordinates for sprite hitbox
+        centerx, centery = np.round(x).astype(np.int64), np.round(y).astype(np.int64)
+        width, height = self.width[rows], self.height[rows]
+        left, top = centerx - width // 2, centery - height // 2
+        area = self.area
+        outside = ((left < area.left) | (top < area.top) |
+                   (left + width > area.right) | (top + height > area.bottom))
+        # -- crashed into wall: clamp position and calculate a new speed
+        half_width, half_height = width / 2, height / 2
+        x[outside] = np.clip(x, area.left + half_width, area.right - half_width)[outside]
+        y[outside] = np.clip(y, area.top + half_height, area.bottom - half_height)[outside]
+        if active is not None:
+            self.x[rows], self.y[rows] = x, y
+        crashed = np.flatnonzero(outside) if active is None else rows[outside]
+        if len(crashed):
+            self.new_speed(crashed)
+        if self.tint:
+            image_index = np.where(outside, 1, np.where(self.detected[rows], 2, 0)).astype(np.int8)
+        else:
+            image_index = np.zeros(len(x), dtype=np.int8)
+        self.sync(centerx, centery, image_index, rows)
+
+    def sync(self, centerx, centery, image_index, rows=None):
+        """
+        Write hitbox and image back to the sprites that moved or changed image and mark them dirty.
+        A lazy world only stores them in the arrays.
+        :param centerx: integer array of rect centers
+        :param centery: integer array of rect centers
+        :param image_index: image of each enemy
+        :param rows: enemies the values belong to (slice or integer array), None for all
+        :return: None
+        """
+        if rows is None:
+            rows = slice(0, self.count)
+        if not self.lazy:
+            sprites, images = self.sprites, self.images
+            moved = np.flatnonzero((centerx != self.centerx[rows]) | (centery != self.centery[rows]))
+            index = moved if isinstance(rows, slice) else rows[moved]
+            for i, center in zip(index.tolist(), zip(centerx[moved].tolist(), centery[moved].tolist())):
+                sprite = sprites[i]
+                sprite.rect.center = center
+                sprite.dirty = 1
+            changed = np.flatnonzero(image_index != self.image_index[rows])
+            index = changed if isinstance(rows, slice) else rows[changed]
+            for i, image in zip(index.tolist(), image_index[changed].tolist()):
+                sprite = sprites[i]
+                sprite.image = images[image]
+                sprite.dirty = 1
+        self.centerx[rows], self.centery[rows] = centerx, centery
+        self.image_index[rows] = image_index
+
+    def refresh(self, rows):
+        """
+        Write hitbox and image of some enemies back to their sprites, for sprites read from a lazy world
+        :param rows: integer array of enemies
+        :return: list of the sprites
+        """
+        sprites, images = self.sprites, self.images
+        refreshed = []
+        for i, cx, cy, image in zip(rows.tolist(), self.centerx[rows].tolist(), self.centery[rows].tolist(),
+                                    self.image_index[rows].tolist()):
+            sprite = sprites[i]
+            sprite.rect.center = (cx, cy)
+            sprite.image = images[image]
+            refreshed.append(sprite)
+        return refreshed
+
+    def visible(self, view, alpha=None):
+        """
+        Images and window positions of the enemies inside the view, read from the arrays without touching the sprites
+        :param view: pygame.Rect of the world shown in the window
+        :param alpha: position between the last two updates like interpolate(), None for the current position
+        :return: list of (image, (x, y)) for Surface.blits
+        """
+        n = self.count
+        if alpha is None:
+            centerx, centery = self.centerx[:n], self.centery[:n]
+        else:
+            px, py = self.px[:n], self.py[:n]
+            centerx = np.round(px + (self.x[:n] - px) * alpha).astype(np.int64)
+            centery = np.round(py + (self.y[:n] - py) * alpha).astype(np.int64)
+        width, height = self.width[:n], self.height[:n]
+        left, top = centerx - width // 2, centery - height // 2
+        rows = np.flatnonzero((left < view.right) & (view.left < left + width) &
+                              (top < view.bottom) & (view.top < top + height))
+        images = self.images
+        return [(images[image], (x, y)) for image, x, y in zip(self.image_index[rows].tolist(),
+                                                               (left[rows] - view.x).tolist(),
+                                                               (top[rows] - view.y).tolist())]
+
+    def index_cells(self, cell_size=64):
+        """
+        Sort the enemies by the grid cell of their rect center, so near() only visits the cells around a rect.
+        The order of the last call is sorted again: enemies move little between two ticks, so the stable sort
+        (timsort) runs over an almost sorted array in close to linear time.
+        The index holds until enemies move, are added or removed, call it again before the next near().
+        :param cell_size: width and height of a grid cell in pixels
+        :return: None
+        """
+        n = self.count
+        area = self.area
+        self.cell_size = cell_size
+        self.grid_columns = max(1, -(-area.width // cell_size))
+        self.grid_rows = max(1, -(-area.height // cell_size))
+        columns = np.clip((self.centerx[:n] - area.left) // cell_size, 0, self.grid_columns - 1)
+        rows = np.clip((self.centery[:n] - area.top) // cell_size, 0, self.grid_rows - 1)
+        cells = rows * self.grid_columns + columns
+        order = self.order
+        if len(order) == n:
+            order = order[np.argsort(cells[order], kind="stable")]
+        else:
+            order = np.argsort(cells, kind="stable")
+        self.order, self.sorted_cells = order, cells[order]
+        if n:
+            self.reach = shape_reach(self.radius[:n].max().item(), self.width[:n].max().item(),
+                                     self.height[:n].max().item())
+
+    def near(self, rect):
+        """
+        Enemies whose center is in a grid cell the hitbox or circle of an enemy touching rect can reach from,
+        from the index of the last index_cells(). A superset of the hits, pass it to rect_hits or circle_hits.
+        :param rect: pygame.Rect, for a circle the rect around it
+        :return: sorted integer array of enemies
+        """
+        size, reach, columns = self.cell_size, self.reach, self.grid_columns
+        area = self.area
+        left = min(max((rect.left - reach - area.left) // size, 0), columns - 1)
+        right = min(max((rect.right + reach - area.left) // size, 0), columns - 1)
+        top = min(max((rect.top - reach - area.top) // size, 0), self.grid_rows - 1)
+        bottom = min(max((rect.bottom + reach - area.top) // size, 0), self.grid_rows - 1)
+        # The cells of one grid row are consecutive in the sorted order, one slice per row
+        first = np.arange(top, bottom + 1) * columns
+        starts = np.searchsorted(self.sorted_cells, first + left)
+        stops = np.searchsorted(self.sorted_cells, first + right, side="right")
+        order = self.order
+        return np.sort(np.concatenate([order[start:stop] for start, stop in zip(starts.tolist(), stops.tolist())]))
+
+    def circle_hits(self, center, radius, rows=None):
+        """
+        Enemies touching a circle, the test of pygame.sprite.collide_circle
+        :param center: center of the circle
+        :param radius: radius of the circle
+        :param rows: integer array of the enemies to test, e.g. from near(), None tests all
+        :return: integer array of enemies
+        """
+        index = slice(0, self.count) if rows is None else rows
+        dx = self.centerx[index] - center[0]
+        dy = self.centery[index] - center[1]
+        hits = np.flatnonzero(dx * dx + dy * dy <= (self.radius[index] + radius) ** 2)
+        return hits if rows is None else rows[hits]
+
+    def rect_hits(self, rect, rows=None):
+        """
+        Enemies whose hitbox overlaps rect, the test of pygame.Rect.colliderect
+        :param rect: pygame.Rect
+        :param rows: integer array of the enemies to test, e.g. from near(), None tests all
+        :return: integer array of enemies
+        """
+        index = slice(0, self.count) if rows is None else rows
+        width, height = self.width[index], self.height[index]
+        left, top = self.centerx[index] - width // 2, self.centery[index] - height // 2
+        hits = np.flatnonzero((left < rect.right) & (rect.left < left + width) &
+                              (top < rect.bottom) & (rect.top < top + height))
+        return hits if rows is None else rows[hits]
+
+    def active_rows(self, centers, reach, interval, tick):
+        """
+        Enemies to move this tick when far away enemies move only every interval ticks
+        :param centers: positions the enemies near to are moved every tick, e.g. of the players
+        :param reach: (x, y) distance from a center within which an enemy is near
+        :param interval: ticks between two moves of a far enemy
+        :param tick: number of the tick, far enemies take turns so the same number moves every tick
+        :return: boolean array for update()
+        """
+        n = self.count
+        active = (np.arange(n) + tick) % interval == 0
+        centerx, centery = self.centerx[:n], self.centery[:n]
+        for x, y in centers:
+            active |= (np.abs(centerx - x) < reach[0]) & (np.abs(centery - y) < reach[1])
+        return active
+
+    def interpolate(self, alpha):
+        """
+        Move the rects to a position between the last two updates for drawing.
+        Sprites whose drawn position changes are marked dirty, restore() puts the simulated rects back.
+        :param alpha: 0 for the position before the last update, 1 for the current position
+        :return: None
+        """
+        n = self.count
+        if n == 0:
+            return
+        px, py = self.px[:n], self.py[:n]
+        centerx = np.round(px + (self.x[:n] - px) * alpha).astype(np.int64)
+        centery = np.round(py + (self.y[:n] - py) * alpha).astype(np.int64)
+        moved = (centerx != self.renderx[:n]) | (centery != self.rendery[:n])
+        offset = (centerx != self.centerx[:n]) | (centery != self.centery[:n])
+        sprites = self.sprites
+        for i in np.flatnonzero(moved | offset).tolist():
+            sprites[i].rect.center = (centerx[i].item(), centery[i].item())
+        for i in np.flatnonzero(moved).tolist():
+            sprites[i].dirty = 1
+        self.renderx[:n], self.rendery[:n] = centerx, centery
+        self.interpolated = True
+
+    def restore(self):
+        """
+        Put the rects moved by interpolate() back to the simulated position
+        :return: None
+        """
+        if not self.interpolated:
+            return
+        n = self.count
+        sprites = self.sprites
+        centerx, centery = self.centerx[:n], self.centery[:n]
+        for i in np.flatnonzero((self.renderx[:n] != centerx) | (self.rendery[:n] != centery)).tolist():
+            sprites[i].rect.center = (centerx[i].item(), centery[i].item())
+        self.interpolated = False
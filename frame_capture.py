@@ -0,0 +1,161 @@
+"""
+Capture of the game window to disk without slowing down the game.
+
+    python super_avoider.py --capture session.mp4   # ffmpeg pipe, raw frames in session.rgb without ffmpeg
+    python super_avoider.py --capture frames/       # PNG sequence
+    python super_avoider.py --capture session.rgb   # raw RGB24 frames
+    python replay.py session.rec --capture session.mp4
+
+Frames are copied into a ring of preallocated buffers and written by a background thread.
+When the writer falls behind and every buffer is taken the frame is dropped and counted instead of waiting.
+"""
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import warnings
+try:
+    import numpy as np
+except ImportError:  # numpy is optional for the game, but required here
+    np = None
+import pygame
+
+# ---- File extensions written with ffmpeg ----
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".webm", ".avi", ".mov", ".gif")
+
+
+class FrameCapture:
+    """
+    Ring of frame buffers filled from the screen and emptied by a writer thread
+    """
+
+    def __init__(self, path, size, fps=60, slots=8, fmt=None, block=False):
+        """
+        Constructor
+        :param path: output file, or directory for a PNG sequence
+        :param size: (width, height) of the captured surface
+        :param fps: frame rate written to video files
+        :param slots: number of frame buffers
+        :param fmt: "raw", "png" or "ffmpeg", None picks it from path
+        :param block: wait for a free buffer instead of dropping the frame, for offline rendering
+        """
+        if np is None:
+            raise ImportError("FrameCapture requires numpy")
+        self.path = path
+        self.width, self.height = size
+        self.fps = fps
+        self.fmt = fmt or FrameCapture.guess_format(path)
+        self.block = block
+        self.captured = 0  # frames handed to the writer
+        self.dropped = 0  # frames lost because every buffer was taken
+        self.written = 0  # frames on disk
+        self.error = None  # exception that stopped the writer
+        self.frames = np.empty((slots, self.height, self.width, 3), dtype=np.uint8)
+        self.free = queue.Queue()
+        for slot in range(slots):
+            self.free.put(slot)
+        self.filled = queue.Queue()
+        self._open()
+        self.thread = threading.Thread(target=self._write_loop, name="FrameCapture", daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def guess_format(path):
+        """
+        Output format for a path: ffmpeg for video files, png for directories, else raw
+        :param path: output path
+        :return: "raw", "png" or "ffmpeg"
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension in VIDEO_EXTENSIONS:
+            return "ffmpeg"
+        if extension == "" or path.endswith(os.sep) or extension == ".png":
+            return "png"
+        return "raw"
+
+    def _open(self):
+        self.file = self.process = None
+        if self.fmt == "ffmpeg" and shutil.which("ffmpeg") is None:
+            # Keep the frames instead of stopping the game, close() prints the command to convert them later
+            raw = os.path.splitext(self.path)[0] + ".rgb"
+            warnings.warn("ffmpeg not found, writing raw frames to %s instead of %s" % (raw, self.path))
+            self.path, self.fmt = raw, "raw"
+        if self.fmt == "raw":
+            self.file = open(self.path, "wb")
+        elif self.fmt == "png":
+            self.directory = os.path.splitext(self.path)[0] if self.path.lower().endswith(".png") else self.path
+            os.makedirs(self.directory, exist_ok=True)
+        elif self.fmt == "ffmpeg":
+            command = ["ffmpeg", "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgb24",
+                       "-s", "%ix%i" % (self.width, self.height), "-r", str(self.fps), "-i", "-",
+                       "-pix_fmt", "yuv420p", self.path]
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+            self.file = self.process.stdin
+        else:
+            raise ValueError("Unknown capture format %s" % self.fmt)
+
+    def capture(self, surface):
+        """
+        Copy surface into a free buffer and queue it for writing
+        :param surface: surface of the capture size, usually the screen
+        :return: True if the frame was queued, False if it was dropped
+        """
+        try:
+            slot = self.free.get(block=self.block and self.error is None and self.thread.is_alive())
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        # pixels3d is a view of the surface pixels indexed [x, y], one copy puts them in [y, x] order
+        pixels = pygame.surfarray.pixels3d(surface)
+        np.copyto(self.frames[slot], pixels.transpose(1, 0, 2))
+        del pixels  # unlock the surface
+        self.filled.put((slot, self.captured))
+        self.captured += 1
+        return True
+
+    def _write_loop(self):
+        """
+        Writer thread: write queued frames until close() sends None
+        :return: None
+        """
+        while True:
+            item = self.filled.get()
+            if item is None:
+                return
+            slot, number = item
+            try:
+                if self.error is None:
+                    self._write(self.frames[slot], number)
+                    self.written += 1
+            except (OSError, pygame.error) as error:
+                self.error = error  # keep emptying the queue so the game never waits on a dead writer
+            self.free.put(slot)
+
+    def _write(self, frame, number):
+        if self.fmt == "png":
+            image = pygame.image.frombuffer(frame, (self.width, self.height), "RGB")
+            pygame.image.save(image, os.path.join(self.directory, "frame%06i.png" % number))
+        else:
+            self.file.write(frame)  # the buffer protocol writes the array without copying it to bytes
+
+    def close(self):
+        """
+        Write the queued frames and close the output
+        :return: None
+        """
+        if self.thread is None:
+            return
+        self.filled.put(None)
+        self.thread.join()
+        self.thread = None
+        if self.file is not None:
+            self.file.close()
+        if self.process is not None:
+            self.process.wait()
+        if self.error is not None:
+            print("Capture stopped:", self.error)
+        print("%i frames written to %s (%s), %i dropped" % (self.written, self.path, self.fmt, self.dropped))
+        if self.fmt == "raw":
+            print("Convert with: ffmpeg -f rawvideo -pix_fmt rgb24 -s %ix%i -r %i -i %s out.mp4" %
+                  (self.width, self.height, self.fps, self.path))
@@ -0,0 +1,86 @@
+class FrameGovernor:
+    """
+    Keeps the frame time inside the budget of the frame rate by trading detail for speed.
+    The time a frame spends working (without waiting for the clock) is smoothed and compared to the budget.
+    When it comes close to the budget the game is degraded one level further, when there is headroom again it
+    goes back one level. Every level includes the ones below it:
+
+        0 full          everything at full detail
+        1 text          caption and HUD text updated twice per second
+        2 spawn         enemies spawned with the mouse at most SPAWN_RATE per second
+        3 far           enemies far from every player move every other tick
+        4 tint          enemies keep their image, no red wall or blue detected border
+        5 rect          detectors and crashes are tested with rects instead of circles and masks
+    """
+    LEVELS = ("full", "text", "spawn", "far", "tint", "rect")
+    FULL, TEXT, SPAWN, FAR, TINT, RECT = range(len(LEVELS))
+
+    def __init__(self, fps=60, high=0.85, low=0.5, patience=30, recovery=180, max_level=RECT):
+        """
+        Constructor
+        :param fps: frame rate, the budget of a frame is 1000 / fps milliseconds
+        :param high: fraction of the budget above which the game is degraded one more level
+        :param low: fraction of the budget below which one level is recovered
+        :param patience: frames to wait after a level change before degrading again
+        :param recovery: frames the load must stay below low before a level is recovered
+        :param max_level: highest level used, 0 never degrades the game
+        """
+        self.budget = 1000.0 / fps
+        self.high = high
+        self.low = low
+        self.patience = patience
+        self.recovery = self.base_recovery = recovery
+        self.max_level = max_level
+        self.smoothing = 2.0 / (patience + 1)
+        self.level = FrameGovernor.FULL
+        self.load = 0.0  # smoothed frame time as a fraction of the budget
+        self.changes = 0  # level changes since start
+        self._held = 0  # frames since the last level change
+        self._idle = 0  # frames in a row below low
+        self._recovered = None  # frames since the last recovery, None before the first one
+
+    @property
+    def name(self):
+        return FrameGovernor.LEVELS[self.level]
+
+    def observe(self, milliseconds):
+        """
+        Add the working time of one frame and change the level if needed
+        :param milliseconds: time of the frame without the wait of the clock
+        :return: level
+        """
+        self.load += (milliseconds / self.budget - self.load) * self.smoothing
+        self._held += 1
+        if self._recovered is not None:
+            self._recovered += 1
+        self._idle = self._idle + 1 if self.load < self.low else 0
+        if self.load > self.high and self._held >= self.patience and self.level < self.max_level:
+            if self._recovered is not None and self._recovered < self.recovery:
+                # Recovered too early, the level is needed: wait longer before the next recovery
+                self.recovery = min(self.recovery * 2, 8 * self.base_recovery)
+            self.set_level(self.level + 1)
+        elif self._idle >= self.recovery and self.level > FrameGovernor.FULL:
+            self.set_level(self.level - 1)
+            self._recovered = 0
+        elif self._held >= 8 * self.base_recovery:
+            self.recovery = self.base_recovery  # stable for a long time
+        return self.level
+
+    def set_level(self, level):
+        """
+        Change the level, e.g. to the level of a recorded tick
+        :param level: 0 to len(LEVELS) - 1
+        :return: None
+        """
+        if level != self.level:
+            self.level = level
+            self.changes += 1
+            self._held = 0
+            self._idle = 0
+
+    def status(self):
+        """
+        Text for the caption and the HUD
+        :return: string
+        """
+        return "level %i (%s) load %.0f%%" % (self.level, self.name, 100 * self.load)
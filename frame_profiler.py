@@ -0,0 +1,166 @@
+import csv
+import gc
+import time
+import weakref
+from array import array
+
+
+class FrameProfiler:
+    """
+    Per frame timing of the phases of the main loop.
+    The time since the previous mark is added to a phase with mark(phase), so the phases of a frame add up to the
+    frame time. The last `size` frames are kept in a ring buffer of fixed size arrays.
+    Time spent in the garbage collector is recorded separately in "gc" (it is also part of the phase it ran in).
+    The collector only holds a weak reference to the profiler, a profiler that is no longer used unregisters itself.
+    """
+    PHASES = ("events", "collision", "update", "draw", "flip")
+    COLUMNS = PHASES + ("gc", "frame")
+    COUNTS = ("enemies", "players")
+
+    def __init__(self, size=600):
+        """
+        Constructor
+        :param size: number of frames kept
+        """
+        self.size = size
+        self.frames = 0  # frames recorded since start
+        self.samples = {column: array("q", bytes(8 * size)) for column in FrameProfiler.COLUMNS}
+        self.counts = {column: array("q", bytes(8 * size)) for column in FrameProfiler.COUNTS}
+        self._current = dict.fromkeys(FrameProfiler.COLUMNS, 0)
+        self._frame_start = self._last = time.perf_counter_ns()
+        self._gc_start = 0
+        self._gc_hook = FrameProfiler._weak_hook(weakref.WeakMethod(self._gc_callback))
+        gc.callbacks.append(self._gc_hook)
+
+    @staticmethod
+    def _weak_hook(method):
+        """
+        Garbage collector callback calling method while its profiler is alive
+        :param method: weakref.WeakMethod of FrameProfiler._gc_callback
+        :return: function
+        """
+        def hook(phase, info):
+            callback = method()
+            if callback is not None:
+                callback(phase, info)
+        return hook
+
+    def close(self):
+        """
+        Stop recording garbage collections
+        :return: None
+        """
+        if self._gc_hook in gc.callbacks:
+            gc.callbacks.remove(self._gc_hook)
+
+    def __del__(self):
+        self.close()
+
+    def _gc_callback(self, phase, info):
+        if phase == "start":
+            self._gc_start = time.perf_counter_ns()
+        else:
+            self._current["gc"] += time.perf_counter_ns() - self._gc_start
+
+    def begin_frame(self):
+        """
+        Start timing a new frame
+        :return: None
+        """
+        self._frame_start = self._last = time.perf_counter_ns()
+        current = self._current
+        for column in current:
+            current[column] = 0
+
+    def mark(self, phase):
+        """
+        Add the time since the previous mark to phase
+        :param phase: one of PHASES
+        :return: None
+        """
+        now = time.perf_counter_ns()
+        self._current[phase] += now - self._last
+        self._last = now
+
+    def end_frame(self, enemies=0, players=0):
+        """
+        Store the timings of the current frame in the ring buffer
+        :param enemies: number of enemies in this frame
+        :param players: number of players in this frame
+        :return: None
+        """
+        i = self.frames % self.size
+        self._current["frame"] = time.perf_counter_ns() - self._frame_start
+        for column, value in self._current.items():
+            self.samples[column][i] = value
+        self.counts["enemies"][i] = enemies
+        self.counts["players"][i] = players
+        self.frames += 1
+
+    def __len__(self):
+        return min(self.frames, self.size)
+
+    def rows(self):
+        """
+        Recorded frames from oldest to newest
+        :return: generator of (frame number, dictionary of column -> value)
+        """
+        columns = FrameProfiler.COLUMNS + FrameProfiler.COUNTS
+        arrays = [self.samples[column] for column in FrameProfiler.COLUMNS]
+        arrays += [self.counts[column] for column in FrameProfiler.COUNTS]
+        for frame in range(self.frames - len(self), self.frames):
+            i = frame % self.size
+            yield frame, {column: values[i] for column, values in zip(columns, arrays)}
+
+    def last(self, column="frame"):
+        """
+        Value of the newest recorded frame
+        :param column: one of COLUMNS
+        :return: milliseconds
+        """
+        if self.frames == 0:
+            return 0.0
+        return self.samples[column][(self.frames - 1) % self.size] / 1e6
+
+    def percentile(self, q, column="frame"):
+        """
+        Percentile of a column over the recorded frames
+        :param q: percentile between 0 and 100
+        :param column: one of COLUMNS
+        :return: milliseconds
+        """
+        n = len(self)
+        if n == 0:
+            return 0.0
+        samples = sorted(self.samples[column][:n])
+        return samples[min(n - 1, int(q / 100.0 * n))] / 1e6
+
+    def hud_lines(self):
+        """
+        Text for the on-screen overlay
+        :return: list of strings
+        """
+        n = len(self)
+        if n == 0:
+            return ["no frames recorded"]
+        last = (self.frames - 1) % self.size
+        lines = ["frame p50 %.2f ms  p99 %.2f ms" % (self.percentile(50), self.percentile(99)),
+                 "enemies %i  players %i" % (self.counts["enemies"][last], self.counts["players"][last])]
+        for column in FrameProfiler.PHASES + ("gc",):
+            lines.append("%-9s p50 %.2f  p99 %.2f" % (column, self.percentile(50, column), self.percentile(99, column)))
+        return lines
+
+    def write_csv(self, path):
+        """
+        Dump the ring buffer to a CSV file, times in microseconds
+        :param path: file name
+        :return: path
+        """
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("frame",) + tuple(column + "_us" for column in FrameProfiler.COLUMNS)
+                            + FrameProfiler.COUNTS)
+            for frame, row in self.rows():
+                writer.writerow([frame] + [row[column] / 1000.0 for column in FrameProfiler.COLUMNS]
+                                + [row[column] for column in FrameProfiler.COUNTS])
+        return path
@@ -1,39 +1,53 @@
 import pygame
+from registry import Registry
 
 
-class Player(pygame.sprite.Sprite):
+class Player(pygame.sprite.DirtySprite):
     # Static variables
+    # Drawing layer
+    _layer = 2
     MAXSPEED = 100.0
+    # Frames per second the step size was tuned for, a player moves step_size * STEP_RATE pixels per second
+    STEP_RATE = 60
     # Variable for loading player picture. Require module that import player.py to initialize this variable
     image = []
-    # Dictionary
-    players = {}
-    # tag
-    number = 0
+    # Registry over all living players, numbers of killed players are reused
+    players = Registry()
+    # One mask per image shared by all players
+    masks = {}
+    # ---- Input bits of Player.controls ----
+    UP, DOWN, LEFT, RIGHT = 1, 2, 4, 8
+    # Movement input applied to all players. None means the keyboard is read
+    controls = None
 
     def __init__(self, start_pos=(50, 50), game_display=pygame.Surface):
-        pygame.sprite.Sprite.__init__(self, self.groups)
+        pygame.sprite.DirtySprite.__init__(self, self.groups)
         # Save game display as a rectangular area object
-        self.area = game_display.get_rect()  # where the sprite is allowed to move
+        # where the sprite is allowed to move, game_display is the surface or the rect of the world
+        self.area = pygame.Rect(game_display) if isinstance(game_display, pygame.Rect) else game_display.get_rect()
         # Score variable for each player
         self.score = 0
         # ---- Create variables for keeping track of sprite position ----
         self.x_pos = start_pos[0] * 1.0  # float
         self.y_pos = start_pos[1] * 1.0  # float
         self.step_size = self.auto_step_size()
+        self.speed = self.step_size * Player.STEP_RATE  # pixels per second
         # Load normal image
         self.image = Player.image[0]
-        self.mask = pygame.mask.from_surface(self.image)
+        self.mask = Player.masks.get(self.image)
+        if self.mask is None:
+            self.mask = Player.masks[self.image] = pygame.mask.from_surface(self.image)
         # ---- Create hitbox the size of the player image at it's starting location
         self.rect = self.image.get_rect(center=(round(self.x_pos), round(self.y_pos)))
         self.radius = max(self.rect.width, self.rect.height) * 2.0
         # ---- Flag for Game Over
         self.remove = False
+        # EnemyDetection following this player
+        self.detector = None
+        # Input bits chosen by an autopilot for this player, None follows Player.controls
+        self.pilot = None
         # ---- Update static variables -----
-        self.number = Player.number  # get my personal Enemy number
-        Player.number += 1  # increase the number for next Enemy
-        Player.players[self.number] = self  # store myself into the Enemy dictionary
-        #  print("my number %i Player number %i " % (self.number, Player.number))
+        self.number = Player.players.register(self)  # get my personal Player number
 
     def collide(self, spriteGroup):
         if pygame.sprite.spritecollide(self, spriteGroup, False):
@@ -50,10 +64,10 @@ class Player(pygame.sprite.Sprite):
     def kill(self):
         # Show Game Over image
         self.image = Player.image[1]
-        # Remove player from dictionary
-        Player.players[self.number] = None  # kill Player in sprite dictionary
-        # Reduce total number of players by 1
-        Player.number -= 1
+        # Remove player from registry, its number is free for the next player
+        if self.number is not None:
+            Player.players.release(self.number)
+            self.number = None
         # Call super method to remove player
         pygame.sprite.Sprite.kill(self)
 
@@ -64,17 +78,34 @@ class Player(pygame.sprite.Sprite):
         """
         return 10 * max(round(self.area.width / self.area.height), round(self.area.height / self.area.width))
 
-    def move(self, pixels=10):
-        """ Handles Keys """
+    @staticmethod
+    def keyboard():
+        """
+        Arrow keys held down as input bits
+        :return: integer of UP, DOWN, LEFT and RIGHT bits
+        """
         key = pygame.key.get_pressed()
-        # distance moved in 1 frame, try changing it
-        if key[pygame.K_DOWN]:  # down key
+        return ((key[pygame.K_UP] and Player.UP) | (key[pygame.K_DOWN] and Player.DOWN) |
+                (key[pygame.K_LEFT] and Player.LEFT) | (key[pygame.K_RIGHT] and Player.RIGHT))
+
+    def move(self, seconds_passed):
+        """
+        Move in the direction of the arrow keys held down, or of the autopilot
+        :param seconds_passed: time passed since the last call
+        :return: None
+        """
+        controls = self.pilot
+        if controls is None:
+            controls = Player.keyboard() if Player.controls is None else Player.controls
+        # distance = speed * time, so the player is as fast at any frame rate
+        pixels = self.speed * seconds_passed
+        if controls & Player.DOWN:  # down key
             self.y_pos += pixels  # move down
-        elif key[pygame.K_UP]:  # up key
+        elif controls & Player.UP:  # up key
             self.y_pos -= pixels  # move up
-        if key[pygame.K_RIGHT]:  # right key
+        if controls & Player.RIGHT:  # right key
             self.x_pos += pixels  # move right
-        elif key[pygame.K_LEFT]:  # left key
+        elif controls & Player.LEFT:  # left key
             self.x_pos -= pixels  # move left
 
     def update(self, time_alive):
@@ -88,8 +119,9 @@ class Player(pygame.sprite.Sprite):
         if self.remove:
             self.image = Player.image[1]
             self.kill()  # Game over
+        old_center, old_image = self.rect.center, self.image
         # -- Move player --
-        self.move(pixels=self.step_size)
+        self.move(time_alive)
         # ---- Updated coordinates for player hitbox
         self.rect.centerx = round(self.x_pos, 0)
         self.rect.centery = round(self.y_pos, 0)
@@ -107,6 +139,9 @@ class Player(pygame.sprite.Sprite):
                 self.y_pos = self.area.bottom - self.rect.height / 2
             if (self.y_pos - self.rect.height / 2) < self.area.top:
                 self.y_pos = self.area.top + self.rect.height / 2
+        # -- Redraw only if something changed
+        if self.rect.center != old_center or self.image is not old_image:
+            self.dirty = 1
         # -- Update score (i.e time alive) --
         self.score += time_alive
 
@@ -0,0 +1,93 @@
+import heapq
+
+
+class Registry:
+    """
+    Numbered objects with reuse of freed numbers.
+    register() hands out the lowest free number, so the table never grows beyond the largest number of objects
+    alive at the same time and a number is never shared by two living objects.
+    """
+
+    def __init__(self):
+        self.slots = []  # number -> object or None
+        self.free = []  # heap of released numbers
+        self.count = 0  # living objects
+
+    def register(self, obj):
+        """
+        Store obj under the lowest free number
+        :param obj: object to store
+        :return: number of obj
+        """
+        if self.free:
+            number = heapq.heappop(self.free)
+            self.slots[number] = obj
+        else:
+            number = len(self.slots)
+            self.slots.append(obj)
+        self.count += 1
+        return number
+
+    def assign(self, number, obj):
+        """
+        Store obj under a given free number, e.g. to restore a saved game
+        :param number: number that is not in use
+        :param obj: object to store
+        :return: number
+        """
+        if number < len(self.slots):
+            if self.slots[number] is not None:
+                raise ValueError("Number %i is in use" % number)
+            self.free.remove(number)
+            heapq.heapify(self.free)
+        else:
+            for free in range(len(self.slots), number):
+                heapq.heappush(self.free, free)
+            self.slots.extend([None] * (number + 1 - len(self.slots)))
+        self.slots[number] = obj
+        self.count += 1
+        return number
+
+    def release(self, number):
+        """
+        Free number for the next register() call
+        :param number: number returned by register()
+        :return: None
+        """
+        if self.slots[number] is None:
+            return
+        self.slots[number] = None
+        heapq.heappush(self.free, number)
+        self.count -= 1
+        # -- drop trailing free slots so the table shrinks again after a spawn storm
+        if number == len(self.slots) - 1:
+            while self.slots and self.slots[-1] is None:
+                self.slots.pop()
+            self.free = [n for n in self.free if n < len(self.slots)]
+            heapq.heapify(self.free)
+
+    def __getitem__(self, number):
+        obj = self.slots[number] if 0 <= number < len(self.slots) else None
+        if obj is None:
+            raise KeyError(number)
+        return obj
+
+    def get(self, number, default=None):
+        try:
+            return self[number]
+        except KeyError:
+            return default
+
+    def __contains__(self, number):
+        return self.get(number) is not None
+
+    def __len__(self):
+        return self.count
+
+    def values(self):
+        return [obj for obj in self.slots if obj is not None]
+
+    def clear(self):
+        self.slots.clear()
+        self.free.clear()
+        self.count = 0
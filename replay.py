@@ -0,0 +1,175 @@
+"""
+Recording and replay of game sessions.
+
+    python super_avoider.py --record session.rec
+    python replay.py session.rec
+    python replay.py session.rec --capture session.mp4
+
+A recording holds the seed of the game and one packed record per tick: the input bits (arrow keys, R, P and
+mouse spawn), the level of the frame governor, the time step and the mouse position. Hashes of the game state are stored at a fixed interval and
+checked while replaying, so a change in movement or collision code that alters a session is found immediately.
+A game steered by an autopilot stores the name and settings of the policy, and the ticks it steered are marked
+with PILOT. The replay creates the same policy and lets it decide again in those ticks.
+"""
+import argparse
+import struct
+import sys
+import time
+from player import Player
+
+# ---- Input bits of one tick ----
+UP, DOWN, LEFT, RIGHT = Player.UP, Player.DOWN, Player.LEFT, Player.RIGHT
+MOVE = UP | DOWN | LEFT | RIGHT
+RESPAWN = 16  # R pressed
+PAUSE = 32  # P pressed, informational only
+SPAWN = 64  # left mouse button held, spawn an enemy at the mouse position
+PILOT = 128  # the autopilot moved the players
+
+
+class ReplayError(Exception):
+    """
+    Raised when a replayed game does not match the recorded state
+    """
+
+
+class Recording:
+    """
+    Seed, per tick input and state hashes of one game
+    """
+    MAGIC = b"SAVR"
+    VERSION = 4
+    # magic, version, seed, enemies, players, hash interval, number of ticks, number of hashes, bytes of the autopilot
+    # description following the header
+    HEADER = struct.Struct("<4sHQIIIIII")
+    # input bits, governor level, seconds passed, mouse x, mouse y
+    TICK = struct.Struct("<BBdii")
+    # tick, state hash
+    HASH = struct.Struct("<I16s")
+
+    def __init__(self, seed, enemies=50, players=1, hash_interval=60):
+        """
+        Constructor
+        :param seed: seed of the recorded game
+        :param enemies: enemies spawned at the start of the game
+        :param players: players spawned at the start of the game
+        :param hash_interval: ticks between two stored state hashes
+        """
+        self.seed = seed
+        self.enemies = enemies
+        self.players = players
+        self.hash_interval = hash_interval
+        self.ticks = bytearray()
+        self.hashes = {}  # tick -> state hash
+        self.autopilot = None  # autopilot.describe() of the policy of the PILOT ticks
+
+    def __len__(self):
+        return len(self.ticks) // Recording.TICK.size
+
+    def record(self, bits, seconds_passed, mouse=(0, 0), level=0):
+        """
+        Append the input of one tick
+        :param bits: input bits
+        :param seconds_passed: time step of the tick
+        :param mouse: mouse position
+        :param level: level of the frame governor the tick ran at, see frame_governor.py
+        :return: None
+        """
+        self.ticks += Recording.TICK.pack(bits, level, seconds_passed, mouse[0], mouse[1])
+
+    def __iter__(self):
+        """
+        :return: iterator of (bits, level, seconds passed, mouse x, mouse y)
+        """
+        return Recording.TICK.iter_unpack(self.ticks)
+
+    def save(self, path):
+        autopilot = (self.autopilot or "").encode()
+        with open(path, "wb") as f:
+            f.write(Recording.HEADER.pack(Recording.MAGIC, Recording.VERSION, self.seed, self.enemies,
+                                          self.players, self.hash_interval, len(self), len(self.hashes),
+                                          len(autopilot)))
+            f.write(autopilot)
+            f.write(self.ticks)
+            for tick, digest in sorted(self.hashes.items()):
+                f.write(Recording.HASH.pack(tick, digest))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        (magic, version, seed, enemies, players, hash_interval, ticks, hashes,
+         autopilot) = Recording.HEADER.unpack_from(data)
+        if magic != Recording.MAGIC or version != Recording.VERSION:
+            raise ValueError("%s is not a version %i recording" % (path, Recording.VERSION))
+        recording = cls(seed, enemies, players, hash_interval)
+        offset = Recording.HEADER.size + autopilot
+        if autopilot:
+            recording.autopilot = data[Recording.HEADER.size:offset].decode()
+        end = offset + ticks * Recording.TICK.size
+        recording.ticks = bytearray(data[offset:end])
+        for tick, digest in Recording.HASH.iter_unpack(data[end:end + hashes * Recording.HASH.size]):
+            recording.hashes[tick] = digest
+        return recording
+
+
+def replay(recording, game=None, check=True):
+    """
+    Play a recording again as fast as possible, without drawing
+    :param recording: Recording
+    :param game: headless SuperAvoider to replay in, created if None
+    :param check: compare the stored state hashes
+    :return: state of the game after the last tick, every tick is drawn if the game captures frames
+    """
+    if game is None:
+        from super_avoider import SuperAvoider
+        game = SuperAvoider(headless=True)
+    game.new_game(enemies=recording.enemies, players=recording.players, seed=recording.seed)
+    hashes = recording.hashes if check else {}
+    pilot = None
+    if recording.autopilot is not None:
+        from autopilot import create
+        pilot = create(recording.autopilot)
+    autopilot = game.autopilot
+    try:
+        for bits, level, seconds_passed, mouse_x, mouse_y in recording:
+            game.governor.set_level(level)
+            game.autopilot = pilot if bits & PILOT else None
+            game.apply_input(bits, (mouse_x, mouse_y))
+            game.tick(seconds_passed)
+            if game.capture is not None:
+                game.draw()
+            digest = hashes.get(game.ticks)
+            if digest is not None and digest != game.state_hash():
+                raise ReplayError("State differs from the recording at tick %i" % game.ticks)
+    finally:
+        game.autopilot = autopilot
+    return game.state()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording")
+    parser.add_argument("--no-check", action="store_true", help="do not compare state hashes")
+    parser.add_argument("--capture", default=None, metavar="PATH",
+                        help="render the replay to a video (ffmpeg), .rgb file or PNG directory")
+    args = parser.parse_args(argv)
+    recording = Recording.load(args.recording)
+    from super_avoider import SuperAvoider
+    game = SuperAvoider(headless=True, capture=args.capture)
+    start = time.perf_counter()
+    try:
+        state = replay(recording, game, check=not args.no_check)
+    except ReplayError as error:
+        print(error)
+        return 1
+    finally:
+        game.close()
+    elapsed = time.perf_counter() - start
+    print("%i ticks (%.1f s of play) replayed in %.2f s, %i state hashes matched" %
+          (state["ticks"], state["time"], elapsed, 0 if args.no_check else len(recording.hashes)))
+    print("Scores:", state["scores"])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
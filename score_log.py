@@ -0,0 +1,312 @@
+"""
+Persistent scores of every finished game.
+
+    python super_avoider.py --scores scores.log
+    python batch_runner.py --games 100000 --scores scores.log
+    python score_log.py scores.log --top 10 --percentiles 50 90 99
+
+The log is an append-only file of fixed-width records behind a small header. Appending only copies the record into
+memory, a background thread writes and fsyncs the records in batches, so the frame loop never waits for the disk.
+Leaderboard and percentile queries use a sorted index of all scores in a second file (scores.log.idx), which is
+merged with the newer records every few thousand written scores. Scores not in the index yet are searched directly.
+"""
+import argparse
+import collections
+import os
+import struct
+import sys
+import threading
+import time
+try:
+    import numpy as np
+except ImportError:  # numpy is optional for the game, but required here
+    np = None
+
+# ---- Fields of one score, in file order ----
+Score = collections.namedtuple("Score", ("timestamp", "score", "duration", "seed", "player", "enemies"))
+
+
+class ScoreLog:
+    """
+    Append-only score file with a sorted index for top-k, rank and percentile queries
+    """
+    MAGIC = b"SASL"
+    INDEX_MAGIC = b"SASI"
+    VERSION = 1
+    # magic, version, size of a record, padding to 16 bytes so records stay aligned
+    HEADER = struct.Struct("<4sHH8x")
+    # unix time of the game over, score (seconds survived), game time, seed of the game, player number, enemies alive
+    RECORD = struct.Struct("<dddQII")
+    # magic, version, number of records in the index
+    INDEX_HEADER = struct.Struct("<4sHxxQ")
+
+    def __init__(self, path, flush_interval=1.0, batch=4096, rebuild_every=4096):
+        """
+        Constructor, opens or creates the log
+        :param path: log file, the index is written next to it
+        :param flush_interval: seconds between two writes of the appended scores at most
+        :param batch: appended scores that are written without waiting for flush_interval
+        :param rebuild_every: written scores that are merged into the index at once
+        """
+        if np is None:
+            raise ImportError("ScoreLog requires numpy")
+        self.path = path
+        self.index_path = path + ".idx"
+        self.flush_interval = flush_interval
+        self.batch = batch
+        self.rebuild_every = rebuild_every
+        self.dtype = np.dtype([(field, "<f8") for field in Score._fields[:3]] +
+                              [("seed", "<u8"), ("player", "<u4"), ("enemies", "<u4")])
+        self.error = None  # exception that stopped the writer
+        self._lock = threading.Condition()
+        self._pending = bytearray()  # appended, not written yet
+        self._unindexed = bytearray()  # appended, not in the index yet
+        self._closing = False
+        self._flushing = False
+        self._open()
+        self.thread = threading.Thread(target=self._write_loop, name="ScoreLog", daemon=True)
+        self.thread.start()
+
+    def _open(self):
+        """
+        Open the log for appending and bring the index up to date with the records on disk
+        :return: None
+        """
+        size = self.RECORD.size
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < self.HEADER.size:
+            with open(self.path, "wb") as f:
+                f.write(self.HEADER.pack(self.MAGIC, self.VERSION, size))
+        with open(self.path, "rb") as f:
+            magic, version, record_size = self.HEADER.unpack(f.read(self.HEADER.size))
+        if magic != self.MAGIC or version != self.VERSION or record_size != size:
+            raise ValueError("%s is not a version %i score log" % (self.path, self.VERSION))
+        self.file = open(self.path, "r+b")
+        # A record cut off by a crash is dropped
+        self.written = (os.path.getsize(self.path) - self.HEADER.size) // size
+        self.file.truncate(self.HEADER.size + self.written * size)
+        self.file.seek(0, os.SEEK_END)
+        self._index = self._load_index()
+        self.appended = self.written  # records in the log, written or not
+        if self._index[2] < self.written:
+            self._index = self._merge(self._read(self._index[2], self.written))
+
+    def _load_index(self):
+        """
+        :return: (sorted scores, their record numbers, number of records indexed), empty if the file is missing
+        or does not match the log
+        """
+        empty = (np.zeros(0), np.zeros(0, dtype=np.uint32), 0)
+        try:
+            with open(self.index_path, "rb") as f:
+                magic, version, count = self.INDEX_HEADER.unpack(f.read(self.INDEX_HEADER.size))
+                if magic != self.INDEX_MAGIC or version != self.VERSION or count > self.written:
+                    return empty
+                scores = np.fromfile(f, dtype="<f8", count=count)
+                records = np.fromfile(f, dtype="<u4", count=count)
+        except (OSError, struct.error):
+            return empty
+        if len(scores) != count or len(records) != count:
+            return empty
+        return scores, records, count
+
+    def _read(self, start, stop):
+        """
+        Records start to stop from the disk
+        :return: structured array
+        """
+        if stop <= start:
+            return np.zeros(0, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode="r", offset=self.HEADER.size + start * self.RECORD.size,
+                         shape=(stop - start,))
+
+    def _merge(self, records):
+        """
+        Merge records that are on disk into the index and write it. The index is replaced, never changed, so a query
+        can keep using the old one.
+        :param records: structured array of the records following the indexed ones
+        :return: new index
+        """
+        scores, numbers, count = self._index
+        order = np.argsort(records["score"], kind="stable")
+        new_scores = records["score"][order]
+        new_numbers = (count + order).astype(np.uint32)
+        at = np.searchsorted(scores, new_scores, side="right")
+        scores, numbers = np.insert(scores, at, new_scores), np.insert(numbers, at, new_numbers)
+        count += len(records)
+        temporary = self.index_path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(self.INDEX_HEADER.pack(self.INDEX_MAGIC, self.VERSION, count))
+            f.write(scores.astype("<f8").tobytes())
+            f.write(numbers.astype("<u4").tobytes())
+        os.replace(temporary, self.index_path)
+        return scores, numbers, count
+
+    def append(self, player, score, enemies=0, seed=0, duration=0.0, timestamp=None):
+        """
+        Add a score. It is written by the background thread, this only copies it into memory.
+        :param player: player number
+        :param score: seconds survived
+        :param enemies: enemies alive at the game over
+        :param seed: seed of the game
+        :param duration: seconds the game ran
+        :param timestamp: unix time, defaults to now
+        :return: None
+        """
+        record = self.RECORD.pack(time.time() if timestamp is None else timestamp, score, duration, seed, player,
+                                  enemies)
+        with self._lock:
+            self._pending += record
+            self._unindexed += record
+            self.appended += 1
+            if len(self._pending) >= self.batch * self.RECORD.size:
+                self._lock.notify_all()
+
+    def _write_loop(self):
+        """
+        Writer thread: write and fsync the appended records in batches, merge them into the index now and then
+        :return: None
+        """
+        size = self.RECORD.size
+        while True:
+            with self._lock:
+                if not (self._closing or self._flushing) and len(self._pending) < self.batch * size:
+                    self._lock.wait(self.flush_interval)
+                data, self._pending = self._pending, bytearray()
+                closing, self._flushing = self._closing, False
+            if data and self.error is None:
+                try:
+                    self.file.write(data)
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+                    indexed = self._index[2]
+                    written = self.written + len(data) // size
+                    index = None
+                    if written - indexed >= self.rebuild_every or (closing and written > indexed):
+                        index = self._merge(self._read(indexed, written))
+                    with self._lock:
+                        self.written = written
+                        if index is not None:
+                            self._index = index
+                            del self._unindexed[:(index[2] - indexed) * size]
+                except OSError as error:
+                    self.error = error  # keep the scores in memory, the game goes on
+            with self._lock:
+                self._lock.notify_all()  # wake flush()
+            if closing:
+                return
+
+    def flush(self):
+        """
+        Write the appended scores now and wait until they are on disk
+        :return: None
+        """
+        with self._lock:
+            target = self.appended
+            self._flushing = True
+            self._lock.notify_all()
+            while self.written < target and self.error is None and self.thread is not None:
+                self._lock.wait(self.flush_interval)
+
+    def close(self):
+        """
+        Write the appended scores, update the index and close the file
+        :return: None
+        """
+        if self.thread is None:
+            return
+        with self._lock:
+            self._closing = True
+            self._lock.notify_all()
+        self.thread.join()
+        self.thread = None
+        self.file.close()
+        if self.error is not None:
+            print("Score log stopped:", self.error)
+
+    # ---- Queries ----
+
+    def _snapshot(self):
+        """
+        :return: (index, records not in the index)
+        """
+        with self._lock:
+            return self._index, np.frombuffer(bytes(self._unindexed), dtype=self.dtype)
+
+    def __len__(self):
+        index, tail = self._snapshot()
+        return index[2] + len(tail)
+
+    def top(self, k=10):
+        """
+        Highest scores
+        :param k: number of scores
+        :return: list of Score, best first
+        """
+        (scores, numbers, count), tail = self._snapshot()
+        best = self._read(0, count)[np.sort(numbers[max(0, len(numbers) - k):])] if k > 0 else tail[:0]
+        candidates = np.concatenate((np.asarray(best), tail))
+        order = np.argsort(-candidates["score"], kind="stable")[:k]
+        return [Score(*row) for row in candidates[order].tolist()]
+
+    def rank(self, score):
+        """
+        Place a score has on the leaderboard
+        :param score: seconds survived
+        :return: 1 + number of higher scores
+        """
+        (scores, numbers, count), tail = self._snapshot()
+        higher = count - np.searchsorted(scores, score, side="right") + np.count_nonzero(tail["score"] > score)
+        return int(higher) + 1
+
+    def percentile(self, q):
+        """
+        Percentile of all scores, the same definition as FrameProfiler.percentile
+        :param q: percentile between 0 and 100
+        :return: score, 0.0 without scores
+        """
+        (scores, numbers, count), tail = self._snapshot()
+        n = count + len(tail)
+        if n == 0:
+            return 0.0
+        return _kth(scores, np.sort(tail["score"]), min(n - 1, int(q / 100.0 * n)))
+
+
+def _kth(a, b, k):
+    """
+    k-th smallest value (counted from 0) of two sorted arrays, without merging them
+    :return: float
+    """
+    # Binary search for the number i of values taken from b, the other k + 1 - i come from a
+    lo, hi = max(0, k + 1 - len(a)), min(k + 1, len(b))
+    while lo < hi:
+        i = (lo + hi) // 2
+        if b[i] < a[k - i]:
+            lo = i + 1
+        else:
+            hi = i
+    j = k + 1 - lo
+    return float(max(a[j - 1] if j > 0 else -np.inf, b[lo - 1] if lo > 0 else -np.inf))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log")
+    parser.add_argument("--top", type=int, default=10, help="number of best scores shown")
+    parser.add_argument("--percentiles", type=float, nargs="*", default=[50, 90, 99])
+    args = parser.parse_args(argv)
+    log = ScoreLog(args.log)
+    try:
+        print("%i scores" % len(log))
+        for place, score in enumerate(log.top(args.top), 1):
+            print("%3i. %8.2f s  player %i, %i enemies, seed %i, %s" % (
+                place, score.score, score.player, score.enemies, score.seed,
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(score.timestamp))))
+        for q in args.percentiles:
+            print("p%g %.2f s" % (q, log.percentile(q)))
+    finally:
+        log.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,502 @@
+"""
+One huge world of enemies simulated by several worker processes.
+
+    world = ShardedWorld(size=(40000, 30000), enemies=2000000, shards=8, seed=0)
+    crashed = world.step([(player.rect, player.detector.rect.center, player.detector.radius)])
+    screen.blits(world.visible(camera.view, Enemy.image), doreturn=False)
+    world.close()
+
+The world is cut into vertical strips, one per worker process. The state of the enemies lives in shared memory
+(multiprocessing.shared_memory), every worker moves the enemies of its strip in place and hands the enemies that
+crossed into another strip over through a shared outbox. Then each worker tests its enemies against the players whose
+reach overlaps its strip widened by the size of an enemy (the ghost zone), so a player near a border is tested by
+the strips on both sides. The main process only writes the players, waits for the workers and reads the results.
+
+Enemies move and bounce off the walls like in EnemyWorld. A new speed is drawn from a hash of the seed, the enemy and
+its number of bounces instead of a random number generator, so a seed gives the same world for any number of workers.
+No sprites are created, the main process draws the visible enemies straight from the shared arrays.
+"""
+import math
+import multiprocessing
+import threading
+from multiprocessing import shared_memory
+try:
+    import numpy as np
+except ImportError:  # numpy is optional for the game, but required here
+    np = None
+from enemy import Enemy
+from assets import assets
+
+# ---- Columns of every enemy, one (shards, strip capacity) array each ----
+COLUMNS = {"x": "f8", "y": "f8", "vx": "f8", "vy": "f8", "centerx": "i4", "centery": "i4", "id": "u8",
+           "bounces": "u4", "image_index": "i1", "detected": "?"}
+# Columns handed over with an enemy that moves into another strip
+HANDOFF = ("x", "y", "vx", "vy", "centerx", "centery", "id", "bounces", "image_index")
+# ---- Columns of every player, written by the main process before a tick ----
+PLAYER_COLUMNS = {"left": "i4", "top": "i4", "width": "i4", "height": "i4", "detector_x": "i4", "detector_y": "i4",
+                  "detector_radius": "f8"}
+MAX_PLAYERS = 64
+# Arrays with one row of strip capacity per strip, copied into the larger block when the strips grow
+STRIP_ARRAYS = tuple(COLUMNS) + tuple("out_" + name for name in HANDOFF) + ("out_strip",)
+
+
+def _layout(shards, strip_capacity):
+    """
+    Arrays in the shared memory block
+    :param shards: number of strips
+    :param strip_capacity: enemies one strip can hold, its outbox holds as many
+    :return: list of (name, dtype, shape, offset), size of the block in bytes
+    """
+    arrays = [(name, dtype, (shards, strip_capacity)) for name, dtype in COLUMNS.items()]
+    arrays += [("out_" + name, COLUMNS[name], (shards, strip_capacity)) for name in HANDOFF]
+    arrays += [("out_strip", "i4", (shards, strip_capacity)),
+               ("count", "i8", (shards,)), ("out_count", "i8", (shards,)), ("detected_count", "i8", (shards,)),
+               ("overflow", "i8", (shards,)), ("crashed", "?", (shards, MAX_PLAYERS)), ("players", "i8", (1,)),
+               ("dt", "f8", (1,)), ("stop", "i8", (1,))]
+    arrays += [("player_" + name, dtype, (MAX_PLAYERS,)) for name, dtype in PLAYER_COLUMNS.items()]
+    layout, offset = [], 0
+    for name, dtype, shape in arrays:
+        layout.append((name, dtype, shape, offset))
+        offset += -(-np.dtype(dtype).itemsize * math.prod(shape) // 8) * 8  # keep every array 8 byte aligned
+    return layout, offset
+
+
+def _views(buffer, layout):
+    """
+    numpy arrays on the shared memory block, nothing is copied
+    :return: dictionary name -> array
+    """
+    return {name: np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            for name, dtype, shape, offset in layout}
+
+
+def _hash(values):
+    """
+    splitmix64 of every value
+    :param values: uint64 array
+    :return: uint64 array
+    """
+    z = values + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def new_speed(seed, ids, bounces, speed_max):
+    """
+    Gaussian speed like Enemy.new_speed("gauss"), drawn from a hash instead of a random number generator
+    :param seed: seed of the world
+    :param ids: uint64 array of enemy ids
+    :param bounces: number of times each enemy got a new speed before
+    :param speed_max: Enemy.step_size of the world
+    :return: (vx, vy)
+    """
+    first = _hash(_hash(ids ^ np.uint64(seed)) + (bounces.astype(np.uint64) << np.uint64(2)))
+    second = _hash(first)
+    third = _hash(second)
+    scale = 2.0 ** -53
+    u1 = (first >> np.uint64(11)) * scale
+    u2 = (second >> np.uint64(11)) * scale
+    random_direction = np.where(third & np.uint64(1), 1.0, -1.0)
+    # Box-Muller: two independent standard normal numbers from two uniform ones
+    r = np.sqrt(-2.0 * np.log1p(-u1))
+    vx = random_direction * r * np.cos(2 * np.pi * u2) * speed_max + random_direction
+    vy = random_direction * r * np.sin(2 * np.pi * u2) * speed_max + random_direction
+    return vx, vy
+
+
+class _Strip:
+    """
+    The enemies of one strip, moved and tested by its worker process
+    """
+
+    def __init__(self, arrays, strip, params):
+        self.a = arrays
+        self.strip = strip
+        self.p = params
+        edges = params["edges"]
+        # Strips at the sides of the world extend forever, enemies only leave them in the direction of a neighbour
+        self.left = edges[strip] if strip > 0 else -math.inf
+        self.right = edges[strip + 1] if strip + 1 < len(edges) - 1 else math.inf
+
+    def move(self, dt):
+        """
+        Move the enemies of the strip and put the ones that left it into the outbox
+        :param dt: seconds simulated
+        :return: None
+        """
+        a, s, p = self.a, self.strip, self.p
+        n = a["count"][s]
+        x, y, vx, vy = a["x"][s, :n], a["y"][s, :n], a["vx"][s, :n], a["vy"][s, :n]
+        x += vx * dt
+        y += vy * dt
+        centerx, centery = a["centerx"][s, :n], a["centery"][s, :n]
+        np.rint(x, out=centerx, casting="unsafe")
+        np.rint(y, out=centery, casting="unsafe")
+        width, height = p["enemy_size"]
+        left, top = centerx - width // 2, centery - height // 2
+        outside = (left < 0) | (top < 0) | (left + width > p["width"]) | (top + height > p["height"])
+        crashed = np.flatnonzero(outside)
+        if len(crashed):
+            # -- crashed into wall: clamp position and calculate a new speed
+            x[crashed] = np.clip(x[crashed], width / 2, p["width"] - width / 2)
+            y[crashed] = np.clip(y[crashed], height / 2, p["height"] - height / 2)
+            # The hitbox follows the clamped position, collide() and the handoff below use it in this tick
+            centerx[crashed] = np.rint(x[crashed])
+            centery[crashed] = np.rint(y[crashed])
+            bounces = a["bounces"][s, :n]
+            bounces[crashed] += 1
+            vx[crashed], vy[crashed] = new_speed(p["seed"], a["id"][s, :n][crashed], bounces[crashed],
+                                                 p["speed_max"])
+        a["image_index"][s, :n] = outside
+        # -- hand over the enemies that left the strip
+        leaving = (centerx < self.left) | (centerx >= self.right)
+        k = int(np.count_nonzero(leaving))
+        a["out_count"][s] = k
+        if k:
+            strips = np.searchsorted(p["edges"], centerx[leaving], side="right") - 1
+            a["out_strip"][s, :k] = np.clip(strips, 0, len(p["edges"]) - 2)
+            staying = ~leaving
+            m = n - k
+            for name in HANDOFF:
+                column = a[name][s, :n]
+                a["out_" + name][s, :k] = column[leaving]
+                column[:m] = column[staying]
+            a["count"][s] = m
+
+    def receive(self):
+        """
+        Take the enemies other strips handed over to this one, in the order of the strips.
+        If they do not fit into the strip nothing is taken, the outboxes are left for ShardedWorld.step to grow the
+        strips and receive again.
+        :return: True if the enemies were taken, False if the strip is full
+        """
+        a, s = self.a, self.strip
+        n = a["count"][s]
+        incoming = []
+        for other in range(len(a["count"])):
+            k = a["out_count"][other]
+            if other == s or k == 0:
+                continue
+            mine = np.flatnonzero(a["out_strip"][other, :k] == s)
+            if len(mine):
+                incoming.append((other, k, mine))
+        needed = n + sum(len(mine) for _, _, mine in incoming)
+        if needed > a["x"].shape[1]:
+            a["overflow"][s] = needed
+            return False
+        for other, k, mine in incoming:
+            for name in HANDOFF:
+                a[name][s, n:n + len(mine)] = a["out_" + name][other, :k][mine]
+            n += len(mine)
+        a["count"][s] = n
+        return True
+
+    def collide(self):
+        """
+        Mark enemies inside a detector and players that crashed into an enemy of this strip.
+        The same tests as pygame.sprite.collide_circle and Rect.colliderect.
+        :return: None
+        """
+        a, s, p = self.a, self.strip, self.p
+        n = a["count"][s]
+        detected, crashed = a["detected"][s, :n], a["crashed"][s]
+        detected[:] = False
+        crashed[:] = False
+        width, height = p["enemy_size"]
+        centerx, centery = a["centerx"][s, :n], a["centery"][s, :n]
+        left, top = centerx - width // 2, centery - height // 2
+        # Ghost zone: players whose reach ends within an enemy size of the strip are tested too
+        margin = max(width, height) + p["enemy_radius"]
+        for i in range(a["players"][0]):
+            player_left, player_top = a["player_left"][i], a["player_top"][i]
+            player_right, player_bottom = player_left + a["player_width"][i], player_top + a["player_height"][i]
+            if player_left - margin < self.right and player_right + margin > self.left:
+                crashed[i] = np.any((left < player_right) & (player_left < left + width) &
+                                    (top < player_bottom) & (player_top < top + height))
+            detector_x, detector_y = a["player_detector_x"][i], a["player_detector_y"][i]
+            reach = a["player_detector_radius"][i] + p["enemy_radius"]
+            if detector_x - reach - margin < self.right and detector_x + reach + margin > self.left:
+                dx, dy = centerx - detector_x, centery - detector_y
+                detected |= dx * dx + dy * dy <= reach * reach
+        image_index = a["image_index"][s, :n]
+        image_index[detected & (image_index == 0)] = 2
+        a["detected_count"][s] = np.count_nonzero(detected)
+
+
+def _work(name, layout, strip, params, start, moved, done):
+    """
+    Worker process of one strip: move, hand over, receive and test once per tick until the world is closed
+    """
+    block = shared_memory.SharedMemory(name=name)
+    arrays = worker = None
+    try:
+        arrays = _views(block.buf, layout)
+        worker = _Strip(arrays, strip, params)
+        while True:
+            start.wait()
+            if arrays["stop"][0]:
+                break
+            worker.move(arrays["dt"][0])
+            moved.wait()  # every outbox is filled
+            if worker.receive():
+                worker.collide()  # a full strip is received and tested by the main process
+            done.wait()
+    except threading.BrokenBarrierError:
+        pass  # the main process or another worker gave up
+    except BaseException:
+        for barrier in (start, moved, done):
+            barrier.abort()
+        raise
+    finally:
+        arrays = worker = None  # release the views before closing the block
+        block.close()
+
+
+class ShardedWorld:
+    """
+    Enemies of a large world in shared memory, moved and tested by one worker process per vertical strip
+    """
+
+    # Room of a strip above its share of the capacity, strips grow when enemies gather in one
+    STRIP_HEADROOM = 0.25
+
+    def __init__(self, size=(40000, 30000), enemies=1000000, shards=None, seed=None, dt=1.0 / 60, capacity=None,
+                 strip_headroom=STRIP_HEADROOM):
+        """
+        Constructor, starts the workers
+        :param size: (width, height) of the world
+        :param enemies: enemies spread evenly over the world
+        :param shards: number of strips and worker processes, defaults to the number of cores
+        :param seed: seed of the world
+        :param dt: seconds simulated by one step
+        :param capacity: enemies the world can hold, defaults to enemies plus 1024 for spawn()
+        :param strip_headroom: room of a strip above capacity / shards, as a fraction of it
+        """
+        if np is None:
+            raise ImportError("ShardedWorld requires numpy")
+        self.width, self.height = size
+        self.shards = shards or multiprocessing.cpu_count()
+        self.dt = dt
+        self.capacity = capacity or enemies + 1024
+        self.rng = np.random.default_rng(seed)
+        self.seed = int(self.rng.integers(2 ** 63))
+        self.ticks = 0
+        self.detected = 0  # enemies inside a detector after the last step
+        self.next_id = 0
+        # ---- Sizes of the sprites, from the images of the game like VectorEnv ----
+        enemy_size = assets.image("babytux.png", convert=False).get_size()
+        aspect = max(round(self.width / self.height), round(self.height / self.width))
+        self.params = {"width": self.width, "height": self.height, "enemy_size": enemy_size,
+                       "enemy_radius": 0.5 * math.hypot(*enemy_size), "speed_max": Enemy.ENEMYMAXSPEED * aspect,
+                       "seed": self.seed, "edges": [round(i * self.width / self.shards) for i in range(self.shards + 1)]}
+        # ---- Shared memory: every strip holds its share of the capacity and some headroom, and grows if needed ----
+        self.strip_capacity = min(self.capacity, math.ceil(self.capacity / self.shards * (1 + strip_headroom)))
+        self.layout, nbytes = _layout(self.shards, self.strip_capacity)
+        self.block = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.arrays = _views(self.block.buf, self.layout)
+        self.workers = []
+        self.spawn(self.rng.random((enemies, 2)) * (self.width, self.height))
+        # ---- One process per strip, the three barriers separate the phases of a tick ----
+        context = multiprocessing.get_context()
+        self.start = context.Barrier(self.shards + 1)
+        self.moved = context.Barrier(self.shards)
+        self.done = context.Barrier(self.shards + 1)
+        self._start_workers()
+
+    def _start_workers(self):
+        context = multiprocessing.get_context()
+        self.workers = [context.Process(target=_work, name="ShardedWorld-%i" % strip, daemon=True,
+                                        args=(self.block.name, self.layout, strip, self.params, self.start,
+                                              self.moved, self.done))
+                        for strip in range(self.shards)]
+        for worker in self.workers:
+            worker.start()
+
+    def _stop_workers(self):
+        self.arrays["stop"][0] = 1
+        try:
+            self.start.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            pass
+        for worker in self.workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self.workers = []
+
+    def _grow(self, needed):
+        """
+        Move the world into a block with larger strips and restart the workers on it
+        :param needed: enemies the fullest strip has to hold
+        :return: None
+        """
+        strip_capacity = min(self.capacity, max(needed, math.ceil(1.5 * self.strip_capacity)))
+        if needed > strip_capacity:
+            raise RuntimeError("A strip of the ShardedWorld needs room for %i enemies, the world holds %i" %
+                               (needed, self.capacity))
+        running = bool(self.workers)
+        if running:
+            self._stop_workers()
+        layout, nbytes = _layout(self.shards, strip_capacity)
+        block = shared_memory.SharedMemory(create=True, size=nbytes)
+        arrays = _views(block.buf, layout)
+        for name, old in self.arrays.items():
+            if name in STRIP_ARRAYS:
+                arrays[name][:, :self.strip_capacity] = old
+            else:
+                arrays[name][...] = old
+        arrays["stop"][0] = 0
+        self.arrays = None  # release the views before closing the block
+        self.block.close()
+        self.block.unlink()
+        self.block, self.arrays, self.layout, self.strip_capacity = block, arrays, layout, strip_capacity
+        if running:
+            self._start_workers()
+
+    def __len__(self):
+        return int(self.arrays["count"].sum())
+
+    def spawn(self, positions):
+        """
+        Add enemies between two steps
+        :param positions: (k, 2) array of positions
+        :return: None
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        k = len(positions)
+        if len(self) + k > self.capacity:
+            raise ValueError("ShardedWorld holds at most %i enemies" % self.capacity)
+        a, p = self.arrays, self.params
+        ids = np.arange(self.next_id, self.next_id + k, dtype=np.uint64)
+        self.next_id += k
+        bounces = np.zeros(k, dtype=np.uint32)
+        vx, vy = new_speed(self.seed, ids, bounces, p["speed_max"])
+        centerx, centery = np.rint(positions[:, 0]), np.rint(positions[:, 1])
+        strips = np.clip(np.searchsorted(p["edges"], centerx, side="right") - 1, 0, self.shards - 1)
+        needed = a["count"] + np.bincount(strips, minlength=self.shards)
+        if needed.max() > self.strip_capacity:
+            self._grow(int(needed.max()))
+            a = self.arrays
+        values = {"x": positions[:, 0], "y": positions[:, 1], "vx": vx, "vy": vy, "centerx": centerx,
+                  "centery": centery, "id": ids, "bounces": bounces, "image_index": 0, "detected": False}
+        for strip in range(self.shards):
+            rows = np.flatnonzero(strips == strip)
+            n = a["count"][strip]
+            for name, value in values.items():
+                a[name][strip, n:n + len(rows)] = value if np.isscalar(value) else value[rows]
+            a["count"][strip] = n + len(rows)
+
+    def step(self, players=()):
+        """
+        Move the world one tick and test the enemies against the players
+        :param players: up to MAX_PLAYERS (rect, detector center, detector radius), e.g. of the Player sprites
+        :return: boolean array, per player whether it crashed into an enemy
+        """
+        a = self.arrays
+        players = list(players)
+        if len(players) > MAX_PLAYERS:
+            raise ValueError("ShardedWorld tests at most %i players" % MAX_PLAYERS)
+        for i, (rect, center, radius) in enumerate(players):
+            a["player_left"][i], a["player_top"][i] = rect[0], rect[1]
+            a["player_width"][i], a["player_height"][i] = rect[2], rect[3]
+            a["player_detector_x"][i], a["player_detector_y"][i] = center
+            a["player_detector_radius"][i] = radius
+        a["players"][0] = len(players)
+        a["dt"][0] = self.dt
+        try:
+            self.start.wait()
+            self.done.wait()
+        except threading.BrokenBarrierError:
+            raise RuntimeError("A ShardedWorld worker stopped") from None
+        full = np.flatnonzero(a["overflow"])
+        if len(full):
+            # Enemies gathered in a strip: grow all strips, then take the enemies waiting in the outboxes
+            self._grow(int(a["overflow"].max()))
+            a = self.arrays
+            for strip in full.tolist():
+                a["overflow"][strip] = 0
+                worker = _Strip(a, strip, self.params)
+                worker.receive()
+                worker.collide()
+        self.ticks += 1
+        self.detected = int(a["detected_count"].sum())
+        return a["crashed"][:, :len(players)].any(axis=0)
+
+    def visible(self, view, images):
+        """
+        Enemies inside the view, only the strips the view overlaps are searched
+        :param view: pygame.Rect of the view in the world
+        :param images: enemy images (normal, crashed into wall, detected), usually Enemy.image
+        :return: list of (image, position in the window) for Surface.blits
+        """
+        a, edges = self.arrays, self.params["edges"]
+        width, height = self.params["enemy_size"]
+        blits = []
+        for strip in range(self.shards):
+            if edges[strip + 1] + width < view.left or edges[strip] - width > view.right:
+                continue
+            n = a["count"][strip]
+            left = a["centerx"][strip, :n] - width // 2
+            top = a["centery"][strip, :n] - height // 2
+            rows = np.flatnonzero((left < view.right) & (view.left < left + width) &
+                                  (top < view.bottom) & (view.top < top + height))
+            blits += [(images[image], (x, y)) for image, x, y in zip(a["image_index"][strip, rows].tolist(),
+                                                                     (left[rows] - view.x).tolist(),
+                                                                     (top[rows] - view.y).tolist())]
+        return blits
+
+    def gather(self, columns=("x", "y", "vx", "vy")):
+        """
+        Copy of some columns of all enemies, ordered by enemy
+        :return: dictionary column -> array
+        """
+        a = self.arrays
+        counts = a["count"].tolist()
+        ids = np.concatenate([a["id"][strip, :n] for strip, n in enumerate(counts)])
+        order = np.argsort(ids)
+        return {name: np.concatenate([a[name][strip, :n] for strip, n in enumerate(counts)])[order]
+                for name in columns}
+
+    def close(self):
+        """
+        Stop the workers and free the shared memory
+        :return: None
+        """
+        if self.block is None:
+            return
+        self._stop_workers()
+        self.arrays = None
+        self.block.close()
+        self.block.unlink()
+        self.block = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    import pygame
+    parser = argparse.ArgumentParser(description="Ticks per second of a sharded world")
+    parser.add_argument("--enemies", type=int, default=1000000)
+    parser.add_argument("--world", type=int, nargs=2, default=(40000, 30000), metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, multiprocessing.cpu_count()])
+    parser.add_argument("--ticks", type=int, default=100)
+    args = parser.parse_args()
+    # Players spread over the world, each with the detector size of the game
+    players = [(pygame.Rect(x, y, 40, 40), (x + 20, y + 20), 200) for x in range(1000, args.world[0], 10000)
+               for y in range(1000, args.world[1], 10000)][:MAX_PLAYERS]
+    for shards in sorted(set(args.shards)):
+        with ShardedWorld(tuple(args.world), args.enemies, shards=shards, seed=0) as world:
+            world.step(players)  # wait for the workers to start
+            start = time.perf_counter()
+            for _ in range(args.ticks):
+                world.step(players)
+            elapsed = time.perf_counter() - start
+            print("%2i shards: %.2f ms per tick, %.0f enemy updates/s" % (shards, 1000 * elapsed / args.ticks,
+                                                                          args.enemies * args.ticks / elapsed))
@@ -0,0 +1,319 @@
+"""
+Snapshots of a running game in one contiguous binary buffer.
+
+    buffer = snapshot.take(game)  # checkpoint in memory
+    ...                           # play on, e.g. try one branch of a search
+    snapshot.restore(game, buffer)  # roll back to the checkpoint
+
+    snapshot.save(game, "game.snap")  # written through a memory map
+    with snapshot.load("game.snap") as buffer:
+        snapshot.restore(game, buffer)
+
+The buffer starts with a versioned header (counters, seeds, the spawn cap and frame governor level and the state of
+both random number generators)
+followed by one typed array per column of enemies, players, detectors and scores, each aligned to 8 bytes.
+Restoring copies the arrays straight into the EnemyWorld and reuses the sprites that are already alive, so a
+game continues from a restored snapshot exactly as it did from the original state.
+The class level sprite state (Enemy.engine, registries, groups) belongs to one game per process, so a fork
+is a restore into the same game, or into a game in another process.
+"""
+import mmap
+import struct
+try:
+    import numpy as np
+except ImportError:  # numpy is optional for the game, but required here
+    np = None
+from enemy import Enemy
+from player import Player
+from enemy_detection import EnemyDetection
+
+MAGIC = b"SAVS"
+VERSION = 3
+# magic, version, flags, size, ticks, time, game seed, detected, enemies, players, detectors, scores, accumulator,
+# pressed keys, time of the next capped spawn, frame governor level, gauss_next of random.Random, PCG64 state,
+# PCG64 increment, has_uint32, uinteger
+HEADER = struct.Struct("<4sHHQQdQIIIIIdIdId16s16sII")
+# ---- Flags ----
+HAS_GAUSS_NEXT = 1
+HAS_ENGINE = 2
+# ---- Typed columns of every section ----
+RANDOM = (("mt", "<u4"),)  # Mersenne Twister state of random.Random, 625 values
+ENEMY = (("x", "<f8"), ("y", "<f8"), ("vx", "<f8"), ("vy", "<f8"), ("speed_max", "<f8"),
+         ("centerx", "<i8"), ("centery", "<i8"), ("lag", "<f8"), ("image_index", "<i1"), ("detected", "?"))
+PLAYER = (("x", "<f8"), ("y", "<f8"), ("score", "<f8"), ("centerx", "<i8"), ("centery", "<i8"),
+          ("number", "<i4"), ("image_index", "<i1"), ("remove", "?"))
+DETECTOR = (("centerx", "<i8"), ("centery", "<i8"), ("radius", "<i4"), ("number", "<i4"), ("owner", "<i4"),
+            ("red", "<u1"), ("green", "<u1"), ("blue", "<u1"), ("remove", "?"))
+SCORE = (("number", "<i4"), ("score", "<f8"))
+MT_STATE_SIZE = 625
+
+
+def _layout(enemies, players, detectors, scores):
+    """
+    Position of every column in the buffer
+    :return: (dictionary (section, column) -> (dtype, count, offset), total size in bytes)
+    """
+    layout = {}
+    offset = HEADER.size
+    for section, columns, count in (("random", RANDOM, MT_STATE_SIZE), ("enemy", ENEMY, enemies),
+                                    ("player", PLAYER, players), ("detector", DETECTOR, detectors),
+                                    ("score", SCORE, scores)):
+        for column, dtype in columns:
+            offset = (offset + 7) // 8 * 8
+            layout[section, column] = (np.dtype(dtype), count, offset)
+            offset += np.dtype(dtype).itemsize * count
+    return layout, offset
+
+
+def _columns(buffer, layout, section):
+    """
+    Views of the columns of a section
+    :return: dictionary column -> numpy array sharing memory with buffer
+    """
+    return {column: np.frombuffer(buffer, dtype, count, offset)
+            for (name, column), (dtype, count, offset) in layout.items() if name == section}
+
+
+def _enemy_state(game):
+    """
+    Columns of all enemies, in EnemyWorld order if there is one
+    :return: dictionary column -> sequence
+    """
+    engine = Enemy.engine
+    if engine is not None:
+        n = engine.count
+        return {column: getattr(engine, column)[:n] for column, _ in ENEMY}
+    enemies = game.enemy_group.sprites()
+    return {"x": [enemy.x_pos for enemy in enemies], "y": [enemy.y_pos for enemy in enemies],
+            "vx": [enemy.vx for enemy in enemies], "vy": [enemy.vy for enemy in enemies],
+            "speed_max": [enemy.speed_max for enemy in enemies],
+            "centerx": [enemy.rect.centerx for enemy in enemies], "centery": [enemy.rect.centery for enemy in enemies],
+            "lag": [0.0] * len(enemies), "image_index": [Enemy.image.index(enemy.image) for enemy in enemies],
+            "detected": [enemy.detected for enemy in enemies]}
+
+
+def size(game):
+    """
+    Bytes needed for a snapshot of game
+    """
+    return _layout(len(game.enemy_group), len(game.player_group), len(game.detection_group), len(game.scores))[1]
+
+
+def take(game, out=None):
+    """
+    Pack the state of game into one buffer
+    :param game: SuperAvoider
+    :param out: writable buffer of at least size(game) bytes (bytearray, mmap), None allocates one
+    :return: the buffer
+    """
+    if np is None:
+        raise ImportError("Snapshots require numpy")
+    players, detectors = game.player_group.sprites(), game.detection_group.sprites()
+    layout, total = _layout(len(game.enemy_group), len(players), len(detectors), len(game.scores))
+    if out is None:
+        out = bytearray(total)
+    elif len(out) < total:
+        raise ValueError("Snapshot needs %i bytes, the buffer has %i" % (total, len(out)))
+    # ---- Header with the random number generators ----
+    _, mt_state, gauss_next = game.rng.getstate()
+    flags = HAS_GAUSS_NEXT if gauss_next is not None else 0
+    pcg = {"state": {"state": 0, "inc": 0}, "has_uint32": 0, "uinteger": 0}
+    if Enemy.engine is not None:
+        flags |= HAS_ENGINE
+        pcg = Enemy.engine.rng.bit_generator.state
+    HEADER.pack_into(out, 0, MAGIC, VERSION, flags, total, game.ticks, game.time, game.game_seed, game.detected,
+                     len(game.enemy_group), len(players), len(detectors), len(game.scores), game.accumulator,
+                     game.pressed, game.next_spawn, game.governor.level, gauss_next or 0.0,
+                     pcg["state"]["state"].to_bytes(16, "little"), pcg["state"]["inc"].to_bytes(16, "little"),
+                     pcg["has_uint32"], pcg["uinteger"])
+    _columns(out, layout, "random")["mt"][:] = mt_state
+    # ---- Sprites ----
+    enemy_state = _enemy_state(game)
+    for column, values in _columns(out, layout, "enemy").items():
+        values[:] = enemy_state[column]
+    columns = _columns(out, layout, "player")
+    for i, player in enumerate(players):
+        columns["x"][i], columns["y"][i], columns["score"][i] = player.x_pos, player.y_pos, player.score
+        columns["centerx"][i], columns["centery"][i] = player.rect.center
+        columns["number"][i] = -1 if player.number is None else player.number
+        columns["image_index"][i] = Player.image.index(player.image)
+        columns["remove"][i] = player.remove
+    owners = {player.detector: i for i, player in enumerate(players) if player.detector is not None}
+    columns = _columns(out, layout, "detector")
+    for i, detector in enumerate(detectors):
+        columns["centerx"][i], columns["centery"][i] = detector.rect.center
+        columns["radius"][i] = detector.radius
+        columns["number"][i] = -1 if detector.number is None else detector.number
+        columns["owner"][i] = owners.get(detector, -1)
+        columns["red"][i], columns["green"][i], columns["blue"][i] = detector.colour_circle[:3]
+        columns["remove"][i] = detector.remove
+    columns = _columns(out, layout, "score")
+    for i, (number, score) in enumerate(game.scores):
+        columns["number"][i], columns["score"][i] = number, score
+    return out
+
+
+def _restore_enemies(game, columns, n):
+    """
+    Kill or spawn enemies until there are n, then copy the columns into them
+    :return: None
+    """
+    engine = Enemy.engine
+    enemies = engine.sprites if engine is not None else game.enemy_group.sprites()
+    while len(enemies) > n:
+        enemy = enemies[-1]
+        enemy.kill()  # the last enemy of the world leaves without moving another one
+        if engine is None:
+            enemies.pop()
+    while len(enemies) < n:
+        enemy = Enemy.spawn((0, 0), game.world_rect)
+        if engine is None:
+            enemies.append(enemy)
+    images = Enemy.image
+    if engine is not None:
+        # Only sprites whose hitbox or image differs from the snapshot are written to
+        moved = np.flatnonzero((engine.centerx[:n] != columns["centerx"]) | (engine.centery[:n] != columns["centery"]))
+        changed = np.flatnonzero(engine.image_index[:n] != columns["image_index"])
+        for column, values in columns.items():
+            getattr(engine, column)[:n] = values
+        engine.px[:n], engine.py[:n] = engine.x[:n], engine.y[:n]
+        engine.renderx[:n], engine.rendery[:n] = engine.centerx[:n], engine.centery[:n]
+        engine.interpolated = False
+        for i in moved.tolist():
+            enemies[i].rect.center = (engine.centerx[i].item(), engine.centery[i].item())
+            enemies[i].dirty = 1
+        for i in changed.tolist():
+            enemies[i].image = images[engine.image_index[i]]
+            enemies[i].dirty = 1
+        return
+    for i, enemy in enumerate(enemies):
+        enemy.x_pos, enemy.y_pos = columns["x"][i].item(), columns["y"][i].item()
+        enemy.vx, enemy.vy = columns["vx"][i].item(), columns["vy"][i].item()
+        enemy.speed_max = columns["speed_max"][i].item()
+        enemy.rect.center = (columns["centerx"][i].item(), columns["centery"][i].item())
+        enemy.image = images[columns["image_index"][i]]
+        enemy.detected = bool(columns["detected"][i])
+        enemy.dirty = 1
+
+
+def _renumber(sprites, numbers, registry):
+    """
+    Give every sprite its number from the snapshot
+    :return: None
+    """
+    wrong = [(sprite, number) for sprite, number in zip(sprites, numbers) if sprite.number != number]
+    for sprite, _ in wrong:
+        if sprite.number is not None:
+            registry.release(sprite.number)
+    for sprite, number in wrong:
+        sprite.number = registry.assign(number, sprite) if number >= 0 else None
+
+
+def _restore_players(game, players, detectors):
+    """
+    Reuse, kill or create players and detectors until they match the snapshot
+    :return: None
+    """
+    n = len(players["x"])
+    sprites = game.player_group.sprites()
+    for player in sprites[n:]:
+        player.kill()
+    sprites = sprites[:n]
+    while len(sprites) < n:
+        sprites.append(Player(start_pos=(0, 0), game_display=game.world_rect))
+    for i, player in enumerate(sprites):
+        player.x_pos, player.y_pos, player.score = (players["x"][i].item(), players["y"][i].item(),
+                                                    players["score"][i].item())
+        player.rect.center = (players["centerx"][i].item(), players["centery"][i].item())
+        player.image = Player.image[players["image_index"][i]]
+        player.remove = bool(players["remove"][i])
+        player.detector = None
+        player.dirty = 1
+    _renumber(sprites, players["number"].tolist(), Player.players)
+    # -- Detectors keep their image if colour and size did not change
+    n = len(detectors["radius"])
+    current = game.detection_group.sprites()
+    for detector in current[n:]:
+        detector.kill()
+    devices = []
+    for i in range(n):
+        colour = (int(detectors["red"][i]), int(detectors["green"][i]), int(detectors["blue"][i]))
+        center = (detectors["centerx"][i].item(), detectors["centery"][i].item())
+        radius = int(detectors["radius"][i])
+        detector = current[i] if i < len(current) else None
+        if detector is None or tuple(detector.colour_circle) != colour or detector.radius != radius:
+            if detector is not None:
+                detector.kill()
+            detector = EnemyDetection(colour=colour, starting_pos=center, size=radius)
+        detector.rect.center = center
+        detector.remove = bool(detectors["remove"][i])
+        detector.dirty = 1
+        owner = int(detectors["owner"][i])
+        if owner >= 0:
+            sprites[owner].detector = detector
+        devices.append(detector)
+    _renumber(devices, detectors["number"].tolist(), EnemyDetection.devices)
+
+
+def restore(game, buffer):
+    """
+    Put game back into the state of a snapshot
+    :param game: SuperAvoider
+    :param buffer: buffer returned by take(), or any buffer holding a snapshot (bytes, mmap)
+    :return: None
+    """
+    if np is None:
+        raise ImportError("Snapshots require numpy")
+    (magic, version, flags, total, ticks, time, game_seed, detected, enemies, players, detectors, scores,
+     accumulator, pressed, next_spawn, level, gauss_next, pcg_state, pcg_inc, has_uint32,
+     uinteger) = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a version %i snapshot" % VERSION)
+    layout, expected = _layout(enemies, players, detectors, scores)
+    if expected != total or len(buffer) < total:
+        raise ValueError("Snapshot is truncated or corrupt")
+    # ---- Sprites first, spawning uses the random number generator restored below ----
+    game.restore()  # drop interpolated positions
+    _restore_enemies(game, _columns(buffer, layout, "enemy"), enemies)
+    _restore_players(game, _columns(buffer, layout, "player"), _columns(buffer, layout, "detector"))
+    # ---- Game ----
+    game.ticks, game.time, game.game_seed, game.detected = ticks, time, game_seed, detected
+    game.accumulator, game.pressed, game.next_spawn = accumulator, pressed, next_spawn
+    game.governor.set_level(level)
+    columns = _columns(buffer, layout, "score")
+    game.scores = list(zip(columns["number"].tolist(), columns["score"].tolist()))
+    game.previous_centers, game.render_centers = {}, {}
+    game.rng.setstate((3, tuple(_columns(buffer, layout, "random")["mt"].tolist()),
+                       gauss_next if flags & HAS_GAUSS_NEXT else None))
+    if Enemy.engine is not None and flags & HAS_ENGINE:
+        Enemy.engine.rng.bit_generator.state = {"bit_generator": "PCG64",
+                                                "state": {"state": int.from_bytes(pcg_state, "little"),
+                                                          "inc": int.from_bytes(pcg_inc, "little")},
+                                                "has_uint32": has_uint32, "uinteger": uinteger}
+    game.all_sprites_group.repaint()
+
+
+def save(game, path):
+    """
+    Write a snapshot of game to a file through a memory map
+    :param game: SuperAvoider
+    :param path: file name
+    :return: size of the snapshot in bytes
+    """
+    total = size(game)
+    with open(path, "w+b") as f:
+        f.truncate(total)
+        with mmap.mmap(f.fileno(), total) as buffer:
+            take(game, buffer)
+            buffer.flush()
+    return total
+
+
+def load(path):
+    """
+    Map a snapshot file into memory, pass the result to restore()
+    :param path: file name
+    :return: read only mmap.mmap, close it (or use it in a with statement) when done
+    """
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
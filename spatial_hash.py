@@ -0,0 +1,157 @@
+import math
+import pygame
+
+
+def collide_rect_mask(left, right):
+    """
+    Pixel exact collision test. Rects are compared first so the masks are only overlapped for touching sprites
+    :param left: sprite with rect and mask
+    :param right: sprite with rect and mask
+    :return: True if the sprites overlap
+    """
+    return left.rect.colliderect(right.rect) and pygame.sprite.collide_mask(left, right) is not None
+
+
+def collision_radius(sprite):
+    """
+    Radius used by pygame.sprite.collide_circle
+    :param sprite: sprite with rect and optional radius
+    :return: radius
+    """
+    radius = getattr(sprite, "radius", None)
+    if radius is None:
+        radius = 0.5 * math.hypot(sprite.rect.width, sprite.rect.height)
+    return radius
+
+
+def shape_reach(radius, width, height):
+    """
+    Largest distance from a sprite center to the edge of its collision shape, the margin a grid query searches
+    around a rect. Shared by SpatialHash and EnemyWorld.index_cells
+    :param radius: radius of the collision circle
+    :param width: width of the rect
+    :param height: height of the rect
+    :return: pixels
+    """
+    return max(math.ceil(radius), (max(width, height) + 1) // 2 + 1)
+
+
+class SpatialHash:
+    """
+    Uniform grid broad phase for sprite collisions.
+    Every sprite of the indexed group is stored in the cell holding its rect center. Sprites are only moved between
+    cells when their center crosses a cell border, so keeping the grid up to date costs one dict lookup per sprite.
+    A collision query only visits the cells around the other sprite, i.e. the cost follows the local density.
+    """
+
+    def __init__(self, cell_size=64):
+        """
+        Constructor
+        :param cell_size: width and height of a grid cell in pixels
+        """
+        self.cell_size = cell_size
+        self.cells = {}  # (column, row) -> set of sprites
+        self.sprite_cell = {}  # sprite -> (column, row)
+        self.group = None  # group the grid was last updated with
+        self.reach = 0  # largest distance from a sprite center to the edge of its collision shape
+
+    def cell(self, pos):
+        return pos[0] // self.cell_size, pos[1] // self.cell_size
+
+    def insert(self, sprite):
+        key = self.cell(sprite.rect.center)
+        self.cells.setdefault(key, set()).add(sprite)
+        self.sprite_cell[sprite] = key
+        self.reach = max(self.reach, shape_reach(collision_radius(sprite), *sprite.rect.size))
+
+    def remove(self, sprite):
+        key = self.sprite_cell.pop(sprite)
+        cell = self.cells[key]
+        cell.discard(sprite)
+        if not cell:
+            del self.cells[key]
+
+    def update(self, group):
+        """
+        Move the sprites of group that changed cell since the last call. Sprites no longer in group are dropped.
+        :param group: sprite group to index
+        :return: None
+        """
+        if group is not self.group:
+            self.clear()
+            self.group = group
+        cell_size, cells, sprite_cell = self.cell_size, self.cells, self.sprite_cell
+        for sprite in group.sprites():
+            centerx, centery = sprite.rect.center
+            key = (centerx // cell_size, centery // cell_size)
+            old = sprite_cell.get(sprite)
+            if old != key:
+                if old is not None:
+                    self.remove(sprite)
+                self.insert(sprite)
+        # -- sprites removed from the group
+        if len(sprite_cell) != len(group):
+            for sprite in [sprite for sprite in sprite_cell if sprite not in group]:
+                self.remove(sprite)
+
+    def clear(self):
+        self.cells.clear()
+        self.sprite_cell.clear()
+        self.group = None
+        self.reach = 0
+
+    def query(self, rect):
+        """
+        Yield indexed sprites whose collision shape may touch rect
+        :param rect: pygame.Rect
+        :return: generator of sprites
+        """
+        reach, cells = self.reach, self.cells
+        left, top = self.cell((rect.left - reach, rect.top - reach))
+        right, bottom = self.cell((rect.right + reach, rect.bottom + reach))
+        for column in range(left, right + 1):
+            for row in range(top, bottom + 1):
+                cell = cells.get((column, row))
+                if cell:
+                    yield from cell
+
+    def spritecollide(self, sprite, collided=None):
+        """
+        Indexed sprites colliding with sprite, like pygame.sprite.spritecollide on the indexed group
+        :param sprite: sprite to test
+        :param collided: callback like pygame.sprite.collide_circle. None compares the rects
+        :return: list of sprites
+        """
+        rect = sprite.rect
+        if collided is pygame.sprite.collide_circle:
+            radius = collision_radius(sprite)
+            rect = pygame.Rect(0, 0, 2 * radius, 2 * radius)
+            rect.center = sprite.rect.center
+        if collided is None:
+            return [other for other in self.query(rect) if rect.colliderect(other.rect)]
+        return [other for other in self.query(rect) if collided(sprite, other)]
+
+    def groupcollide(self, groupa, groupb, dokilla=False, dokillb=False, collided=None):
+        """
+        Drop in replacement of pygame.sprite.groupcollide using the grid for the indexed group
+        :return: dictionary of sprites in groupa that collide with groupb
+        """
+        crashed = {}
+        if groupb is self.group:
+            for sprite in groupa.sprites():
+                hits = self.spritecollide(sprite, collided)
+                if hits:
+                    crashed[sprite] = hits
+        elif groupa is self.group:
+            for other in groupb.sprites():
+                for sprite in self.spritecollide(other, collided):
+                    crashed.setdefault(sprite, []).append(other)
+        else:
+            return pygame.sprite.groupcollide(groupa, groupb, dokilla, dokillb, collided)
+        for sprite, hits in crashed.items():
+            if dokilla:
+                sprite.kill()
+            if dokillb:
+                for other in hits:
+                    other.kill()
+        return crashed
@@ -1,10 +1,26 @@
 import os
 import time
-import pygame
+import struct
+import hashlib
+import argparse
 import random
+import pygame
 from enemy import Enemy
 from player import Player
 from enemy_detection import EnemyDetection
+from enemy_world import EnemyWorld, HAVE_NUMPY
+from spatial_hash import SpatialHash, collide_rect_mask
+from dirty_render import DirtyLayeredUpdates
+from frame_profiler import FrameProfiler
+from frame_governor import FrameGovernor
+from frame_capture import FrameCapture
+from score_log import ScoreLog
+from assets import assets
+from camera import Camera
+from window_state import WindowState
+from enemy_pool import EnemyPool
+import snapshot
+from replay import Recording, MOVE, RESPAWN, PAUSE, SPAWN, PILOT
 
 
 class SuperAvoider:
@@ -12,10 +28,6 @@ class SuperAvoider:
     Main class
     """
     # ---- Static variables ----
-    # Center window on screen
-    os.environ['SDL_VIDEO_CENTERED'] = '1'
-    # Initialize pygame
-    pygame.init()
     # ---- Image Path and Game Icon ----
     # Path to file directory
     file_path = os.path.dirname(os.path.abspath(__file__))
@@ -23,138 +35,241 @@ class SuperAvoider:
     image_path = os.path.join(file_path, "Images")
     # Set icon of window
     icon_path = os.path.join(image_path, "player.png")#"babytux.png")
-    try:
-        pygame.display.set_icon(pygame.image.load(icon_path))
-    except:
-        raise (UserWarning, "Could not find icon in", icon_path)
 
-    def __init__(self):
+    def __init__(self, headless=False, fixed_dt=None, seed=None, record=None, capture=None, world_size=None,
+                 scores=None, autopilot=None):
+        """
+        Constructor
+        :param headless: run without a window. The game is created but not started, advance it with step()
+        :param fixed_dt: seconds simulated per tick, defaults to 1 / TICK_RATE
+        :param seed: seed of the random number generator, None for different games every time
+        :param record: file the input of the played game is recorded to, see replay.py
+        :param capture: file or directory every drawn frame is written to, see frame_capture.py
+        :param world_size: (width, height) of the world, defaults to the window size.
+        A larger world scrolls with the first player and only the part in the window is drawn
+        :param scores: score log every Game Over is appended to, see score_log.py
+        :param autopilot: policy steering the players instead of the keyboard, see autopilot.py
+        """
+        self.headless = headless
+        # Every random number of the game comes from this generator
+        self.rng = random.Random(seed)
+        self.record_path = record
+        self.recording = None
+        self.autopilot = autopilot
+        self.piloted = False  # players carry input bits of an autopilot
+        if headless:
+            # Render into memory with SDL's dummy video driver, nothing is shown
+            os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+            # Keep the default SIGINT/SIGTERM behaviour, e.g. for worker processes
+            os.environ.setdefault('SDL_NO_SIGNAL_HANDLERS', '1')
+        else:
+            # Center window on screen
+            os.environ.setdefault('SDL_VIDEO_CENTERED', '1')
+        # Initialize the parts of pygame the game uses
+        assets.init()
+        if not headless:
+            # Set icon of window
+            pygame.display.set_icon(assets.image(os.path.basename(SuperAvoider.icon_path), convert=False))
         # ---- Define some colors ----
         self.BLACK = (0, 0, 0)
         self.WHITE = (255, 255, 255)
         self.GREEN = (0, 255, 0)
         self.BLUE = (0, 0, 255)
         self.RED = (255, 0, 0)
+        # ---- Frames drawn per second at most and game logic ticks per second ----
         self.FPS = 60
-        # ---- Load Images ----
-        self.init_sprite_images()
+        self.TICK_RATE = 60
+        self.fixed_dt = 1.0 / self.TICK_RATE if fixed_dt is None else fixed_dt
+        # Ticks simulated per frame at most, after a longer stall the game slows down instead of catching up
+        self.MAX_TICKS_PER_FRAME = 5
+        # ---- Frame rates of an unfocused and of a minimized window, the game keeps running at TICK_RATE ----
+        self.UNFOCUSED_FPS = 15
+        self.HIDDEN_FPS = 4
+        # Milliseconds the paused game sleeps waiting for an event
+        self.PAUSE_WAIT = 1000
+        # Draw sprites between their last two simulated positions
+        self.INTERPOLATE = True
+        # Enemies further than a window size from every player move only every FAR_UPDATE_INTERVAL ticks
+        self.FAR_UPDATE_INTERVAL = 1
+        # Use the sprite masks to decide if a player crashed into an enemy
+        self.PIXEL_EXACT = False
+        # Pack all sprite images into one surface
+        self.ATLAS = False
+        # Distance between the lines drawn on a scrolling world
+        self.GRID_SIZE = 200
+        # Width and height in pixels of a cell of the collision grid
+        self.CELL_SIZE = 64
+        # Enemies spawned with the mouse per second at most while the frame governor caps spawning
+        self.SPAWN_RATE = 10
+        # ---- Frame timings, F3 shows them on screen and F4 writes them to a CSV file ----
+        self.profiler = FrameProfiler(size=600)
+        self.show_hud = False
+        self.hud_surface = None
+        self.hud_rect = None
+        # ---- Focus and visibility of the window ----
+        self.window = WindowState()
+        # ---- Detail is reduced step by step when frames take longer than 1 / FPS, see frame_governor.py ----
+        self.governor = FrameGovernor(fps=self.FPS)
         # ---- Set the background ----
         size = self.W_WIDTH, self.W_HEIGHT = (800, 600)
         self.screen = pygame.display.set_mode(size)  # Create window which graphics are rendered on
+        # ---- World the sprites move in and the part of it shown in the window ----
+        self.world_rect = pygame.Rect((0, 0), world_size or size)
+        self.camera = Camera(size, self.world_rect)
+        self.SCROLLING = self.world_rect.size != self.screen.get_size()
+        # ---- Frames written to disk by a background thread, headless games wait for it instead of dropping frames
+        self.capture = FrameCapture(capture, size, fps=self.FPS, block=headless) if capture else None
+        # ---- Scores kept on disk, written by a background thread ----
+        self.score_log = ScoreLog(scores) if scores else None
+        # ---- Load Images ----
+        self.init_sprite_images()
         self.background = pygame.Surface((self.screen.get_width(), self.screen.get_height()))  # Surface which graphic
         # objects are drawn on and then pushed to the screen to render
-        colour = (random.randint(0, 244), random.randint(0, 244), random.randint(0, 244))
+        colour = (self.rng.randint(0, 244), self.rng.randint(0, 244), self.rng.randint(0, 244))
         self.background.fill(colour)  # Background colour
-        self.background.blit(self.write("Press ESC or Q to quit"), (5, 10))
-        self.background.blit(self.write("Press P to (un)pause"), (self.W_WIDTH - 225, 10))
+        self.grid_colour = tuple(c * 3 // 4 for c in colour)  # lines showing the scrolling of a large world
+        if not headless:
+            self.background.blit(self.write("Press ESC or Q to quit"), (5, 10))
+            self.background.blit(self.write("Press P to (un)pause"), (self.W_WIDTH - 225, 10))
         self.background.convert()
         self.screen.blit(self.background, (0, 0))
         # ---- Start the game ----
-        # Make images suitable for quick blitting, i.e drawn quickly on screen
-        for i, _ in enumerate(Enemy.image):
-            Enemy.image[i] = Enemy.image[i].convert_alpha()
-        for i, _ in enumerate(Player.image):
-            Player.image[i] = Player.image[i].convert_alpha()
-        self.start_game()
+        if headless:
+            self.new_game()
+        else:
+            self.start_game()
 
     def write(self, msg="pygame is cool", style=None, size=32, colour=(0, 0, 0)):
-        myfont = pygame.font.SysFont(style, size)
-        mytext = myfont.render(msg, True, colour)  # Surface object
-        mytext = mytext.convert_alpha()
-        return mytext
+        # Font and rendered text are cached, do not draw on the returned surface
+        return assets.text(msg, style, size, colour)  # Surface object
 
     def init_sprite_images(self):
         """
         Method to load the enemy and player images that will be displayed on the screen
+        Images are loaded and converted for quick blitting once, creating another game reuses them
         :return:
         """
-        try:
-            Enemy.image.append(pygame.image.load(os.path.join(SuperAvoider.image_path, "babytux.png")))
-            Enemy.image.append(pygame.image.load(os.path.join(SuperAvoider.image_path, "babytux_neg.png")))
-            Player.image.append(pygame.image.load(os.path.join(SuperAvoider.image_path, "player.png")))
-            Player.image.append(pygame.image.load(os.path.join(SuperAvoider.image_path, "player_dead.png")))
-        except:
-            raise (UserWarning, "Unable to find image in folder:", os.getcwd())
-        Enemy.image.append(Enemy.image[0].copy())  # copy of first image
-        Player.image.append(Player.image[0].copy())
-        # rect(Surface, color, Rect, width=0) -> Rect
-        # Draws a rectangular shape on the Surface. The given Rect is the area of the rectangle.
-        # The width argument is the thickness to draw the outer edge.
-        # If width is zero then the rectangle will be filled.
-        pygame.draw.rect(Enemy.image[2], self.BLUE, (0, 0, 32, 36), 1)  # Draw blue border around image[2]
-        pygame.draw.rect(Player.image[2], self.RED, (0, 0, 32, 32), 1)  # Draw red border around image[2]
-        # print(Player.image[0].get_size())
+        enemy_images, player_images = assets.sprite_images(self.BLUE, self.RED, atlas=self.ATLAS)
+        Enemy.image[:] = enemy_images
+        Player.image[:] = player_images
 
     def spawn_enemies(self, pop=1):
         """
         Creates pop number of enemies
-        Enemies spawn in the 1st quadrant of the game display
+        Enemies spawn in the 1st quadrant of the world
         :param pop: population
         :return:
         """
+        width, height = self.world_rect.size
         for enemy in range(pop):
             # Draw positions from top left corner
-            pos = (random.random() * self.W_WIDTH / 2, random.random() * self.W_HEIGHT / 2)
-            Enemy(pos, self.background)
+            pos = (self.rng.random() * width / 2, self.rng.random() * height / 2)
+            Enemy.spawn(pos, self.world_rect)
 
     def spawn_player(self, pop=1):
         """
         Spawn player on the board
-        Players spawn in the 4th quadrant of the game display
+        Players spawn in the 4th quadrant of the world
         :param pop: number of players
         :return:
         """
+        width, height = self.world_rect.size
         for individual in range(pop):
-            colour = (random.randint(0, 244), random.randint(0, 244), random.randint(0, 244))
-            pos = (self.W_WIDTH / 2 + random.random() * self.W_WIDTH / 2,
-                   self.W_HEIGHT / 2 + random.random() * self.W_HEIGHT / 2)
-            p1 = Player(start_pos=pos, game_display=self.background)
-            EnemyDetection(colour=colour, starting_pos=pos, size=5 * p1.rect.width)
+            colour = (self.rng.randint(0, 244), self.rng.randint(0, 244), self.rng.randint(0, 244))
+            pos = (width / 2 + self.rng.random() * width / 2,
+                   height / 2 + self.rng.random() * height / 2)
+            p1 = Player(start_pos=pos, game_display=self.world_rect)
+            p1.detector = EnemyDetection(colour=colour, starting_pos=pos, size=5 * p1.rect.width)
 
     def respown(self):
-        colour = (random.randint(0, 244), random.randint(0, 244), random.randint(0, 244))
-        pos = (random.random() * self.W_WIDTH, random.random() * self.W_HEIGHT)
-        p1 = Player(start_pos=pos, game_display=self.background)
-        EnemyDetection(colour=colour, starting_pos=pos, size=5 * p1.rect.width)
+        colour = (self.rng.randint(0, 244), self.rng.randint(0, 244), self.rng.randint(0, 244))
+        pos = (self.rng.random() * self.world_rect.width, self.rng.random() * self.world_rect.height)
+        p1 = Player(start_pos=pos, game_display=self.world_rect)
+        p1.detector = EnemyDetection(colour=colour, starting_pos=pos, size=5 * p1.rect.width)
 
     def event_handle(self):
+        """
+        Handle window and key events
+        :return: input bits of the keys that change the game (RESPAWN, PAUSE)
+        """
+        bits = 0
         for event in pygame.event.get():  # loop through all events that happened on the screen
+            if self.window.handle(event):
+                continue
             if event.type == pygame.QUIT:
                 self.mainloop = False
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE or event.key == pygame.K_q:
                     self.mainloop = False
                 if event.key == pygame.K_r:
-                    self.respown()
+                    bits |= RESPAWN
                 if event.key == pygame.K_p:
+                    bits |= PAUSE
                     self.pause()
+                if event.key == pygame.K_F3:
+                    self.show_hud = not self.show_hud
+                if event.key == pygame.K_F4:
+                    path = self.profiler.write_csv(time.strftime("profile-%Y%m%d-%H%M%S.csv"))
+                    print("Frame timings written to", path)
+        return bits
+
+    def read_input(self):
+        """
+        Input of this frame: events, arrow keys and mouse
+        :return: (input bits, mouse position in the world)
+        """
+        bits = self.event_handle() | Player.keyboard()
+        if pygame.mouse.get_pressed()[0]:
+            bits |= SPAWN
+        return bits, self.camera.to_world(pygame.mouse.get_pos())
+
+    def apply_input(self, bits, mouse=(0, 0)):
+        """
+        Apply the input of one frame to the game. Everything a player can do goes through here,
+        so a recorded game replays exactly.
+        :param bits: input bits, see replay.py
+        :param mouse: mouse position in the world
+        :return: None
+        """
+        if bits & RESPAWN:
+            self.respown()
+        if bits & SPAWN:
+            Enemy.spawn(mouse, self.world_rect)
+        Player.controls = bits & MOVE
 
     def pause(self):
+        """
+        Wait until P is pressed again. The overlay is drawn once and the process sleeps until an event arrives,
+        the window is only drawn again when its content was lost.
+        :return: None
+        """
         pause_text_surf = self.write("Paused", style="None", size=115)
         pause_text_rect = pause_text_surf.get_rect()
         pause_text_rect.center = ((round(self.W_WIDTH / 2)), (round(self.W_HEIGHT / 2)))
         self.screen.blit(pause_text_surf, pause_text_rect)
+        pygame.display.update(pause_text_rect)  # nothing else changes while paused
         paused = True
-        while paused:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    exit(0)
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_p:
-                        paused = False
-                    elif event.key == pygame.K_ESCAPE or event.key == pygame.K_q:
-                        self.mainloop = False
-                        paused = False
-            # Update/draw game display
-            pygame.display.flip()
-            # Update only 5 times per second
-            self.clock.tick(5)
+        while paused and self.mainloop:
+            event = pygame.event.wait(self.PAUSE_WAIT)  # NOEVENT after the timeout
+            if self.window.handle(event):
+                if self.window.exposed and self.window.visible:
+                    pygame.display.flip()  # the screen surface still holds the last frame and the overlay
+                    self.window.exposed = False
+            elif event.type == pygame.QUIT:
+                self.mainloop = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_p:
+                    paused = False
+                elif event.key == pygame.K_ESCAPE or event.key == pygame.K_q:
+                    self.mainloop = False
         self.screen.blit(self.background, (0, 0))
+        self.all_sprites_group.repaint()
+        self.clock.tick()  # the time paused is not simulated
+        self.profiler.begin_frame()  # the time paused is not part of the frame
 
     def make_sprite_groups(self):
         # assign default groups to each sprite class
-        self.all_sprites_group = pygame.sprite.LayeredUpdates()  # All sprites in this group
+        self.all_sprites_group = DirtyLayeredUpdates()  # All sprites in this group, only changed areas are drawn
         self.player_group = pygame.sprite.LayeredUpdates()
         self.enemy_group = pygame.sprite.LayeredUpdates()
         self.detection_group = pygame.sprite.LayeredUpdates()
@@ -167,77 +282,503 @@ class SuperAvoider:
         # ---- Player group
         Player.groups = self.player_group, self.all_sprites_group
         EnemyDetection.groups = self.detection_group, self.all_sprites_group
+        # ---- Killed enemies are reused by Enemy.spawn
+        if Enemy.pool is None:
+            Enemy.pool = EnemyPool(Enemy)
+        # ---- Vectorized enemy movement (requires numpy)
+        Enemy.rng = self.rng
+        Enemy.engine = EnemyWorld(self.world_rect, Enemy.image, seed=self.game_seed) if HAVE_NUMPY else None
+        if Enemy.engine is not None:
+            # A scrolling world draws enemies straight from the arrays, sprites are only updated when needed
+            Enemy.engine.lazy = self.SCROLLING
+        self.camera.target = None
+        # ---- Broad phase for collisions against the enemy group, EnemyWorld has its own grid over the arrays
+        self.spatial_hash = SpatialHash(cell_size=self.CELL_SIZE) if Enemy.engine is None else None
 
-    def start_game(self):
+    def new_game(self, enemies=50, players=1, seed=None):
         """
-        Main method to run game
-        :return:
+        Create the sprite groups, enemies and players of a new game
+        :param enemies: number of enemies to spawn
+        :param players: number of players to spawn
+        :param seed: seed of this game, None draws one from the generator of the game
+        :return: None
         """
+        seed = seed if seed is not None else self.rng.getrandbits(32)
+        # Recordings, snapshots and the score log store the seed as an unsigned 64 bit number and numpy takes no
+        # negative seeds, so every int is folded into that range once, here
+        self.game_seed = seed & 0xFFFFFFFFFFFFFFFF
+        self.rng.seed(self.game_seed)
+        if self.record_path is not None:
+            self.recording = Recording(self.game_seed, enemies, players)
         # Start a timer
         self.clock = pygame.time.Clock()
+        self.ticks = 0  # ticks simulated
+        self.time = 0.0  # seconds simulated
+        self.accumulator = 0.0  # real time not simulated yet
+        self.pressed = 0  # input bits of key presses waiting for the next tick
+        self.next_spawn = 0.0  # simulated time of the next mouse spawn while spawning is capped
+        self.previous_centers = {}  # sprite -> rect center before the last tick
+        self.sim_centers = {}  # sprite -> simulated rect center while its rect holds an interpolated one
+        self.render_centers = {}  # sprite -> rect center it was last drawn at
+        self.detected = 0  # enemies inside a detector in the last frame
+        self.scores = []  # (player number, score) of every Game Over
+        # -- Recycle the sprites of the previous game --
+        if hasattr(self, "all_sprites_group"):
+            for sprite in self.all_sprites_group.sprites():
+                sprite.kill()
         # -- Create sprite groups --
         self.make_sprite_groups()
         # -- Create player and enemies
-        self.spawn_enemies(50)
-        self.spawn_player(1)
-        # -------- Main Program Loop ---------
-        self.mainloop = True
-        while self.mainloop:
-            seconds = round(time.clock())  # Update time
-            # ***** Main Event Loop *****
-            self.event_handle()
-            # *****  Game logic  *****
-            if pygame.mouse.get_pressed()[0]:
-                Enemy(pygame.mouse.get_pos(), self.background)
-            # ---- collision detection ----
+        self.spawn_enemies(enemies)
+        self.spawn_player(players)
+
+    def collide(self):
+        """
+        Mark enemies inside a detector and flag players that crashed into an enemy
+        :return: None
+        """
+        engine = Enemy.engine
+        # The frame governor falls back to the cheaper rect tests
+        rect_tests = self.governor.level >= FrameGovernor.RECT
+        pixel_exact = self.PIXEL_EXACT and not rect_tests
+        if engine is not None:
+            # Sort the enemies into grid cells, then test every detector and player against the enemies in the cells
+            # around it with vectorized versions of pygame.sprite.collide_circle and Rect.colliderect
+            engine.clear_detected()
+            engine.index_cells(self.CELL_SIZE)
+            for detector in self.detection_group:
+                rows = engine.near(detector.rect)
+                if rect_tests:
+                    engine.detected[engine.rect_hits(detector.rect, rows)] = True
+                else:
+                    engine.detected[engine.circle_hits(detector.rect.center, detector.radius, rows)] = True
+            self.detected = int(engine.detected[:engine.count].sum())
+            gameover_dict = {}
+            for player in self.player_group:
+                hits = engine.rect_hits(player.rect, engine.near(player.rect))
+                if len(hits) and pixel_exact:
+                    hits = [enemy for enemy in engine.refresh(hits) if collide_rect_mask(player, enemy)]
+                if len(hits):
+                    gameover_dict[player] = hits
+        else:
             for enemy in self.enemy_group:
                 enemy.detected = False  # set all Enemy sprites to not detected
-
-            # pygame.sprite.groupcollide(group1, group2, dokill1, dokill2, collided = None):
+            # Move enemies between grid cells, then only test sprites in neighbouring cells
+            self.spatial_hash.update(self.enemy_group)
+            # groupcollide(group1, group2, dokill1, dokill2, collided = None):
             # return dictionary of Sprites in group1 that collide with group2
-            detected_dict = pygame.sprite.groupcollide(self.enemy_group, self.detection_group, False, False,
-                                                       pygame.sprite.collide_circle)
-            gameover_dict = pygame.sprite.groupcollide(self.player_group, self.enemy_group, False, False)
+            detected_dict = self.spatial_hash.groupcollide(self.enemy_group, self.detection_group, False, False,
+                                                           None if rect_tests else pygame.sprite.collide_circle)
+            gameover_dict = self.spatial_hash.groupcollide(self.player_group, self.enemy_group, False, False,
+                                                           collide_rect_mask if pixel_exact else None)
             # pygame.sprite.collide_circle works only if one sprite has self.radius
             # No argument collided yield self.rects will be checked
+            self.detected = len(detected_dict)
             if detected_dict:
                 for enemy in detected_dict:
                     enemy.detected = True  # will get a blue border from Bird.update()
-            # Remove player and its detector
-            if gameover_dict:
-                for player in gameover_dict:
-                    print("Player %i Score: %i" % (player.number, player.score))
-                    player.remove = True
-                    EnemyDetection.devices[player.number].remove = True
-
-            # ----- Update sprites -----
-            # Erase sprites from last Group.draw() call.
-            # The destination Surface is cleared by filling the drawn Sprite positions with the background.
-            self.all_sprites_group.clear(self.screen, self.background)
-            # Calls the update() method on all Sprites in the Group.
-            # The base Sprite class has an update method that takes any number of arguments and does nothing.
-            # The arguments passed to Group.update() will be passed to each Sprite.
-            seconds_passed = self.clock.tick(self.FPS) / 1000.0
-            # -- Update/Remove detectors for alive/removed players
-            if self.player_group:
-                for player in self.player_group:
-                    self.detection_group.update((player.rect.centerx, player.rect.centery))
-            self.player_group.update(seconds_passed)
+        # Remove player and its detector
+        if gameover_dict:
+            for player in gameover_dict:
+                if self.score_log is not None:
+                    self.score_log.append(player.number, player.score, len(self.enemy_group), self.game_seed,
+                                          self.time)
+                if not self.headless:
+                    if self.score_log is not None:
+                        print("Player %i Score: %i Rank: %i of %i" % (player.number, player.score,
+                                                                    self.score_log.rank(player.score),
+                                                                    len(self.score_log)))
+                    else:
+                        print("Player %i Score: %i" % (player.number, player.score))
+                self.scores.append((player.number, player.score))
+                player.remove = True
+                if player.detector is not None:
+                    player.detector.remove = True
+
+    def update_sprites(self, seconds_passed):
+        """
+        Move all sprites
+        :param seconds_passed: time passed since the last call
+        :return: None
+        """
+        # Calls the update() method on all Sprites in the Group.
+        # The base Sprite class has an update method that takes any number of arguments and does nothing.
+        # The arguments passed to Group.update() will be passed to each Sprite.
+        # -- Update/Remove detectors for alive/removed players
+        if self.INTERPOLATE and not self.headless:
+            sprites = self.player_group.sprites() + self.detection_group.sprites()
+            if Enemy.engine is None:
+                sprites += self.enemy_group.sprites()
+            self.previous_centers = {sprite: sprite.rect.center for sprite in sprites}
+        if self.player_group:
+            for player in self.player_group:
+                self.detection_group.update((player.rect.centerx, player.rect.centery))
+        if self.autopilot is not None and self.player_group:
+            players = self.player_group.sprites()
+            for player, bits in zip(players, self.autopilot.decide(self, players)):
+                player.pilot = int(bits)
+            self.piloted = True
+        elif self.autopilot is None and self.piloted:
+            # The autopilot was switched off, the players follow the keyboard again
+            for player in self.player_group:
+                player.pilot = None
+            self.piloted = False
+        self.player_group.update(seconds_passed)
+        # -- The frame governor moves far enemies every other tick and keeps the enemy images
+        interval = self.FAR_UPDATE_INTERVAL
+        if self.governor.level >= FrameGovernor.FAR:
+            interval = max(interval, 2)
+        Enemy.tint = self.governor.level < FrameGovernor.TINT
+        if Enemy.engine is not None:
+            Enemy.engine.tint = Enemy.tint
+            active = None
+            if interval > 1:
+                active = Enemy.engine.active_rows([player.rect.center for player in self.player_group],
+                                                  self.screen.get_size(), interval, self.ticks)
+            Enemy.engine.update(seconds_passed, active)  # all enemies in a few vectorized calls
+        else:
             self.enemy_group.update(seconds_passed)  # arg = seconds since last call
-            # Draws the contained Sprites to the Surface argument.
-            # This uses the Sprite.image attribute for the source surface, and Sprite.rect for the position.
-            self.all_sprites_group.draw(self.screen)
-
-            # ----- Update screen with what we have drawn ----
-            pygame.display.flip()
-            # Display useful information
-            pygame.display.set_caption("[FPS]: %.2f Time: %i Enemies: %i" % (self.clock.get_fps(), seconds, len(self.enemy_group)))
-            # ----- Limit to 'FPS' frames per second ----
-            self.clock.tick(self.FPS)
+
+    def tick(self, seconds_passed):
+        """
+        Advance the game logic by one tick
+        :param seconds_passed: time simulated by this tick
+        :return: None
+        """
+        self.restore()
+        # ---- collision detection ----
+        self.collide()
+        self.profiler.mark("collision")
+        # ----- Update sprites -----
+        self.update_sprites(seconds_passed)
+        self.profiler.mark("update")
+        self.ticks += 1
+        self.time += seconds_passed
+
+    def simulate(self, seconds_passed, bits=0, mouse=(0, 0), max_ticks=None):
+        """
+        Run as many ticks of fixed_dt seconds as fit into the real time passed plus what was left over before.
+        At most MAX_TICKS_PER_FRAME ticks are run, the rest of a long stall is dropped.
+        Key presses (RESPAWN, PAUSE) are applied once, in the next tick that runs.
+        :param seconds_passed: real time passed since the last call
+        :param bits: input bits of this frame
+        :param mouse: mouse position
+        :param max_ticks: ticks run at most, defaults to MAX_TICKS_PER_FRAME
+        :return: fraction of a tick simulated time is behind real time, for interpolate()
+        """
+        dt = self.fixed_dt
+        # The main loop passes a higher limit while the window is drawn at a lower frame rate, enough for the ticks
+        # of one such frame. A stall gets MAX_TICKS_PER_FRAME at any frame rate, see WindowState.ticks_per_frame
+        max_ticks = self.MAX_TICKS_PER_FRAME if max_ticks is None else max_ticks
+        self.accumulator += seconds_passed
+        self.pressed |= bits & (RESPAWN | PAUSE)
+        held = bits & ~(RESPAWN | PAUSE)
+        steps = 0
+        while self.accumulator >= dt and steps < max_ticks:
+            tick_bits = held | self.pressed
+            self.pressed = 0
+            if tick_bits & SPAWN and self.governor.level >= FrameGovernor.SPAWN:
+                # Spawning is capped before recording, the recorded input holds only the spawns that happened
+                if self.time < self.next_spawn:
+                    tick_bits &= ~SPAWN
+                else:
+                    self.next_spawn = self.time + 1.0 / self.SPAWN_RATE
+            self.apply_input(tick_bits, mouse)
+            self.tick(dt)
+            if self.recording is not None:
+                self.record(tick_bits, dt, mouse)
+            self.accumulator -= dt
+            steps += 1
+        if self.accumulator >= dt:
+            self.accumulator %= dt  # spiral of death: give up on the time we can not catch up with
+        return self.accumulator / dt
+
+    def interpolate(self, alpha):
+        """
+        Move the sprites to a position between their last two ticks for drawing, restore() undoes it
+        :param alpha: 0 for the position before the last tick, 1 for the current position
+        :return: None
+        """
+        if Enemy.engine is not None and not Enemy.engine.lazy:
+            Enemy.engine.interpolate(alpha)
+        render_centers = {}
+        for sprite, (x0, y0) in self.previous_centers.items():
+            if not sprite.alive():
+                continue
+            # A frame without a tick finds the rect still interpolated, the simulated center is kept from before
+            x1, y1 = self.sim_centers.setdefault(sprite, sprite.rect.center)
+            center = (round(x0 + (x1 - x0) * alpha), round(y0 + (y1 - y0) * alpha))
+            if self.render_centers.get(sprite) != center:
+                sprite.dirty = 1
+            sprite.rect.center = render_centers[sprite] = center
+        self.render_centers = render_centers
+
+    def restore(self):
+        """
+        Put the rects moved by interpolate() back to their simulated position
+        :return: None
+        """
+        if Enemy.engine is not None:
+            Enemy.engine.restore()
+        for sprite, center in self.sim_centers.items():
+            sprite.rect.center = center
+        self.sim_centers.clear()
+
+    def draw(self, alpha=None):
+        """
+        Draw the sprites that changed and update only those areas of the window
+        :param alpha: draw the sprites interpolated between their last two ticks, None draws the last tick
+        :return: None
+        """
+        if alpha is not None:
+            self.interpolate(alpha)
+        if self.SCROLLING:
+            self.draw_view(alpha)
+            return
+        # Sprites are erased by filling their last drawn positions with the background.
+        self.all_sprites_group.clear(self.screen, self.background)
+        # Draws the dirty Sprites (and the ones they overlap) to the Surface argument.
+        # This uses the Sprite.image attribute for the source surface, and Sprite.rect for the position.
+        if self.hud_rect is not None:
+            self.all_sprites_group.damage(self.hud_rect)  # erase the last overlay
+        dirty_rects = self.all_sprites_group.draw(self.screen)
+        if self.capture is not None:
+            self.capture.capture(self.screen)  # without the overlay
+        if self.show_hud:
+            dirty_rects.append(self.draw_hud())
+        elif self.hud_rect is not None:
+            dirty_rects.append(self.hud_rect)
+            self.hud_rect = None
+        self.profiler.mark("draw")
+        # ----- Update screen with what we have drawn ----
+        pygame.display.update(dirty_rects)
+        # Display useful information
+        self.set_caption()
+        self.profiler.mark("flip")
+
+    def draw_view(self, alpha=None):
+        """
+        Draw the part of the world seen by the camera. The view moves with the player, so the whole window is
+        drawn every frame, but only the sprites inside the view are blitted.
+        :param alpha: interpolation of the enemy positions, see EnemyWorld.visible
+        :return: None
+        """
+        view = self.camera.follow(self.player_group)
+        screen = self.screen
+        screen.blit(self.background, (0, 0))
+        # ---- Grid and border of the world ----
+        for x in range(view.left - view.left % self.GRID_SIZE, view.right, self.GRID_SIZE):
+            pygame.draw.line(screen, self.grid_colour, (x - view.x, 0), (x - view.x, view.height))
+        for y in range(view.top - view.top % self.GRID_SIZE, view.bottom, self.GRID_SIZE):
+            pygame.draw.line(screen, self.grid_colour, (0, y - view.y), (view.width, y - view.y))
+        pygame.draw.rect(screen, self.BLACK, self.camera.to_screen(self.world_rect), 2)
+        # ---- Sprites in layer order ----
+        if Enemy.engine is not None:
+            screen.blits(Enemy.engine.visible(view, alpha), doreturn=False)
+        else:
+            screen.blits([(enemy.image, self.camera.to_screen(enemy.rect)) for enemy in self.enemy_group
+                          if view.colliderect(enemy.rect)], doreturn=False)
+        screen.blits([(sprite.image, self.camera.to_screen(sprite.rect))
+                      for group in (self.player_group, self.detection_group) for sprite in group
+                      if view.colliderect(sprite.rect)], doreturn=False)
+        if self.capture is not None:
+            self.capture.capture(screen)
+        if self.show_hud:
+            self.draw_hud()
+        self.profiler.mark("draw")
+        pygame.display.flip()
+        self.set_caption()
+        self.profiler.mark("flip")
+
+    def text_due(self, per_second):
+        """
+        Whether text shown on screen is rendered again in this frame
+        :param per_second: updates per second, twice per second at most while the frame governor throttles text
+        :return: bool
+        """
+        if self.governor.level >= FrameGovernor.TEXT:
+            per_second = min(per_second, 2)
+        return self.profiler.frames % (self.FPS // per_second or 1) == 0
+
+    def set_caption(self):
+        """
+        Show frame rate, time, number of enemies and the level of the frame governor in the window title
+        :return: None
+        """
+        if self.text_due(self.FPS):
+            pygame.display.set_caption("[FPS]: %.2f Time: %i Enemies: %i Level: %i" % (
+                self.clock.get_fps(), self.time, len(self.enemy_group), self.governor.level))
+
+    def draw_hud(self):
+        """
+        Draw the frame time overlay, the text is rendered again 4 times per second
+        :return: rect of the overlay
+        """
+        if self.hud_surface is None or self.text_due(4):
+            font = assets.font(None, 20)
+            lines = self.profiler.hud_lines() + ["governor " + self.governor.status()]
+            lines = [font.render(line, True, self.WHITE) for line in lines]
+            height = font.get_linesize()
+            self.hud_surface = pygame.Surface((max(line.get_width() for line in lines) + 10,
+                                               len(lines) * height + 10), pygame.SRCALPHA)
+            self.hud_surface.fill((0, 0, 0, 160))
+            for i, line in enumerate(lines):
+                self.hud_surface.blit(line, (5, 5 + i * height))
+        self.hud_rect = self.screen.blit(self.hud_surface, (5, 45))
+        return self.hud_rect
+
+    def state(self):
+        """
+        Summary of the running game
+        :return: dictionary
+        """
+        return {"ticks": self.ticks,
+                "time": self.time,
+                "enemies": len(self.enemy_group),
+                "detected": self.detected,
+                "level": self.governor.level,
+                "players": {player.number: player.score for player in self.player_group},
+                "scores": list(self.scores),
+                "game_over": not self.player_group}
+
+    def state_hash(self):
+        """
+        Digest of positions and speeds of all enemies and positions and scores of all players
+        :return: 16 bytes
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        if Enemy.engine is not None:
+            n = Enemy.engine.count
+            for column in (Enemy.engine.x, Enemy.engine.y, Enemy.engine.vx, Enemy.engine.vy):
+                digest.update(column[:n].tobytes())
+        else:
+            for enemy in self.enemy_group:
+                digest.update(struct.pack("<dddd", enemy.x_pos, enemy.y_pos, enemy.vx, enemy.vy))
+        for player in self.player_group:
+            digest.update(struct.pack("<ddd", player.x_pos, player.y_pos, player.score))
+        return digest.digest()
+
+    def checkpoint(self):
+        """
+        Snapshot of the whole game for rollback(), see snapshot.py
+        :return: bytearray
+        """
+        return snapshot.take(self)
+
+    def rollback(self, buffer):
+        """
+        Continue the game from a checkpoint
+        :param buffer: buffer returned by checkpoint() or a loaded snapshot file
+        :return: None
+        """
+        snapshot.restore(self, buffer)
+
+    def record(self, bits, seconds_passed, mouse=(0, 0)):
+        """
+        Add the input of the frame just simulated to the recording, with a state hash every hash_interval frames.
+        A frame steered by the autopilot is marked with PILOT, the recording names the policy.
+        :return: None
+        """
+        if self.autopilot is not None:
+            from autopilot import describe
+            description = describe(self.autopilot)
+            if self.recording.autopilot is None:
+                self.recording.autopilot = description
+            elif self.recording.autopilot != description:
+                raise ValueError("A recording holds one autopilot, %s was recorded before" % self.recording.autopilot)
+            bits |= PILOT
+        self.recording.record(bits, seconds_passed, mouse, self.governor.level)
+        if self.ticks % self.recording.hash_interval == 0:
+            self.recording.hashes[self.ticks] = self.state_hash()
+
+    def step(self, n=1, bits=0):
+        """
+        Advance the game n frames of fixed_dt seconds without drawing, as fast as possible
+        :param n: number of frames
+        :param bits: input bits applied in every frame, see replay.py
+        :return: state of the game after the last frame
+        """
+        seconds_passed = self.fixed_dt if self.fixed_dt is not None else 1.0 / self.FPS
+        for _ in range(n):
+            self.profiler.begin_frame()
+            self.apply_input(bits)
+            self.tick(seconds_passed)
+            if self.recording is not None:
+                self.record(bits, seconds_passed)
+            self.profiler.end_frame(len(self.enemy_group), len(self.player_group))
+        return self.state()
+
+    def close(self):
+        """
+        Release what the game registered outside itself
+        :return: None
+        """
+        self.profiler.close()
+        if self.capture is not None:
+            self.capture.close()
+            self.capture = None
+        if self.score_log is not None:
+            self.score_log.close()
+            self.score_log = None
+
+    def start_game(self):
+        """
+        Main method to run game
+        :return:
+        """
+        self.new_game()
+        # -------- Main Program Loop ---------
+        self.mainloop = True
+        while self.mainloop:
+            # ----- Limit to 'FPS' frames per second, fewer while the window is unfocused or minimized ----
+            # A captured game keeps its frame rate, the video would play too fast otherwise
+            fps = self.FPS
+            if self.capture is None:
+                fps = self.window.frame_rate(self.FPS, self.UNFOCUSED_FPS, self.HIDDEN_FPS)
+            # The only tick of the frame, so the time passed and the FPS readout include the wait
+            seconds_passed = self.clock.tick(fps) / 1000.0
+            self.profiler.begin_frame()
+            # ***** Main Event Loop *****
+            bits, mouse = self.read_input()
+            self.profiler.mark("events")
+            # *****  Game logic at TICK_RATE, drawing at up to FPS  *****
+            # A slower frame runs more ticks, so the simulated time keeps up with real time
+            max_ticks = WindowState.ticks_per_frame(self.TICK_RATE, fps, self.MAX_TICKS_PER_FRAME, seconds_passed)
+            alpha = self.simulate(seconds_passed, bits, mouse, max_ticks)
+            if self.window.exposed:
+                # The window lost its content, draw everything again
+                self.screen.blit(self.background, (0, 0))
+                self.all_sprites_group.repaint()
+                self.window.exposed = False
+            if self.window.visible or self.capture is not None:
+                self.draw(alpha if self.INTERPOLATE else None)
+            self.profiler.end_frame(len(self.enemy_group), len(self.player_group))
+            # The frame time without the wait of the clock decides the detail of the next frame
+            if fps == self.FPS:
+                self.governor.observe(self.profiler.last())
+        self.close()
         pygame.quit()
+        if self.recording is not None:
+            self.recording.save(self.record_path)
+            print("Game recorded to", self.record_path)
         print("Game exit!\nShutting down...")
         exit(0)
 
 
 if __name__ == '__main__':
-    SuperAvoider()
+    parser = argparse.ArgumentParser(description="Survive as long as possible")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random number generator")
+    parser.add_argument("--record", default=None, metavar="FILE", help="record the game for replay.py")
+    parser.add_argument("--capture", default=None, metavar="PATH",
+                        help="write every frame to a video (ffmpeg), .rgb file or PNG directory")
+    parser.add_argument("--scores", default=None, metavar="FILE", help="append every score to a score log")
+    parser.add_argument("--autopilot", action="store_true", help="let a bot play, see autopilot.py")
+    parser.add_argument("--world", type=int, nargs=2, default=None, metavar=("WIDTH", "HEIGHT"),
+                        help="size of a scrolling world larger than the window")
+    args = parser.parse_args()
+    pilot = None
+    if args.autopilot:
+        from autopilot import ThreatField
+        pilot = ThreatField()
+    SuperAvoider(seed=args.seed, record=args.record, capture=args.capture, world_size=args.world,
+                 scores=args.scores, autopilot=pilot)
@@ -0,0 +1,19 @@
+import os
+import sys
+import pytest
+
+# The game modules live in the repository root, the tests run without a window or sound
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+
+@pytest.fixture
+def game():
+    """
+    Headless game, closed after the test
+    """
+    from super_avoider import SuperAvoider
+    game = SuperAvoider(headless=True, seed=0)
+    yield game
+    game.close()
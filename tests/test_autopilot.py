@@ -0,0 +1,100 @@
+import pytest
+from autopilot import Policy, ThreatField
+from player import Player
+from replay import Recording, ReplayError, replay
+from super_avoider import SuperAvoider
+
+pytest.importorskip("numpy")
+
+
+def survival(game, pilot, seeds=range(3)):
+    game.autopilot = pilot
+    scores = []
+    for seed in seeds:
+        game.new_game(enemies=50, players=1, seed=seed)
+        while game.player_group and game.ticks < 1200:
+            game.step()
+        scores += [score for _, score in game.scores] + [player.score for player in game.player_group]
+    return sum(scores) / len(scores)
+
+
+def test_threat_field_outlives_standing_still(game):
+    assert survival(game, ThreatField()) > survival(game, None)
+
+
+def test_switching_the_autopilot_off_hands_back_the_keyboard(game):
+    game.autopilot = ThreatField()
+    game.new_game(enemies=50, players=3, seed=4)
+    game.step(5)
+    assert all(player.pilot is not None for player in game.player_group)
+    game.autopilot = None
+    game.step(1)
+    assert all(player.pilot is None for player in game.player_group)
+    centers = [player.rect.center for player in game.player_group]
+    game.step(1)  # no key held
+    assert [player.rect.center for player in game.player_group] == centers
+
+
+def test_the_field_covers_the_players_but_the_walls_are_the_world_edges():
+    pilot = ThreatField()
+    game = SuperAvoider(headless=True, world_size=(20000, 15000), autopilot=pilot)
+    try:
+        game.new_game(enemies=2000, players=1, seed=5)
+        player = game.player_group.sprites()[0]
+        for center, wall in (((10000, 7500), False), ((60, 60), True)):
+            player.rect.center = center
+            potential = pilot.field(game, [player])
+            horizon = -(-player.detector.radius // pilot.cell)
+            assert max(potential.shape) <= 4 * horizon + 1
+            top, left = pilot.origin
+            assert top * pilot.cell <= center[1] < (top + potential.shape[0]) * pilot.cell
+            assert left * pilot.cell <= center[0] < (left + potential.shape[1]) * pilot.cell
+            # A corner of the world repels by twice the wall threat, the middle of the world not at all
+            assert (potential[0, 0] > pilot.wall) == wall
+            bits = pilot.decide(game, [player])
+            if wall:
+                assert bits[0] & Player.DOWN and bits[0] & Player.RIGHT
+    finally:
+        game.close()
+
+
+def test_policy_is_abstract():
+    with pytest.raises(TypeError):
+        Policy()
+
+
+def test_autopilot_game_replays(tmp_path):
+    path = str(tmp_path / "game.rec")
+    game = SuperAvoider(headless=True, record=path, autopilot=ThreatField(far=0.5))
+    try:
+        game.new_game(enemies=80, players=3, seed=6)
+        game.step(200)
+        game.autopilot = None  # the keyboard takes over for a while
+        game.step(50, bits=Player.LEFT)
+        game.autopilot = ThreatField(far=0.5)  # an equal policy
+        game.step(200)
+        game.recording.save(path)
+        state = game.state()
+        game.record_path = None
+        game.autopilot = None
+        recording = Recording.load(path)
+        assert replay(recording, game) == state
+        assert game.autopilot is None
+        # Another policy decides differently
+        recording.autopilot = recording.autopilot.replace('"far": 0.5', '"far": 0.0')
+        with pytest.raises(ReplayError):
+            replay(recording, game)
+    finally:
+        game.close()
+
+
+def test_a_recording_holds_one_autopilot(tmp_path):
+    game = SuperAvoider(headless=True, record=str(tmp_path / "game.rec"), autopilot=ThreatField())
+    try:
+        game.new_game(enemies=10, players=1, seed=7)
+        game.step(2)
+        game.autopilot = ThreatField(cell=32)
+        with pytest.raises(ValueError):
+            game.step(1)
+    finally:
+        game.close()
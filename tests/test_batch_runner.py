@@ -0,0 +1,74 @@
+import json
+
+import batch_runner
+
+
+def write(path, records, tail=""):
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        f.write(tail)
+
+
+def test_make_jobs():
+    jobs = batch_runner.make_jobs(3, [50, 100], [80.0], 600, seed=2)
+    assert len(jobs) == 6
+    assert len({job[0] for job in jobs}) == 6
+    # Game n of every setting starts from the same seed
+    assert [job[1] for job in jobs if job[2] == 50] == [job[1] for job in jobs if job[2] == 100]
+    assert jobs[0] == ("50:80:0", 2 * 1000003, 50, 80.0, 600)
+    # Asking for more games keeps the ids and seeds of the first ones
+    assert batch_runner.make_jobs(5, [50, 100], [80.0], 600, seed=2)[:3] == jobs[:3]
+
+
+def test_load_results_drops_torn_last_line(tmp_path):
+    path = tmp_path / "results.jsonl"
+    assert batch_runner.load_results(str(path)) == []
+    write(path, [{"id": "a"}, {"id": "b"}], tail='{"id": "c", "surv')
+    assert batch_runner.load_results(str(path)) == [{"id": "a"}, {"id": "b"}]
+    # A complete record without its newline is torn too, the next record would be appended to its line
+    write(path, [{"id": "a"}], tail='{"id": "b"}')
+    assert batch_runner.read_results(str(path)) == ([{"id": "a"}], len('{"id": "a"}\n'))
+
+
+class Scores:
+    def __init__(self):
+        self.appended = []
+
+    def append(self, player, score, enemies=0, seed=0, duration=0.0):
+        self.appended.append((player, score, seed))
+
+
+def test_resume_skips_finished_games(tmp_path):
+    path = tmp_path / "results.jsonl"
+    jobs = batch_runner.make_jobs(3, [5], [100.0], 20)
+    done = {"id": jobs[0][0], "enemies": 5, "max_speed": 100.0, "survival": 1.0, "alive": True,
+            "detections_per_tick": 0.0, "marker": "kept"}
+    write(path, [done], tail='{"id": "5:100:1", "player"')
+    scores = Scores()
+    records = batch_runner.run(jobs, str(path), workers=1, scores=scores)
+    assert sorted(record["id"] for record in records) == sorted(job[0] for job in jobs)
+    assert records[0] == done
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert json.loads(lines[0]) == done  # the finished game was not rewritten or lost
+    assert sorted(json.loads(line)["id"] for line in lines) == sorted(job[0] for job in jobs)
+    # Only the games played are added to the score log, with the number of their player
+    assert sorted(seed for _, _, seed in scores.appended) == [jobs[1][1], jobs[2][1]]
+    assert all(player == record["player"] for (player, _, _), record in zip(scores.appended, records[1:]))
+    # Nothing is left to play
+    assert batch_runner.run(jobs, str(path), workers=1) == batch_runner.load_results(str(path))
+
+
+def test_summarize():
+    records = [{"enemies": 50, "max_speed": 100.0, "survival": survival, "alive": survival == 4.0,
+                "detections_per_tick": 1.0} for survival in (1.0, 2.0, 3.0, 4.0)]
+    records.append({"enemies": 100, "max_speed": 100.0, "survival": 0.5, "alive": False, "detections_per_tick": 2.0})
+    summary = batch_runner.summarize(records)
+    assert list(summary) == [(50, 100.0), (100, 100.0)]
+    stats = summary[(50, 100.0)]
+    assert stats["games"] == 4
+    assert stats["mean"] == 2.5
+    assert (stats["min"], stats["p50"], stats["p90"], stats["max"]) == (1.0, 3.0, 4.0, 4.0)
+    assert stats["alive"] == 0.25
+    assert summary[(100, 100.0)]["stdev"] == 0.0
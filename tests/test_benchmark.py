@@ -0,0 +1,15 @@
+import benchmark
+
+
+def test_run_scenario_has_what_compare_reads(capsys):
+    result = benchmark.run_scenario("mouse_hold", 30, 0)
+    assert result["enemies"] == 50 + 30  # one enemy per tick with the button held
+    assert result["players"] == 1
+    for stats in [result["frame"]] + [result["phases"][phase] for phase in benchmark.PHASES]:
+        assert set(stats) == {"mean_ms", "p50_ms", "p95_ms", "max_ms"}
+        assert 0 <= stats["p50_ms"] <= stats["max_ms"]
+    phases = sum(result["phases"][phase]["mean_ms"] for phase in benchmark.PHASES)
+    assert phases <= result["frame"]["mean_ms"]
+    results = {"scenarios": {"mouse_hold": result}}
+    assert benchmark.compare(results, results) == []
+    assert "mouse_hold" in capsys.readouterr().out
@@ -0,0 +1,81 @@
+import random
+import pygame
+import pytest
+from dirty_render import DirtyLayeredUpdates
+
+np = pytest.importorskip("numpy")
+
+SIZE = (320, 240)
+
+
+def make_image(rng, size):
+    # Translucent edges, so a sprite blended twice over itself shows up
+    image = pygame.Surface(size, pygame.SRCALPHA)
+    image.fill((rng.randrange(256), rng.randrange(256), rng.randrange(256), 120))
+    pygame.draw.circle(image, (rng.randrange(256), 0, 0, 255), (size[0] // 2, size[1] // 2), min(size) // 3)
+    return image
+
+
+def add_sprite(group, rng):
+    sprite = pygame.sprite.DirtySprite()
+    sprite._layer = rng.randrange(3)
+    sprite.image = make_image(rng, (rng.randrange(8, 60), rng.randrange(8, 60)))
+    sprite.rect = sprite.image.get_rect(center=(rng.randrange(-20, SIZE[0] + 20), rng.randrange(-20, SIZE[1] + 20)))
+    group.add(sprite)
+    return sprite
+
+
+def full_redraw(background, group):
+    surface = background.copy()
+    for sprite in group.sprites():
+        surface.blit(sprite.image, sprite.rect)
+    return surface
+
+
+def pixels(surface):
+    return pygame.surfarray.array3d(surface)
+
+
+@pytest.mark.parametrize("moving", [0.02, 0.1, 0.5])
+def test_dirty_rects_cover_every_changed_pixel(moving):
+    rng = random.Random(int(moving * 100))
+    background = pygame.Surface(SIZE)
+    for x in range(0, SIZE[0], 16):
+        pygame.draw.line(background, (x % 256, 90, 200), (x, 0), (x, SIZE[1]), 3)
+    group = DirtyLayeredUpdates()
+    for _ in range(150):  # dense, most sprites overlap others
+        add_sprite(group, rng)
+    screen = pygame.Surface(SIZE)
+    group.clear(screen, background)
+    group.draw(screen)
+    for frame in range(40):
+        before = pixels(screen)
+        for sprite in group.sprites():
+            if rng.random() < moving:
+                sprite.rect.move_ip(rng.randrange(-6, 7), rng.randrange(-6, 7))
+                sprite.dirty = 1
+        if frame % 5 == 0:
+            rng.choice(group.sprites()).kill()
+            add_sprite(group, rng).dirty = 1
+        if frame % 7 == 0:
+            group.damage(pygame.Rect(rng.randrange(SIZE[0]), rng.randrange(SIZE[1]), 40, 30))
+        rects = group.draw(screen)
+        after = pixels(screen)
+        assert np.array_equal(after, pixels(full_redraw(background, group))), "frame %i" % frame
+        covered = np.zeros(SIZE, dtype=bool)
+        for rect in rects:
+            rect = rect.clip(screen.get_rect())
+            covered[rect.left:rect.right, rect.top:rect.bottom] = True
+        changed = (after != before).any(axis=2)
+        assert not (changed & ~covered).any(), "frame %i" % frame
+
+
+def test_nothing_changed_draws_nothing():
+    rng = random.Random(1)
+    group = DirtyLayeredUpdates()
+    for _ in range(20):
+        add_sprite(group, rng)
+    screen = pygame.Surface(SIZE)
+    group.clear(screen, pygame.Surface(SIZE))
+    assert group.draw(screen) == [screen.get_rect()]
+    assert group.draw(screen) == []
@@ -0,0 +1,140 @@
+import random
+import pygame
+import pytest
+from enemy import Enemy
+from enemy_world import EnemyWorld
+from frame_governor import FrameGovernor
+from spatial_hash import SpatialHash
+from super_avoider import SuperAvoider
+
+pytest.importorskip("numpy")
+
+
+def test_update_moves_like_the_sprites(game):
+    game.new_game(enemies=0, players=0, seed=20)
+    area = pygame.Rect(0, 0, 400, 300)  # small, so enemies hit the walls often
+    world = EnemyWorld(area, Enemy.image, seed=20)
+    rng = random.Random(20)
+    Enemy.engine = None
+    pairs = []
+    for _ in range(200):
+        position = (rng.uniform(0, 400), rng.uniform(0, 300))
+        alone, attached = Enemy(position, area), Enemy(position, area)
+        attached.vx, attached.vy = alone.vx, alone.vy
+        alone.detected = attached.detected = rng.random() < 0.3
+        world.add(attached)
+        pairs.append((alone, attached))
+    walls = 0
+    for _ in range(300):
+        world.update(1.0 / 60)
+        for alone, attached in pairs:
+            alone.update(1.0 / 60)
+            i = attached.world_index
+            assert (world.x[i], world.y[i]) == (alone.x_pos, alone.y_pos)
+            assert (world.centerx[i], world.centery[i]) == alone.rect.center == attached.rect.center
+            assert attached.image is alone.image
+            walls += alone.image is Enemy.image[1]
+            # New speeds after a wall come from different generators, the sprite takes over the ones of the world
+            alone.vx, alone.vy = attached.vx, attached.vy
+    assert walls > 100
+
+
+@pytest.fixture
+def large_game():
+    game = SuperAvoider(headless=True, world_size=(4000, 3000))  # larger than the window, like --world
+    yield game
+    game.close()
+
+
+@pytest.fixture
+def world(large_game):
+    large_game.new_game(enemies=3000, players=0, seed=21)
+    large_game.step(20)
+    return Enemy.engine
+
+
+@pytest.mark.parametrize("cell_size", [32, 64, 300])
+def test_near_keeps_every_hit(world, cell_size):
+    rng = random.Random(cell_size)
+    for _ in range(3):
+        world.index_cells(cell_size)
+        for _ in range(100):
+            rect = pygame.Rect(rng.randrange(-200, 4000), rng.randrange(-200, 3000), rng.randrange(1, 400),
+                               rng.randrange(1, 400))
+            rows = world.near(rect)
+            assert world.rect_hits(rect, rows).tolist() == world.rect_hits(rect).tolist()
+            # A circle is looked up by the square around it, like the rect of EnemyDetection
+            radius = rng.randrange(1, 200)
+            square = pygame.Rect(0, 0, 2 * radius, 2 * radius)
+            square.center = rect.center
+            assert world.circle_hits(rect.center, radius, world.near(square)).tolist() == \
+                world.circle_hits(rect.center, radius).tolist()
+        world.update(0.5)  # the next index starts from this order
+
+
+def test_index_follows_added_and_removed_enemies(world):
+    world.index_cells()
+    for sprite in world.sprites[::3]:
+        sprite.kill()
+    for _ in range(500):
+        Enemy.spawn((100, 100), world.area)
+    world.index_cells()
+    everything = pygame.Rect(world.area)
+    assert world.near(everything).tolist() == list(range(world.count))
+    rect = pygame.Rect(50, 50, 100, 100)
+    assert world.rect_hits(rect, world.near(rect)).tolist() == world.rect_hits(rect).tolist()
+
+
+def test_collide_finds_the_same_enemies_as_brute_force(large_game):
+    game = large_game
+    game.new_game(enemies=2000, players=30, seed=22)
+    for _ in range(30):
+        game.step()
+        engine = Enemy.engine
+        detected = engine.detected[:engine.count].copy()
+        expected = [False] * engine.count
+        for detector in game.detection_group:
+            for i in engine.circle_hits(detector.rect.center, detector.radius).tolist():
+                expected[i] = True
+        assert detected.tolist() == expected
+
+
+def collide_results(game):
+    """
+    Run the collision test of the game
+    :return: (detected count, detected enemies, crashed players), the game over of the crashed players is undone
+    """
+    scores = len(game.scores)
+    game.collide()
+    detected = {enemy for enemy in game.enemy_group if enemy.detected}
+    crashed = {player for player in game.player_group if player.remove}
+    for player in crashed:
+        player.remove = player.detector.remove = False
+    del game.scores[scores:]
+    return game.detected, detected, crashed
+
+
+@pytest.mark.parametrize("level, pixel_exact", [(FrameGovernor.FULL, False), (FrameGovernor.FULL, True),
+                                                (FrameGovernor.RECT, True)])
+def test_collide_without_numpy_finds_the_same(game, level, pixel_exact):
+    """
+    The grid of EnemyWorld and the SpatialHash over the sprites, used without numpy, give the same result
+    """
+    game.new_game(enemies=600, players=20, seed=23)
+    game.governor.set_level(level)
+    game.PIXEL_EXACT = pixel_exact
+    engine = Enemy.engine
+    grid = SpatialHash(cell_size=game.CELL_SIZE)
+    detections = crashes = 0
+    for tick in range(60):
+        expected = collide_results(game)
+        # The same state through the sprites
+        Enemy.engine, game.spatial_hash = None, grid
+        try:
+            assert collide_results(game) == expected
+        finally:
+            Enemy.engine, game.spatial_hash = engine, None
+        detections += expected[0]
+        crashes += len(expected[2])
+        game.step()
+    assert detections and crashes
@@ -0,0 +1,44 @@
+import os
+import shutil
+import pygame
+import pytest
+from frame_capture import FrameCapture
+
+np = pytest.importorskip("numpy")
+
+
+def frames(count, size=(64, 48)):
+    for number in range(count):
+        surface = pygame.Surface(size)
+        surface.fill((number, 2 * number, 3 * number))
+        yield surface
+
+
+def test_raw_frames_are_written_in_order(tmp_path):
+    path = str(tmp_path / "session.rgb")
+    capture = FrameCapture(path, (64, 48), block=True)
+    for surface in frames(5):
+        assert capture.capture(surface)
+    capture.close()
+    written = np.fromfile(path, dtype=np.uint8).reshape(5, 48, 64, 3)
+    assert written[:, 0, 0].tolist() == [[n, 2 * n, 3 * n] for n in range(5)]
+
+
+def test_png_directory(tmp_path):
+    capture = FrameCapture(str(tmp_path / "frames"), (64, 48), block=True)
+    for surface in frames(3):
+        capture.capture(surface)
+    capture.close()
+    assert sorted(os.listdir(tmp_path / "frames")) == ["frame%06i.png" % n for n in range(3)]
+
+
+def test_video_without_ffmpeg_falls_back_to_raw(tmp_path, monkeypatch):
+    monkeypatch.setattr(shutil, "which", lambda name: None)
+    with pytest.warns(UserWarning, match="ffmpeg not found"):
+        capture = FrameCapture(str(tmp_path / "session.mp4"), (64, 48), block=True)
+    assert capture.fmt == "raw"
+    for surface in frames(4):
+        capture.capture(surface)
+    capture.close()
+    assert os.path.getsize(tmp_path / "session.rgb") == 4 * 64 * 48 * 3
+    assert not os.path.exists(tmp_path / "session.mp4")
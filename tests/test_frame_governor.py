@@ -0,0 +1,84 @@
+import pytest
+
+from frame_governor import FrameGovernor
+
+
+def feed(governor, milliseconds, frames):
+    """Levels after each of frames frames of the same working time"""
+    return [governor.observe(milliseconds) for _ in range(frames)]
+
+
+def until(governor, milliseconds, level, limit=10000):
+    """Frames of the same working time until the governor reaches level"""
+    for frame in range(1, limit + 1):
+        if governor.observe(milliseconds) == level:
+            return frame
+    raise AssertionError("level %i not reached, at %s" % (level, governor.status()))
+
+
+def test_overload_degrades_one_level_per_patience():
+    governor = FrameGovernor(fps=100, patience=30)
+    levels = feed(governor, 20.0, 30 * (len(FrameGovernor.LEVELS) + 2))
+    steps = [frame for frame in range(1, len(levels)) if levels[frame] != levels[frame - 1]]
+    assert [levels[frame] for frame in steps] == list(range(1, len(FrameGovernor.LEVELS)))
+    # No level change follows the previous one before patience frames passed
+    assert all(b - a >= 30 for a, b in zip(steps, steps[1:]))
+    assert governor.level == FrameGovernor.RECT == governor.max_level
+
+
+def test_no_change_between_low_and_high():
+    governor = FrameGovernor(fps=100)
+    governor.set_level(FrameGovernor.FAR)
+    governor.load = 0.7
+    assert set(feed(governor, 7.0, 2000)) == {FrameGovernor.FAR}
+    assert governor.changes == 1
+
+
+def test_short_spike_is_smoothed_away():
+    governor = FrameGovernor(fps=100, patience=30)
+    feed(governor, 5.0, 100)
+    assert set(feed(governor, 30.0, 2)) == {FrameGovernor.FULL}
+    assert set(feed(governor, 5.0, 100)) == {FrameGovernor.FULL}
+
+
+def test_recovers_one_level_per_recovery():
+    governor = FrameGovernor(fps=100, recovery=180)
+    governor.set_level(FrameGovernor.FAR)
+    assert until(governor, 2.0, FrameGovernor.SPAWN) == 180
+    assert until(governor, 2.0, FrameGovernor.TEXT) == 180
+    assert until(governor, 2.0, FrameGovernor.FULL) == 180
+    assert set(feed(governor, 2.0, 1000)) == {FrameGovernor.FULL}
+
+
+def test_max_level_limits_degrading():
+    governor = FrameGovernor(fps=100, max_level=FrameGovernor.FULL)
+    assert set(feed(governor, 50.0, 1000)) == {FrameGovernor.FULL}
+
+
+@pytest.mark.parametrize("patience, recovery", [(5, 20), (30, 180)])
+def test_early_overload_backs_off_recovery(patience, recovery):
+    governor = FrameGovernor(fps=100, patience=patience, recovery=recovery)
+    until(governor, 20.0, FrameGovernor.TEXT)
+    waits = []
+    for _ in range(5):
+        governor.load = 0.0  # count the frames below low only, not the smoothing of the drop
+        waits.append(until(governor, 2.0, FrameGovernor.FULL))
+        # The load comes back right after the recovery, the level was needed
+        until(governor, 20.0, FrameGovernor.TEXT)
+    assert waits[0] == recovery
+    # Every too early recovery doubles the wait for the next one, up to 8 times the configured one
+    assert [wait - waits[0] for wait in waits] == [0, recovery, 3 * recovery, 7 * recovery, 7 * recovery]
+    assert governor.recovery == 8 * recovery
+    # A level held for a long time resets the wait
+    feed(governor, 7.0, 8 * recovery)
+    assert governor.recovery == recovery
+    assert governor.level == FrameGovernor.TEXT
+
+
+def test_late_overload_keeps_recovery():
+    governor = FrameGovernor(fps=100, patience=5, recovery=20)
+    until(governor, 20.0, FrameGovernor.TEXT)
+    until(governor, 2.0, FrameGovernor.FULL)
+    feed(governor, 2.0, 20)
+    until(governor, 20.0, FrameGovernor.TEXT)
+    assert governor.recovery == 20
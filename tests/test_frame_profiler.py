@@ -0,0 +1,24 @@
+import gc
+from frame_profiler import FrameProfiler
+
+
+def test_profilers_unregister_from_the_garbage_collector():
+    callbacks = len(gc.callbacks)
+    profilers = [FrameProfiler(size=10) for _ in range(3)]
+    assert len(gc.callbacks) == callbacks + 3
+    profilers[0].close()
+    assert len(gc.callbacks) == callbacks + 2
+    del profilers
+    gc.collect()
+    assert len(gc.callbacks) == callbacks
+
+
+def test_garbage_collections_are_timed():
+    profiler = FrameProfiler(size=10)
+    profiler.begin_frame()
+    gc.collect()
+    profiler.mark("update")
+    profiler.end_frame()
+    assert profiler.last("gc") > 0.0
+    assert profiler.last("gc") <= profiler.last("update")
+    profiler.close()
@@ -0,0 +1,52 @@
+from player import Player
+
+
+def interpolating(game, enemies=0, players=1):
+    """
+    Game that interpolates like a game with a window
+    """
+    game.new_game(enemies=enemies, players=players, seed=3)
+    game.headless = False  # update_sprites() only keeps the previous centers for drawing
+    game.INTERPOLATE = True
+    return game
+
+
+def test_frames_without_a_tick_keep_the_simulated_position(game):
+    interpolating(game)
+    player = game.player_group.sprites()[0]
+    dt = game.fixed_dt
+    alpha = game.simulate(dt, Player.LEFT)
+    simulated = player.rect.center
+    previous = game.previous_centers[player]
+    assert simulated != previous
+    game.interpolate(0.5)
+    assert player.rect.center != simulated
+    # A frame shorter than a tick runs no tick but draws again
+    assert game.simulate(0.1 * dt, Player.LEFT) > alpha
+    game.interpolate(0.6)
+    assert player.rect.center == (round(previous[0] + (simulated[0] - previous[0]) * 0.6), simulated[1])
+    game.restore()
+    assert player.rect.center == simulated
+
+
+def test_interpolated_frames_do_not_change_the_game(game):
+    def run(draw):
+        interpolating(game, enemies=30, players=2)
+        for frame in range(300):
+            game.simulate(0.4 * game.fixed_dt, Player.UP if frame % 100 < 50 else Player.RIGHT)
+            if draw:
+                game.interpolate(game.accumulator / game.fixed_dt)
+        game.restore()
+        return game.state_hash(), [player.rect.center for player in game.player_group]
+
+    assert run(draw=True) == run(draw=False)
+
+
+def test_restore_puts_back_every_sprite(game):
+    interpolating(game, enemies=30, players=2)
+    game.simulate(3 * game.fixed_dt, Player.DOWN)
+    centers = {sprite: sprite.rect.center for sprite in game.all_sprites_group}
+    game.interpolate(0.25)
+    game.interpolate(0.75)
+    game.restore()
+    assert {sprite: sprite.rect.center for sprite in game.all_sprites_group} == centers
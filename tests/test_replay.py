@@ -0,0 +1,83 @@
+import random
+import pytest
+from player import Player
+from replay import Recording, ReplayError, replay, RESPAWN, SPAWN
+
+
+def play(game, path, seed, ticks=600):
+    """
+    Record a game with random input, as the main loop does
+    :return: (state, state hash) after the last tick
+    """
+    game.record_path = str(path)
+    game.new_game(enemies=80, players=2, seed=seed)
+    rng = random.Random(seed)
+    for _ in range(ticks):
+        bits = rng.choice((0, Player.UP, Player.DOWN | Player.LEFT, Player.RIGHT))
+        if rng.random() < 0.05:
+            bits |= SPAWN
+        if rng.random() < 0.01:
+            bits |= RESPAWN
+        game.simulate(game.fixed_dt, bits, (rng.randrange(800), rng.randrange(600)))
+    game.recording.save(game.record_path)
+    return game.state(), game.state_hash()
+
+
+@pytest.mark.parametrize("seed", [0, 12345, -5, 2 ** 70])
+def test_replay_round_trip(game, tmp_path, seed):
+    state, digest = play(game, tmp_path / "game.rec", seed)
+    recording = Recording.load(str(tmp_path / "game.rec"))
+    assert recording.seed == seed & 0xFFFFFFFFFFFFFFFF
+    assert len(recording) == state["ticks"]
+    assert recording.hashes
+    game.record_path = None
+    assert replay(recording, game) == state
+    assert game.state_hash() == digest
+
+
+def test_changed_input_is_found(game, tmp_path):
+    play(game, tmp_path / "game.rec", 7)
+    recording = Recording.load(str(tmp_path / "game.rec"))
+    # Hold the first player still for the whole game
+    recording.ticks = bytearray(b"".join(Recording.TICK.pack(bits & ~0xF, level, dt, x, y)
+                                         for bits, level, dt, x, y in recording))
+    game.record_path = None
+    with pytest.raises(ReplayError):
+        replay(recording, game)
+
+
+def test_negative_seed_starts_a_game(game):
+    game.new_game(enemies=10, players=1, seed=-5)
+    assert game.game_seed == 2 ** 64 - 5
+    game.step(10)
+    assert game.checkpoint()
+
+
+def test_other_versions_are_rejected(game, tmp_path):
+    path = tmp_path / "game.rec"
+    play(game, path, 3, ticks=10)
+    with open(path, "r+b") as f:
+        f.seek(4)
+        f.write((Recording.VERSION - 1).to_bytes(2, "little"))
+    with pytest.raises(ValueError):
+        Recording.load(str(path))
+
+
+def test_spawn_far_out_in_a_large_world(tmp_path):
+    from super_avoider import SuperAvoider
+    game = SuperAvoider(headless=True, world_size=(100000, 80000))
+    try:
+        game.record_path = str(tmp_path / "game.rec")
+        game.new_game(enemies=5, players=1, seed=9)
+        game.simulate(game.fixed_dt, SPAWN, (90000, 70000))
+        game.step(5)
+        game.recording.save(game.record_path)
+        state = game.state()
+        recording = Recording.load(game.record_path)
+        assert next(iter(recording))[3:] == (90000, 70000)
+        game.record_path = None
+        assert replay(recording, game) == state
+        assert any(abs(enemy.rect.centerx - 90000) < 100 and abs(enemy.rect.centery - 70000) < 100
+                   for enemy in game.enemy_group)
+    finally:
+        game.close()
@@ -0,0 +1,77 @@
+import random
+import pytest
+from score_log import ScoreLog, _kth
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def scores():
+    rng = random.Random(5)
+    return [round(rng.expovariate(0.1), 3) for _ in range(5000)]
+
+
+def fill(path, scores, **kwargs):
+    log = ScoreLog(str(path), flush_interval=0.01, **kwargs)
+    for number, score in enumerate(scores):
+        log.append(number % 4, score, enemies=50, seed=number, duration=score, timestamp=1000.0 + number)
+    return log
+
+
+def check(log, scores):
+    ordered = sorted(scores, reverse=True)
+    assert len(log) == len(scores)
+    top = log.top(10)
+    assert [score.score for score in top] == ordered[:10]
+    assert all(score.duration == score.score and score.player == score.seed % 4 for score in top)
+    for score in scores[:200]:
+        assert log.rank(score) == 1 + sum(other > score for other in scores)
+    assert log.rank(ordered[0] + 1) == 1
+    for q in (0, 10, 50, 90, 99, 100):
+        assert log.percentile(q) == sorted(scores)[min(len(scores) - 1, int(q / 100.0 * len(scores)))]
+
+
+def test_queries_before_and_after_the_index(tmp_path, scores):
+    # rebuild_every splits the scores between the index and records not indexed yet
+    log = fill(tmp_path / "scores.log", scores, rebuild_every=1500)
+    check(log, scores)
+    log.flush()
+    check(log, scores)
+    log.close()
+
+
+def test_reopen(tmp_path, scores):
+    fill(tmp_path / "scores.log", scores[:3000]).close()
+    log = fill(tmp_path / "scores.log", scores[3000:])
+    check(log, scores)
+    log.close()
+    # A missing index is rebuilt from the log
+    (tmp_path / "scores.log.idx").unlink()
+    log = ScoreLog(str(tmp_path / "scores.log"))
+    check(log, scores)
+    log.close()
+
+
+def test_cut_off_record_is_dropped(tmp_path, scores):
+    fill(tmp_path / "scores.log", scores[:100]).close()
+    with open(tmp_path / "scores.log", "ab") as f:
+        f.write(b"\x01" * (ScoreLog.RECORD.size // 2))
+    log = ScoreLog(str(tmp_path / "scores.log"))
+    check(log, scores[:100])
+    log.close()
+
+
+def test_empty_log(tmp_path):
+    log = ScoreLog(str(tmp_path / "scores.log"))
+    assert len(log) == 0 and log.top(5) == [] and log.rank(3.0) == 1 and log.percentile(50) == 0.0
+    log.close()
+
+
+def test_kth_of_two_sorted_arrays():
+    rng = np.random.default_rng(3)
+    for _ in range(300):
+        a = np.sort(rng.integers(0, 50, rng.integers(0, 20)).astype(float))
+        b = np.sort(rng.integers(0, 50, rng.integers(0, 20)).astype(float))
+        merged = np.sort(np.concatenate((a, b)))
+        for k in range(len(merged)):
+            assert _kth(a, b, k) == merged[k]
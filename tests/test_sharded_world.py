@@ -0,0 +1,94 @@
+import math
+import os
+import time
+import pygame
+import pytest
+from sharded_world import ShardedWorld, _layout
+
+np = pytest.importorskip("numpy")
+
+SIZE = (3000, 2000)
+COLUMNS = ("x", "y", "vx", "vy", "centerx", "centery", "bounces", "image_index")
+
+
+def players():
+    return [(pygame.Rect(x, y, 30, 30), (x + 15, y + 15), 150) for x in (0, 700, 1480, 2970) for y in (0, 990, 1970)]
+
+
+def run(shards, ticks=60):
+    """
+    :return: (columns of all enemies, crashed players of every tick, detected enemies of every tick)
+    """
+    with ShardedWorld(SIZE, 4000, shards=shards, seed=3) as world:
+        world.spawn([(10, 10), (2990, 1990), (1500, 1000)])
+        crashed, detected = [], []
+        for _ in range(ticks):
+            crashed.append(world.step(players()).tolist())
+            detected.append(world.detected)
+        return world.gather(COLUMNS), crashed, detected
+
+
+def test_results_do_not_depend_on_the_number_of_shards():
+    columns, crashed, detected = run(1)
+    assert any(any(tick) for tick in crashed) and all(detected)
+    for shards in (2, 3, 5):
+        other_columns, other_crashed, other_detected = run(shards)
+        assert other_crashed == crashed
+        assert other_detected == detected
+        for name in COLUMNS:
+            assert np.array_equal(other_columns[name], columns[name]), name
+
+
+def test_hitboxes_stay_inside_the_world():
+    columns = run(3, ticks=200)[0]
+    width, height = 32, 36  # size of babytux.png
+    assert columns["bounces"].sum() > 0
+    assert (columns["centerx"] - width // 2 >= 0).all() and (columns["centerx"] + width // 2 <= SIZE[0]).all()
+    assert (columns["centery"] - height // 2 >= 0).all() and (columns["centery"] + height // 2 <= SIZE[1]).all()
+    assert np.array_equal(columns["centerx"], np.rint(columns["x"]))
+    assert np.array_equal(columns["centery"], np.rint(columns["y"]))
+
+
+def gathering(world, ticks=30):
+    """
+    A nearly full strip next to a crowd at its border, the crowd moves into it
+    :return: (columns of all enemies, crashed players of every tick)
+    """
+    rng = np.random.default_rng(5)
+    world.spawn(np.column_stack((rng.uniform(0, 1400, 240), rng.uniform(0, 2000, 240))))
+    world.spawn(np.column_stack((np.full(200, 1505.0), rng.uniform(0, 2000, 200))))
+    crashed = [world.step(players()).tolist() for _ in range(ticks)]
+    assert len(world) == 440
+    return world.gather(COLUMNS), crashed
+
+
+def test_strips_grow_when_enemies_gather():
+    with ShardedWorld(SIZE, 0, shards=2, seed=4, capacity=5000) as world:
+        expected = gathering(world)
+    with ShardedWorld(SIZE, 0, shards=2, seed=4, capacity=5000, strip_headroom=-0.9) as world:
+        assert world.strip_capacity == 250
+        columns, crashed = gathering(world)
+        assert world.strip_capacity > 250
+    assert crashed == expected[1]
+    for name in COLUMNS:
+        assert np.array_equal(columns[name], expected[0][name]), name
+
+
+def test_strips_share_the_capacity():
+    with ShardedWorld(SIZE, 4000, shards=8, seed=1) as world:
+        assert world.strip_capacity == math.ceil(world.capacity / 8 * 1.25)
+        # Not every strip sized for every enemy
+        assert world.block.size < _layout(8, world.capacity)[1] / 4
+
+
+@pytest.mark.skipif((os.cpu_count() or 1) < 4, reason="needs 4 cores")
+def test_more_shards_step_faster():
+    timings = {}
+    for shards in (1, 4):
+        with ShardedWorld((40000, 30000), 1000000, shards=shards, seed=0) as world:
+            world.step(players())  # wait for the workers to start
+            start = time.perf_counter()
+            for _ in range(20):
+                world.step(players())
+            timings[shards] = time.perf_counter() - start
+    assert timings[4] < timings[1] / 2
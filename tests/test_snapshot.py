@@ -0,0 +1,93 @@
+import random
+import pytest
+import snapshot
+from frame_governor import FrameGovernor
+from player import Player
+from replay import RESPAWN, SPAWN
+
+pytest.importorskip("numpy")
+
+
+def play(game, ticks, seed):
+    """
+    Random input with spawns and respawns, so the number of sprites changes
+    :return: list of state hashes after every tick
+    """
+    rng = random.Random(seed)
+    digests = []
+    for _ in range(ticks):
+        bits = rng.choice((0, Player.UP, Player.DOWN | Player.RIGHT, Player.LEFT))
+        if rng.random() < 0.1:
+            bits |= SPAWN
+        if rng.random() < 0.02:
+            bits |= RESPAWN
+        game.simulate(game.fixed_dt, bits, (rng.randrange(800), rng.randrange(600)))
+        digests.append(game.state_hash())
+    return digests
+
+
+def test_rollback_continues_exactly(game):
+    game.new_game(enemies=60, players=3, seed=11)
+    play(game, 120, seed=1)
+    buffer = game.checkpoint()
+    state = game.state()
+    first = play(game, 300, seed=2)
+    assert game.state() != state
+    game.rollback(buffer)
+    assert game.state() == state
+    assert play(game, 300, seed=2) == first
+
+
+def test_rollback_after_a_different_branch(game):
+    game.new_game(enemies=60, players=2, seed=12)
+    play(game, 60, seed=3)
+    buffer = game.checkpoint()
+    expected = play(game, 200, seed=4)
+    game.rollback(buffer)
+    play(game, 400, seed=5)  # more enemies and other players than at the checkpoint
+    game.rollback(buffer)
+    assert play(game, 200, seed=4) == expected
+
+
+def test_snapshot_file(game, tmp_path):
+    game.new_game(enemies=40, players=2, seed=13)
+    play(game, 90, seed=6)
+    path = str(tmp_path / "game.snap")
+    snapshot.save(game, path)
+    expected = play(game, 120, seed=7)
+    with snapshot.load(path) as buffer:
+        snapshot.restore(game, buffer)
+    assert play(game, 120, seed=7) == expected
+
+
+def test_checkpoint_is_a_copy(game):
+    game.new_game(enemies=20, players=1, seed=14)
+    buffer = game.checkpoint()
+    before = bytes(buffer)
+    play(game, 30, seed=8)
+    assert bytes(buffer) == before
+    game.rollback(buffer)
+    assert len(buffer) == snapshot.size(game)
+
+
+def test_rollback_while_spawning_is_capped(game):
+    game.new_game(enemies=30, players=1, seed=15)
+    game.governor.set_level(FrameGovernor.SPAWN)
+
+    def hold_mouse(ticks):
+        digests = []
+        for tick in range(ticks):
+            game.simulate(game.fixed_dt, SPAWN, (100 + tick, 200))
+            digests.append(game.state_hash())
+        return digests
+
+    hold_mouse(17)  # between two spawns
+    buffer = game.checkpoint()
+    enemies = len(game.enemy_group)
+    expected = hold_mouse(120)
+    assert enemies < len(game.enemy_group) <= enemies + 120 * game.SPAWN_RATE // game.TICK_RATE  # capped
+    game.governor.set_level(FrameGovernor.FULL)  # spawning every tick in the other branch
+    hold_mouse(50)
+    game.rollback(buffer)
+    assert game.governor.level == FrameGovernor.SPAWN
+    assert hold_mouse(120) == expected
@@ -0,0 +1,49 @@
+import random
+import pygame
+import pytest
+from spatial_hash import SpatialHash
+
+
+def make_group(rng, count, size, radius=None):
+    group = pygame.sprite.Group()
+    for _ in range(count):
+        sprite = pygame.sprite.Sprite(group)
+        sprite.rect = pygame.Rect(rng.randrange(-20, 800), rng.randrange(-20, 600), *size)
+        if radius is not None:
+            sprite.radius = radius
+    return group
+
+
+def as_sets(crashed):
+    return {sprite: set(hits) for sprite, hits in crashed.items()}
+
+
+@pytest.mark.parametrize("collided", [None, pygame.sprite.collide_circle])
+@pytest.mark.parametrize("cell_size", [16, 64, 256])
+def test_groupcollide_matches_brute_force(collided, cell_size):
+    rng = random.Random(cell_size)
+    enemies = make_group(rng, 300, (32, 36))
+    players = make_group(rng, 20, (30, 30))
+    detectors = make_group(rng, 20, (150, 150), radius=75)
+    grid = SpatialHash(cell_size=cell_size)
+    grid.update(enemies)
+    assert as_sets(grid.groupcollide(players, enemies, False, False, collided)) == \
+        as_sets(pygame.sprite.groupcollide(players, enemies, False, False, collided))
+    assert as_sets(grid.groupcollide(enemies, detectors, False, False, collided)) == \
+        as_sets(pygame.sprite.groupcollide(enemies, detectors, False, False, collided))
+
+
+def test_update_follows_moved_and_removed_sprites():
+    rng = random.Random(1)
+    enemies = make_group(rng, 200, (32, 36))
+    players = make_group(rng, 10, (30, 30))
+    grid = SpatialHash(cell_size=64)
+    grid.update(enemies)
+    for sprite in enemies.sprites():
+        sprite.rect.move_ip(rng.randrange(-100, 100), rng.randrange(-100, 100))
+    for sprite in enemies.sprites()[:50]:
+        sprite.kill()
+    grid.update(enemies)
+    assert len(grid.sprite_cell) == len(enemies)
+    assert as_sets(grid.groupcollide(players, enemies)) == as_sets(pygame.sprite.groupcollide(players, enemies,
+                                                                                              False, False))
@@ -0,0 +1,130 @@
+import numpy as np
+import pygame
+import pytest
+
+from enemy import Enemy
+from vector_env import VectorEnv
+
+
+def rect(width, height, center):
+    result = pygame.Rect(0, 0, width, height)
+    result.center = center
+    return result
+
+
+def circle(center, radius):
+    sprite = pygame.sprite.Sprite()
+    sprite.rect = pygame.Rect(0, 0, 1, 1)
+    sprite.rect.center = center
+    sprite.radius = radius
+    return sprite
+
+
+def crowd(env, spread):
+    """Put the enemies of every world within spread pixels of its player"""
+    rng = np.random.default_rng(3)
+    env.player_centerx[:] = rng.integers(200, 600, env.worlds)
+    env.player_centery[:] = rng.integers(200, 400, env.worlds)
+    env.centerx[:] = env.player_centerx[:, None] + rng.integers(-spread, spread + 1, env.centerx.shape)
+    env.centery[:] = env.player_centery[:, None] + rng.integers(-spread, spread + 1, env.centery.shape)
+
+
+def test_crashed_is_colliderect():
+    env = VectorEnv(worlds=2000, enemies=3, seed=0)
+    env.reset()
+    crowd(env, 60)
+    crashed = env.crashed()
+    for world in range(env.worlds):
+        player = rect(env.player_width, env.player_height, (env.player_centerx[world], env.player_centery[world]))
+        expected = any(player.colliderect(rect(env.enemy_width, env.enemy_height, (x, y)))
+                       for x, y in zip(env.centerx[world], env.centery[world]))
+        assert crashed[world] == expected
+    assert 0 < crashed.sum() < env.worlds
+
+
+@pytest.mark.parametrize("nearest", [4, 30])
+def test_observe_is_collide_circle(nearest):
+    env = VectorEnv(worlds=300, enemies=30, nearest=nearest, seed=0)
+    env.reset()
+    crowd(env, 600)
+    observations = env.observe()
+    hit_counts = []
+    for world in range(env.worlds):
+        center = env.player_centerx[world], env.player_centery[world]
+        detector = circle(center, env.detector_radius)
+        hits = [enemy for enemy in range(env.enemies)
+                if pygame.sprite.collide_circle(detector, circle((env.centerx[world, enemy],
+                                                                  env.centery[world, enemy]), env.enemy_radius))]
+        distance = {enemy: (env.centerx[world, enemy] - center[0]) ** 2 + (env.centery[world, enemy] - center[1]) ** 2
+                    for enemy in hits}
+        hits.sort(key=distance.get)
+        rows = observations[world]
+        seen = rows[rows[:, 4] == 1.0]
+        assert len(seen) == min(len(hits), nearest)
+        assert not rows[len(seen):].any()
+        expected = {(env.centerx[world, enemy] - center[0], env.centery[world, enemy] - center[1],
+                     np.float32(env.vx[world, enemy]), np.float32(env.vy[world, enemy])) for enemy in hits}
+        assert {tuple(row[:4]) for row in seen} <= expected
+        # The nearest ones, rows ordered by distance
+        observed = [dx * dx + dy * dy for dx, dy in seen[:, :2]]
+        assert observed == sorted(distance[enemy] for enemy in hits)[:len(seen)]
+        hit_counts.append(len(hits))
+    # Worlds with fewer hits than rows and, for few rows, with more
+    assert min(hit_counts) < nearest and max(hit_counts) > min(nearest, 8)
+
+
+def copy_game(env, game):
+    """Start the only world of env from the state of the game"""
+    engine = Enemy.engine
+    n = engine.count
+    env.x[0], env.y[0] = engine.x[:n], engine.y[:n]
+    env.vx[0], env.vy[0] = engine.vx[:n], engine.vy[:n]
+    env.centerx[0], env.centery[0] = engine.centerx[:n], engine.centery[:n]
+    player = next(iter(game.player_group))
+    env.player_x[0], env.player_y[0] = player.x_pos, player.y_pos
+    env.player_centerx[0], env.player_centery[0] = player.rect.center
+    return player
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_step_follows_the_game(game, seed):
+    """
+    Step n of the env is the update of game tick n and the collision test of tick n + 1. Enemies that bounce off a
+    wall get the speed the game drew.
+    """
+    game.new_game(enemies=150, players=1, seed=seed)
+    env = VectorEnv(worlds=1, enemies=150, nearest=150, seed=seed, dt=game.fixed_dt, size=game.world_rect.size)
+    env.reset()
+    player = copy_game(env, game)
+    rng = np.random.default_rng(seed)
+    engine = Enemy.engine
+    done = False
+    for tick in range(2000):
+        action = int(rng.integers(0, 16)) if tick % 40 < 20 else 0
+        game.apply_input(action)
+        game.tick(game.fixed_dt)
+        # The game finds the crash of the previous step at the start of this tick
+        assert bool(game.scores) == done
+        if done:
+            break
+        if tick % 40 >= 21:
+            # Standing still the detector of the game is where the player is, both see the same enemies
+            seen = env.observe()[0]
+            seen = {(int(dx), int(dy)) for dx, dy in seen[seen[:, 4] == 1.0][:, :2]}
+            detected = np.flatnonzero(engine.detected[:engine.count])
+            assert seen == {(env.centerx[0, row] - env.player_centerx[0], env.centery[0, row] - env.player_centery[0])
+                            for row in detected}
+        observations, rewards, dones = env.step([action])
+        done = bool(dones[0])
+        assert rewards[0] == game.fixed_dt
+        if done:
+            assert env.final_score[0] == pytest.approx(player.score)
+            continue
+        n = engine.count
+        assert np.array_equal(env.centerx[0], engine.centerx[:n])
+        assert np.array_equal(env.centery[0], engine.centery[:n])
+        assert np.allclose(env.x[0], engine.x[:n]) and np.allclose(env.y[0], engine.y[:n])
+        assert (env.player_centerx[0], env.player_centery[0]) == player.rect.center
+        assert env.player_x[0] == pytest.approx(player.x_pos) and env.player_y[0] == pytest.approx(player.y_pos)
+        env.vx[0], env.vy[0] = engine.vx[:n], engine.vy[:n]
+    assert done, "the player did not crash"
@@ -0,0 +1,75 @@
+import pygame
+import pytest
+
+from window_state import WindowState
+
+
+def event(kind, **attributes):
+    return pygame.event.Event(kind, **attributes)
+
+
+def test_window_events():
+    window = WindowState()
+    assert window.handle(event(pygame.WINDOWFOCUSLOST))
+    assert (window.focused, window.visible, window.exposed) == (False, True, False)
+    window.handle(event(pygame.WINDOWMINIMIZED))
+    assert (window.focused, window.visible, window.exposed) == (False, False, False)
+    window.handle(event(pygame.WINDOWHIDDEN))
+    assert not window.visible
+    window.handle(event(pygame.WINDOWRESTORED))
+    assert (window.visible, window.exposed) == (True, True)  # nothing was drawn while minimized
+    window.exposed = False
+    window.handle(event(pygame.WINDOWSHOWN))
+    assert not window.exposed  # was visible already
+    window.handle(event(pygame.WINDOWFOCUSGAINED))
+    assert window.focused
+    for kind in WindowState.EXPOSE_EVENTS:
+        window.exposed = False
+        assert window.handle(event(kind))
+        assert window.exposed
+
+
+def test_activeevent():
+    window = WindowState()
+    window.handle(event(pygame.ACTIVEEVENT, gain=0, state=pygame.APPINPUTFOCUS))
+    assert (window.focused, window.visible) == (False, True)
+    window.handle(event(pygame.ACTIVEEVENT, gain=0, state=pygame.APPACTIVE))
+    assert (window.focused, window.visible, window.exposed) == (False, False, False)
+    window.handle(event(pygame.ACTIVEEVENT, gain=1, state=pygame.APPACTIVE | pygame.APPINPUTFOCUS))
+    assert (window.focused, window.visible, window.exposed) == (True, True, True)
+    # Mouse focus changes neither
+    window.handle(event(pygame.ACTIVEEVENT, gain=0, state=pygame.APPMOUSEFOCUS))
+    assert (window.focused, window.visible) == (True, True)
+
+
+def test_other_events_are_not_handled():
+    window = WindowState()
+    assert not window.handle(event(pygame.KEYDOWN, key=pygame.K_p))
+    assert not window.handle(event(pygame.QUIT))
+    assert (window.focused, window.visible, window.exposed) == (True, True, False)
+
+
+def test_frame_rate():
+    window = WindowState()
+    assert window.frame_rate(60, 15, 4) == 60
+    window.handle(event(pygame.WINDOWFOCUSLOST))
+    assert window.frame_rate(60, 15, 4) == 15
+    assert window.frame_rate(10, 15, 4) == 10  # never faster than focused
+    window.handle(event(pygame.WINDOWMINIMIZED))
+    assert window.frame_rate(60, 15, 4) == 4
+    window.handle(event(pygame.WINDOWRESTORED))
+    window.handle(event(pygame.WINDOWFOCUSGAINED))
+    assert window.frame_rate(60, 15, 4) == 60
+
+
+@pytest.mark.parametrize("fps, frame, expected", [
+    (60, 1 / 60, 5),  # full frame rate: MAX_TICKS_PER_FRAME
+    (60, 0.5, 5),
+    (15, 1 / 15, 8),  # unfocused: the 4 ticks of a frame can still catch up a little
+    (15, 0.5, 5),  # a stall is cut like at the full frame rate
+    (4, 0.25, 19),  # minimized: the 15 ticks of a frame
+    (4, 0.3, 19),
+    (4, 1.0, 5),
+])
+def test_ticks_per_frame(fps, frame, expected):
+    assert WindowState.ticks_per_frame(60, fps, 5, frame) == expected
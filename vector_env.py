@@ -0,0 +1,240 @@
+"""
+Many independent SuperAvoider worlds stepped at once, for training agents.
+
+    env = VectorEnv(worlds=4096, enemies=50, nearest=8, seed=0)
+    observations = env.reset()
+    observations, rewards, dones = env.step(actions)  # actions: (worlds,) array of Player input bits
+
+Every world has one player and a fixed number of enemies. The state of all worlds lives in (worlds, enemies)
+numpy arrays and follows the rules of the game: enemies move and bounce off the walls like in EnemyWorld,
+the player moves like Player.move, a world is done when the player rect touches an enemy rect and the player
+sees the enemies that touch the circle of its EnemyDetection. Done worlds start a new game automatically.
+No sprites, surfaces or window are created.
+
+SuperAvoider.tick tests collisions first and moves the sprites after. step() moves first and tests after, so an
+action is followed by its outcome: step n is the update of game tick n followed by the collision test of tick n + 1,
+the states and crashes are the same, a crash the game finds at the start of tick n + 1 is done in step n.
+The detector of the game follows its player one tick late, the observation is centered on where the player is now.
+"""
+import math
+try:
+    import numpy as np
+except ImportError:  # numpy is optional for the game, but required here
+    np = None
+from enemy import Enemy
+from player import Player
+from assets import assets
+
+# ---- Columns of one observed enemy ----
+OBSERVATION = ("dx", "dy", "vx", "vy", "seen")
+
+
+class VectorEnv:
+    """
+    Batched worlds without pygame sprites.
+    step() takes one action per world, moves every world one tick and returns for every world the nearest enemies
+    inside the detector, the score gained (seconds survived) and whether the player crashed.
+    """
+
+    def __init__(self, worlds=1024, enemies=50, nearest=8, seed=None, dt=1.0 / 60, size=(800, 600)):
+        """
+        Constructor
+        :param worlds: number of worlds
+        :param enemies: enemies in every world
+        :param nearest: number of enemies in an observation, the k nearest inside the detector
+        :param seed: seed of the random number generator
+        :param dt: seconds simulated by one step
+        :param size: (width, height) of the area of a world
+        """
+        if np is None:
+            raise ImportError("VectorEnv requires numpy")
+        self.worlds = worlds
+        self.enemies = enemies
+        self.nearest = nearest
+        self.dt = dt
+        self.width, self.height = size
+        self.rng = np.random.default_rng(seed)
+        # ---- Sizes of the sprites, from the images of the game ----
+        self.enemy_width, self.enemy_height = assets.image("babytux.png", convert=False).get_size()
+        self.player_width, self.player_height = assets.image("player.png", convert=False).get_size()
+        # Same values as Enemy.radius and the detector created by SuperAvoider.spawn_player
+        self.enemy_radius = 0.5 * math.hypot(self.enemy_width, self.enemy_height)
+        self.detector_radius = round(5 * self.player_width)
+        aspect = max(round(self.width / self.height), round(self.height / self.width))
+        self.enemy_speed_max = Enemy.ENEMYMAXSPEED * aspect  # Enemy.step_size
+        self.player_speed = 10 * aspect * Player.STEP_RATE  # Player.auto_step_size * Player.STEP_RATE
+        # ---- Movement of each action, Player.move gives DOWN priority over UP and RIGHT over LEFT ----
+        actions = np.arange(16)
+        self.action_dx = np.where(actions & Player.RIGHT, 1.0, np.where(actions & Player.LEFT, -1.0, 0.0))
+        self.action_dy = np.where(actions & Player.DOWN, 1.0, np.where(actions & Player.UP, -1.0, 0.0))
+        # ---- State of all worlds ----
+        shape = (worlds, enemies)
+        self.x, self.y = np.zeros(shape), np.zeros(shape)
+        self.vx, self.vy = np.zeros(shape), np.zeros(shape)
+        self.centerx, self.centery = np.zeros(shape, dtype=np.int32), np.zeros(shape, dtype=np.int32)
+        self.player_x, self.player_y = np.zeros(worlds), np.zeros(worlds)
+        self.player_centerx = np.zeros(worlds, dtype=np.int32)
+        self.player_centery = np.zeros(worlds, dtype=np.int32)
+        self.score = np.zeros(worlds)  # score of the running game of every world
+        self.final_score = np.zeros(worlds)  # score of the last finished game of every world
+        self.games = np.zeros(worlds, dtype=np.int64)  # finished games of every world
+        self.ticks = 0
+
+    def reset(self):
+        """
+        Start a new game in every world
+        :return: observations, see observe()
+        """
+        self.score[:] = 0.0
+        self.final_score[:] = 0.0
+        self.games[:] = 0
+        self.ticks = 0
+        self._new_games(np.arange(self.worlds))
+        return self.observe()
+
+    def _new_games(self, worlds):
+        """
+        Spawn enemies in the top left and the player in the bottom right quarter like SuperAvoider.new_game
+        :param worlds: integer array of the worlds to restart
+        :return: None
+        """
+        k = len(worlds)
+        if k == 0:
+            return
+        shape = (k, self.enemies)
+        self.x[worlds] = self.rng.random(shape) * self.width / 2
+        self.y[worlds] = self.rng.random(shape) * self.height / 2
+        self._new_speed(worlds)
+        self.centerx[worlds] = np.rint(self.x[worlds])
+        self.centery[worlds] = np.rint(self.y[worlds])
+        self.player_x[worlds] = self.width / 2 + self.rng.random(k) * self.width / 2
+        self.player_y[worlds] = self.height / 2 + self.rng.random(k) * self.height / 2
+        self.player_centerx[worlds] = np.rint(self.player_x[worlds])
+        self.player_centery[worlds] = np.rint(self.player_y[worlds])
+        self.score[worlds] = 0.0
+
+    def _new_speed(self, worlds, enemies=None):
+        """
+        Gaussian speed like Enemy.new_speed("gauss")
+        :param worlds: integer array of worlds
+        :param enemies: integer array of enemies (one per world index), None for all enemies of the worlds
+        :return: None
+        """
+        index = worlds if enemies is None else (worlds, enemies)
+        shape = (len(worlds), self.enemies) if enemies is None else len(worlds)
+        random_direction = self.rng.choice((-1.0, 1.0), size=shape)
+        speed_max = self.enemy_speed_max
+        self.vx[index] = random_direction * self.rng.standard_normal(shape) * speed_max + random_direction
+        self.vy[index] = random_direction * self.rng.standard_normal(shape) * speed_max + random_direction
+
+    def _move_enemies(self):
+        """
+        Vectorized EnemyWorld.update over all worlds
+        :return: None
+        """
+        x, y, dt = self.x, self.y, self.dt
+        x += self.vx * dt
+        y += self.vy * dt
+        np.rint(x, out=self.centerx, casting="unsafe")
+        np.rint(y, out=self.centery, casting="unsafe")
+        half_width, half_height = self.enemy_width // 2, self.enemy_height // 2
+        left, top = self.centerx - half_width, self.centery - half_height
+        outside = ((left < 0) | (top < 0) |
+                   (left + self.enemy_width > self.width) | (top + self.enemy_height > self.height))
+        worlds, enemies = np.nonzero(outside)
+        if len(worlds):
+            # -- crashed into wall: clamp position and calculate a new speed
+            x[worlds, enemies] = np.clip(x[worlds, enemies], self.enemy_width / 2, self.width - self.enemy_width / 2)
+            y[worlds, enemies] = np.clip(y[worlds, enemies], self.enemy_height / 2,
+                                         self.height - self.enemy_height / 2)
+            self._new_speed(worlds, enemies)
+
+    def _move_players(self, actions):
+        """
+        Vectorized Player.update over all worlds
+        :param actions: (worlds,) integer array of Player input bits
+        :return: None
+        """
+        pixels = self.player_speed * self.dt
+        self.player_x += self.action_dx[actions] * pixels
+        self.player_y += self.action_dy[actions] * pixels
+        np.rint(self.player_x, out=self.player_centerx, casting="unsafe")
+        np.rint(self.player_y, out=self.player_centery, casting="unsafe")
+        width, height = self.player_width, self.player_height
+        left, top = self.player_centerx - width // 2, self.player_centery - height // 2
+        outside = (left < 0) | (top < 0) | (left + width > self.width) | (top + height > self.height)
+        if outside.any():
+            self.player_x[outside] = np.clip(self.player_x[outside], width / 2, self.width - width / 2)
+            self.player_y[outside] = np.clip(self.player_y[outside], height / 2, self.height - height / 2)
+
+    def crashed(self):
+        """
+        Player rect overlapping an enemy rect, the rule of SuperAvoider.collide
+        :return: (worlds,) boolean array
+        """
+        # Rect.colliderect: the rects overlap by at least one pixel on both axes. A rect centered at c spans
+        # c - size // 2 to c - size // 2 + size, which gives the range of center distances that overlap
+        ew, eh, pw, ph = self.enemy_width, self.enemy_height, self.player_width, self.player_height
+        dx = self.centerx - self.player_centerx[:, None]
+        dy = self.centery - self.player_centery[:, None]
+        hit = ((dx > ew // 2 - ew - pw // 2) & (dx < pw - pw // 2 + ew // 2) &
+               (dy > eh // 2 - eh - ph // 2) & (dy < ph - ph // 2 + eh // 2))
+        return hit.any(axis=1)
+
+    def observe(self):
+        """
+        The nearest enemies whose circle touches the detector circle of the player (pygame.sprite.collide_circle)
+        :return: (worlds, nearest, 5) float32 array of OBSERVATION per enemy: position relative to the player,
+        speed and 1.0 for a seen enemy, rows without an enemy are zero
+        """
+        dx = self.centerx - self.player_centerx[:, None]
+        dy = self.centery - self.player_centery[:, None]
+        distance = (dx * dx + dy * dy).astype(np.float32)
+        distance[distance > (self.enemy_radius + self.detector_radius) ** 2] = np.inf
+        k = min(self.nearest, self.enemies)
+        nearest = np.argpartition(distance, k - 1, axis=1)[:, :k] if k < self.enemies else \
+            np.broadcast_to(np.arange(self.enemies), distance.shape)
+        order = np.argsort(np.take_along_axis(distance, nearest, axis=1), axis=1)
+        nearest = np.take_along_axis(nearest, order, axis=1)
+        seen = np.isfinite(np.take_along_axis(distance, nearest, axis=1))
+        observations = np.zeros((self.worlds, self.nearest, len(OBSERVATION)), dtype=np.float32)
+        for column, values in enumerate((dx, dy, self.vx, self.vy)):
+            observations[:, :k, column] = np.take_along_axis(values, nearest, axis=1) * seen
+        observations[:, :k, 4] = seen
+        return observations
+
+    def step(self, actions):
+        """
+        Move every world one tick, then test for crashes (the collision test of the next game tick, see the module
+        docstring). Worlds whose player crashed start a new game.
+        :param actions: (worlds,) integer array of Player input bits (UP, DOWN, LEFT, RIGHT)
+        :return: (observations, rewards, dones): observations after the step (of the new game in a done world),
+        score gained in this step and whether the player crashed
+        """
+        actions = np.asarray(actions, dtype=np.int64) & 15
+        self._move_enemies()
+        self._move_players(actions)
+        self.ticks += 1
+        # The score is the time alive, including the tick the player crashed in like Player.update
+        rewards = np.full(self.worlds, self.dt)
+        self.score += self.dt
+        dones = self.crashed()
+        done = np.flatnonzero(dones)
+        if len(done):
+            self.final_score[done] = self.score[done]
+            self.games[done] += 1
+            self._new_games(done)
+        return self.observe(), rewards, dones
+
+
+if __name__ == '__main__':
+    import time
+    env = VectorEnv(worlds=4096, seed=0)
+    env.reset()
+    rng = np.random.default_rng(1)
+    steps = 200
+    start = time.perf_counter()
+    for _ in range(steps):
+        env.step(rng.integers(0, 16, env.worlds))
+    elapsed = time.perf_counter() - start
+    print("%.0f world-steps/s, %i games finished" % (steps * env.worlds / elapsed, env.games.sum()))
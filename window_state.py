@@ -0,0 +1,77 @@
+import math
+import pygame
+
+
+class WindowState:
+    """
+    Focus and visibility of the game window, followed from the window events of pygame.
+    pygame 2 sends both the SDL2 WINDOW* events and the older ACTIVEEVENT, handling either gives the same state.
+    An unfocused window is drawn at a lower frame rate and a minimized or hidden one is not drawn at all.
+    """
+    # ---- Events after which the content of the window has to be drawn again ----
+    EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.VIDEORESIZE, pygame.WINDOWEXPOSED, pygame.WINDOWRESIZED,
+                     pygame.WINDOWSIZECHANGED)
+
+    def __init__(self):
+        self.focused = True  # window has the keyboard focus
+        self.visible = True  # window is neither minimized nor hidden
+        self.exposed = False  # window content was lost and the whole window has to be drawn again
+
+    def handle(self, event):
+        """
+        Update the state from an event
+        :param event: pygame event
+        :return: True if the event was a window event
+        """
+        if event.type == pygame.ACTIVEEVENT:
+            if event.state & pygame.APPINPUTFOCUS:
+                self.focused = bool(event.gain)
+            if event.state & pygame.APPACTIVE:
+                self.show(event.gain)
+        elif event.type == pygame.WINDOWFOCUSGAINED:
+            self.focused = True
+        elif event.type == pygame.WINDOWFOCUSLOST:
+            self.focused = False
+        elif event.type in (pygame.WINDOWMINIMIZED, pygame.WINDOWHIDDEN):
+            self.show(False)
+        elif event.type in (pygame.WINDOWRESTORED, pygame.WINDOWSHOWN, pygame.WINDOWMAXIMIZED):
+            self.show(True)
+        elif event.type in WindowState.EXPOSE_EVENTS:
+            self.exposed = True
+        else:
+            return False
+        return True
+
+    def show(self, visible):
+        if visible and not self.visible:
+            self.exposed = True  # nothing was drawn while hidden
+        self.visible = bool(visible)
+
+    def frame_rate(self, fps, unfocused_fps, hidden_fps):
+        """
+        Frame rate for the current state
+        :param fps: frame rate of a focused window
+        :param unfocused_fps: frame rate of a visible window without focus
+        :param hidden_fps: frame rate of a minimized or hidden window, frames simulate but do not draw
+        :return: frames per second
+        """
+        if not self.visible:
+            return hidden_fps
+        return fps if self.focused else min(fps, unfocused_fps)
+
+    @staticmethod
+    def ticks_per_frame(tick_rate, fps, max_ticks, seconds_passed):
+        """
+        Ticks a frame may simulate at most. A frame at a lower frame rate needs more ticks to keep up with real
+        time, the limit is lifted by the ticks of one such frame. A frame longer than that is a stall and keeps
+        max_ticks, so the game slows down instead of catching up like at the full frame rate.
+        :param tick_rate: ticks per second
+        :param fps: frames per second the clock was limited to
+        :param max_ticks: limit at the full frame rate
+        :param seconds_passed: duration of the frame
+        :return: number of ticks
+        """
+        lifted = math.ceil(tick_rate / fps) - 1 + max_ticks
+        if seconds_passed * tick_rate > lifted:
+            return max_ticks
+        return lifted